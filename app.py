@@ -1,22 +1,162 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context, g
 import os
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from services.weather_service import WeatherService
 from services.news_service import NewsService
 from services.ollama_service import OllamaService
+from services.model_catalog import shared_model_catalog
+from services.singleflight import shared_flight
+from services.conversation_store import ConversationStore
+from services.registry import ServiceRegistry
+from services.metrics import metrics, cache_samples, HTTP_REQUESTS, HTTP_REQUEST_DURATION
+from config import Config
 
 # 加载环境变量
 load_dotenv()
 
 app = Flask(__name__)
 
-# 初始化服务
-weather_service = WeatherService()
-news_service = NewsService()
-ollama_service = OllamaService()
+# 服务在第一次使用时创建，导入应用时不访问Ollama和其他外部服务
+registry = ServiceRegistry()
 
-# 全局变量存储对话历史
-conversation_histories = {}
+def _create_ollama_service():
+    # 汇总需要的相关性分析复用同一个新闻服务
+    ollama_service = OllamaService(news_service=registry.get('news_service'))
+    if Config.OLLAMA_WARMUP:
+        # 后台选择并预热模型，第一个请求不再承担模型加载时间
+        ollama_service.start_warm_up()
+    return ollama_service
+
+registry.register('weather_service', WeatherService)
+registry.register('news_service', lambda: NewsService(poll=Config.NEWS_POLL_ENABLED))
+registry.register('ollama_service', _create_ollama_service)
+# 对话历史存储：限制会话数、内存占用和过期时间，可选写入SQLite
+registry.register('conversation_store', lambda: ConversationStore(
+    max_sessions=Config.CONVERSATION_MAX_SESSIONS,
+    ttl=Config.CONVERSATION_TTL,
+    max_bytes=Config.CONVERSATION_MAX_BYTES,
+    max_turns=Config.CONVERSATION_MAX_TURNS,
+    db_path=Config.CONVERSATION_DB,
+    shared=Config.CONVERSATION_SHARED
+))
+
+_background_started = False
+_background_lock = threading.Lock()
+
+def start_background_services():
+    """
+    启动后台工作：创建Ollama服务并预热模型（同时创建新闻服务、启动新闻轮询），定时刷新模型列表
+    由启动入口（run.py、serve.py的各工作进程、ASGI应用的lifespan）调用，导入应用时不启动线程、不访问网络；
+    重复调用只启动一次
+    """
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+    if Config.OLLAMA_WARMUP:
+        # 在后台创建Ollama服务并预热模型，不阻塞启动
+        registry.preload('ollama_service')
+    if Config.OLLAMA_MODELS_REFRESH_INTERVAL > 0:
+        shared_model_catalog.start_refresh(Config.OLLAMA_MODELS_REFRESH_INTERVAL)
+
+# 并发获取天气和新闻的线程池
+executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='dashboard')
+
+def __getattr__(name):
+    """
+    兼容 app.weather_service 等模块属性，第一次访问时创建服务
+    """
+    if name in registry:
+        return registry.get(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _sse_event(event, data):
+    """格式化一条Server-Sent Events消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _sse_response(events):
+    """把事件生成器包装为SSE流式响应"""
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+def _collect_service_metrics():
+    """
+    导出指标时读取已创建服务的缓存命中、生成排队和会话数，不会为此创建服务
+    """
+    cache_stats = [shared_model_catalog.stats()]
+    if registry.created('weather_service'):
+        cache_stats.append(registry.weather_service.get_cache_stats())
+    if registry.created('news_service'):
+        cache_stats.extend(registry.news_service.get_cache_stats().values())
+    if registry.created('ollama_service'):
+        cache_stats.append(registry.ollama_service.get_cache_stats())
+    # 内存缓存之下的共享层单独统计
+    cache_stats += [stats['shared'] for stats in cache_stats if 'shared' in stats]
+    
+    cache_requests, hit_ratios = [], []
+    for stats in cache_stats:
+        samples, ratio = cache_samples(stats)
+        cache_requests += samples
+        hit_ratios.append(ratio)
+    families = [
+        ('cache_requests_total', 'counter', '按结果（hit/stale/miss）统计的缓存查询次数', cache_requests),
+        ('cache_hit_ratio', 'gauge', '缓存命中率（含过期旧值命中）', hit_ratios)
+    ]
+    
+    if registry.created('ollama_service'):
+        scheduler = registry.ollama_service.get_scheduler_stats()
+        families.append(('llm_in_flight', 'gauge', '正在进行的Ollama生成数', [({}, scheduler['in_flight'])]))
+        families.append(('llm_queued', 'gauge', '按优先级统计的排队生成数',
+                         [({'priority': name}, count) for name, count in scheduler['queued'].items()]))
+        
+        generation = registry.ollama_service.get_generation_stats()['by_model_endpoint']
+        labels = [{'model': item['model'], 'endpoint': item['endpoint']} for item in generation]
+        families.append(('llm_generations_total', 'counter', '按模型和调用类型统计的生成次数',
+                         [(label, item['calls']) for label, item in zip(labels, generation)]))
+        families.append(('llm_tokens_total', 'counter', '按阶段（prompt_eval/eval）统计的token数',
+                         [(dict(label, phase=phase), item[f'{phase}_count'])
+                          for label, item in zip(labels, generation) for phase in ('prompt_eval', 'eval')]))
+        families.append(('llm_phase_seconds_total', 'counter', '按阶段（load/prompt_eval/eval）统计的Ollama耗时',
+                         [(dict(label, phase=phase), item[f'{phase}_ms'] / 1000)
+                          for label, item in zip(labels, generation) for phase in ('load', 'prompt_eval', 'eval')]))
+        families.append(('llm_tokens_per_second', 'gauge', '按模型和调用类型统计的平均生成速度',
+                         [(label, item['tokens_per_sec']) for label, item in zip(labels, generation)]))
+    if registry.created('conversation_store'):
+        sessions = registry.conversation_store.stats()['sessions']
+        families.append(('conversation_sessions', 'gauge', '内存中未过期的讨论会话数', [({}, sessions)]))
+    return families
+
+metrics.add_collector(_collect_service_metrics)
+
+@app.before_request
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def _record_request_metrics(response):
+    """按路由模板统计请求数和耗时，流式接口只统计到开始返回"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        HTTP_REQUESTS.inc(method=request.method, route=route, status=response.status_code)
+        HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, method=request.method, route=route)
+    return response
+
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus格式的指标：路由和上游的请求数与延迟直方图、缓存命中率、生成排队和会话数"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
 
 @app.route('/')
 def index():
@@ -27,7 +167,7 @@ def index():
 def get_cities():
     """获取支持的城市列表"""
     try:
-        cities = weather_service.get_supported_cities()
+        cities = registry.weather_service.get_supported_cities()
         return jsonify({
             'success': True,
             'data': cities
@@ -43,7 +183,7 @@ def get_weather():
     """获取天气信息API"""
     try:
         city = request.args.get('city', '北京')
-        weather_data = weather_service.get_weather(city)
+        weather_data = registry.weather_service.get_weather(city)
         return jsonify({
             'success': True,
             'data': weather_data
@@ -54,6 +194,79 @@ def get_weather():
             'error': str(e)
         }), 500
 
+@app.route('/api/cache-stats')
+def get_cache_stats():
+    """获取缓存命中统计，用于调整TTL"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': {
+                'weather': registry.weather_service.get_cache_stats(),
+                **registry.news_service.get_cache_stats(),
+                'summary': registry.ollama_service.get_cache_stats(),
+                'conversations': registry.conversation_store.stats(),
+                'models': shared_model_catalog.stats(),
+                'singleflight': shared_flight.stats()
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/llm-stats')
+def get_llm_stats():
+    """获取模型生成的并发和排队统计"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': {
+                'scheduler': registry.ollama_service.get_scheduler_stats(),
+                'discussion': registry.ollama_service.get_discussion_stats(),
+                'warmup': registry.ollama_service.get_warmup_stats(),
+                'generation': registry.ollama_service.get_generation_stats()
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/feed-stats')
+def get_feed_stats():
+    """获取新闻后台轮询状态和延迟"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': registry.news_service.get_feed_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/http-stats')
+def get_http_stats():
+    """获取外部接口的连接池使用统计"""
+    try:
+        stats = {
+            'weather': registry.weather_service.get_http_stats(),
+            'weather_async': registry.weather_service.async_http.stats()
+        }
+        stats.update(registry.news_service.get_http_stats())
+        return jsonify({
+            'success': True,
+            'data': stats
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/news')
 def get_news():
     """获取热点新闻"""
@@ -62,7 +275,7 @@ def get_news():
         city = request.args.get('city', '')  # 获取城市参数
         
         # 获取新闻，支持按城市相关程度排序
-        news_data = news_service.get_news(limit, city if city else None)
+        news_data = registry.news_service.get_news(limit, city if city else None)
         
         return jsonify({
             'success': True,
@@ -88,7 +301,7 @@ def get_news_content():
             }), 400
         
         # 获取新闻内容
-        content_data = news_service.get_news_content(url)
+        content_data = registry.news_service.get_news_content(url)
         
         return jsonify({
             'success': content_data['success'],
@@ -118,7 +331,7 @@ def discuss_news():
             }), 400
         
         # 获取新闻内容
-        content_data = news_service.get_news_content(url)
+        content_data = registry.news_service.get_news_content(url)
         
         if not content_data['success']:
             return jsonify({
@@ -127,32 +340,33 @@ def discuss_news():
             }), 400
         
         # 获取对话历史
-        conversation_history = conversation_histories.get(session_id, [])
+        conversation_history = registry.conversation_store.get(session_id)
         
-        # 与AI讨论
-        ai_response = ollama_service.discuss_news(
+        # 与AI讨论，超过截止时间时返回备用回复
+        result = registry.ollama_service.discuss_news_with_meta(
             content_data['content'],
             question,
             content_data['title'],
-            conversation_history
+            conversation_history,
+            session_id=session_id
         )
+        ai_response = result['answer']
         
         # 更新对话历史
-        conversation_history.append((question, ai_response))
-        # 只保留最近10轮对话，避免历史过长
-        if len(conversation_history) > 10:
-            conversation_history = conversation_history[-10:]
-        conversation_histories[session_id] = conversation_history
+        conversation_count = registry.conversation_store.append(session_id, question, ai_response)
         
         return jsonify({
             'success': True,
             'data': {
                 'question': question,
                 'answer': ai_response,
+                'answer_source': result['source'],
+                'fallback': result['source'] == 'fallback',
+                'prompt_eval': result.get('prompt_eval'),
                 'news_title': content_data['title'],
                 'news_content_length': content_data['length'],
                 'session_id': session_id,
-                'conversation_count': len(conversation_history)
+                'conversation_count': conversation_count
             }
         })
         
@@ -163,6 +377,70 @@ def discuss_news():
             'error': str(e)
         }), 500
 
+@app.route('/api/discuss-news/stream', methods=['POST'])
+def discuss_news_stream():
+    """与AI讨论新闻，通过SSE逐段返回回答"""
+    try:
+        data = request.get_json()
+        url = data.get('url', '')
+        question = data.get('question', '')
+        session_id = data.get('session_id', '')
+        
+        if not url or not question:
+            return jsonify({
+                'success': False,
+                'error': '缺少必要参数'
+            }), 400
+        
+        content_data = registry.news_service.get_news_content(url)
+        
+        if not content_data['success']:
+            return jsonify({
+                'success': False,
+                'error': '无法获取新闻内容'
+            }), 400
+        
+        conversation_history = registry.conversation_store.get(session_id)
+    except Exception as e:
+        print(f"新闻讨论时出错: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+    def events():
+        yield _sse_event('meta', {
+            'question': question,
+            'news_title': content_data['title'],
+            'news_content_length': content_data['length'],
+            'session_id': session_id
+        })
+        try:
+            parts = []
+            meta = {}
+            for text in registry.ollama_service.discuss_news_stream(
+                content_data['content'],
+                question,
+                content_data['title'],
+                conversation_history,
+                session_id=session_id,
+                meta=meta
+            ):
+                parts.append(text)
+                yield _sse_event('token', {'text': text})
+            
+            # 回答完整后再写入对话历史
+            conversation_count = registry.conversation_store.append(session_id, question, ''.join(parts))
+            yield _sse_event('done', {
+                'conversation_count': conversation_count,
+                'prompt_eval': meta.get('prompt_eval')
+            })
+        except Exception as e:
+            print(f"新闻讨论流式输出时出错: {e}")
+            yield _sse_event('error', {'error': str(e)})
+
+    return _sse_response(events())
+
 @app.route('/api/clear-conversation', methods=['POST'])
 def clear_conversation():
     """清除对话历史"""
@@ -170,8 +448,8 @@ def clear_conversation():
         data = request.get_json()
         session_id = data.get('session_id', '')
         
-        if session_id in conversation_histories:
-            del conversation_histories[session_id]
+        registry.conversation_store.clear(session_id)
+        registry.ollama_service.clear_discussion_context(session_id)
         
         return jsonify({
             'success': True,
@@ -192,18 +470,23 @@ def get_summary():
         city = request.args.get('city', '北京')
 
         # 获取天气信息
-        weather_data = weather_service.get_weather(city)
+        weather_data = registry.weather_service.get_weather(city)
 
         # 获取新闻信息，按城市相关程度排序
-        news_data = news_service.get_news(10, city)
+        news_data = registry.news_service.get_news(10, city)
 
-        # 生成AI汇总，传递城市信息进行地域相关性分析
-        summary = ollama_service.generate_summary(weather_data, news_data, city)
+        # 新闻已按城市相关程度排好序，相关性分析不再重新计算和排序
+        relevance_analysis = registry.news_service.analyze_news_relevance(news_data, city, ranked=True)
+        
+        # 生成AI汇总，传递城市信息进行地域相关性分析；超过截止时间时返回备用汇总
+        result = registry.ollama_service.generate_summary_with_meta(weather_data, news_data, city, relevance_analysis)
 
         return jsonify({
             'success': True,
             'data': {
-                'summary': summary,
+                'summary': result['summary'],
+                'summary_source': result['source'],
+                'fallback': result['source'] == 'fallback',
                 'weather': weather_data,
                 'news': news_data,
                 'city': city
@@ -217,11 +500,90 @@ def get_summary():
             'error': str(e)
         }), 500
 
+@app.route('/api/summary/stream')
+def get_summary_stream():
+    """通过SSE流式返回AI汇总报告，先返回天气和新闻，再逐段返回汇总"""
+    try:
+        city = request.args.get('city', '北京')
+
+        weather_future = executor.submit(registry.weather_service.get_weather, city)
+        news_future = executor.submit(registry.news_service.get_news, 10, city)
+        weather_data = weather_future.result()
+        news_data = news_future.result()
+        relevance_analysis = registry.news_service.analyze_news_relevance(news_data, city, ranked=True)
+    except Exception as e:
+        print(f"生成汇总报告时出错: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+    def events():
+        yield _sse_event('meta', {
+            'weather': weather_data,
+            'news': news_data,
+            'city': city
+        })
+        try:
+            for text in registry.ollama_service.generate_summary_stream(weather_data, news_data, city, relevance_analysis):
+                yield _sse_event('token', {'text': text})
+            yield _sse_event('done', {})
+        except Exception as e:
+            print(f"汇总报告流式输出时出错: {e}")
+            yield _sse_event('error', {'error': str(e)})
+
+    return _sse_response(events())
+
+@app.route('/api/dashboard')
+def get_dashboard():
+    """一次请求获取天气、新闻和AI汇总"""
+    try:
+        city = request.args.get('city', '北京')
+        limit = request.args.get('limit', 10, type=int)
+
+        # 并发获取天气和按城市排序的新闻
+        weather_future = executor.submit(registry.weather_service.get_weather, city)
+        news_future = executor.submit(registry.news_service.get_news, limit, city)
+        weather_data = weather_future.result()
+        news_data = news_future.result()
+
+        # 新闻已按城市排序，相关性统计直接复用排序结果
+        relevance_analysis = registry.news_service.analyze_news_relevance(news_data, city, ranked=True)
+
+        # 使用同一份天气和新闻生成AI汇总
+        result = registry.ollama_service.generate_summary_with_meta(weather_data, news_data, city, relevance_analysis)
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'summary': result['summary'],
+                'summary_source': result['source'],
+                'fallback': result['source'] == 'fallback',
+                'weather': weather_data,
+                'news': news_data,
+                'city': city,
+                'relevance': {
+                    'relevant_count': relevance_analysis['relevant_count'],
+                    'total_count': relevance_analysis['total_count'],
+                    'relevance_rate': relevance_analysis['relevance_rate']
+                }
+            }
+        })
+
+    except Exception as e:
+        print(f"获取城市信息面板时出错: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/models')
 def get_models():
-    """获取可用的Ollama模型列表"""
+    """获取可用的Ollama模型列表，refresh=1时重新从Ollama加载"""
     try:
-        models = ollama_service.get_available_models()
+        if request.args.get('refresh', type=int):
+            registry.ollama_service.catalog.refresh()
+        models = registry.ollama_service.get_available_models()
         return jsonify({
             'success': True,
             'data': models
@@ -245,7 +607,7 @@ def set_model():
                 'error': '模型名称不能为空'
             }), 400
         
-        success = ollama_service.set_model(model_name)
+        success = registry.ollama_service.set_model(model_name)
         
         return jsonify({
             'success': success,
@@ -264,7 +626,7 @@ def get_current_model():
         return jsonify({
             'success': True,
             'data': {
-                'model_name': ollama_service.model_name
+                'model_name': registry.ollama_service.model_name
             }
         })
     except Exception as e:
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+异步服务模式（ASGI）
+
+天气、新闻、新闻正文、汇总、城市信息面板和新闻讨论接口调用服务的异步版本，等待wttr.in、新浪和Ollama时
+不占用线程，一个工作进程即可同时处理大量请求；其余接口（页面、流式接口、统计等）转交给Flask应用处理。
+
+运行: uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import json
+import time
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+import app as flask_module
+from services.metrics import HTTP_REQUESTS, HTTP_REQUEST_DURATION
+
+
+class Request:
+    """
+    异步接口收到的请求：查询参数和JSON请求体
+    """
+
+    def __init__(self, scope, body: bytes):
+        self.scope = scope
+        self.body = body
+        query = parse_qs(scope.get('query_string', b'').decode('utf-8'))
+        self.args = {key: values[0] for key, values in query.items()}
+
+    def arg_int(self, name: str, default: int) -> int:
+        try:
+            return int(self.args.get(name, default))
+        except ValueError:
+            return default
+
+    def get_json(self):
+        return json.loads(self.body or b'{}')
+
+
+async def get_weather(request):
+    """获取天气信息API"""
+    city = request.args.get('city', '北京')
+    weather_data = await flask_module.weather_service.get_weather_async(city)
+    return 200, {
+        'success': True,
+        'data': weather_data
+    }
+
+
+async def get_news(request):
+    """获取热点新闻"""
+    limit = request.arg_int('limit', 10)
+    city = request.args.get('city', '')
+    news_data = await flask_module.news_service.get_news_async(limit, city if city else None)
+    return 200, {
+        'success': True,
+        'data': news_data
+    }
+
+
+async def get_news_content(request):
+    """获取新闻内容"""
+    url = request.args.get('url', '')
+    if not url:
+        return 400, {
+            'success': False,
+            'error': '缺少新闻URL参数'
+        }
+
+    content_data = await flask_module.news_service.get_news_content_async(url)
+    return 200, {
+        'success': content_data['success'],
+        'data': content_data
+    }
+
+
+async def get_summary(request):
+    """获取AI汇总报告，天气和新闻并发获取"""
+    city = request.args.get('city', '北京')
+    news_service = flask_module.news_service
+
+    weather_data, news_data = await asyncio.gather(
+        flask_module.weather_service.get_weather_async(city),
+        news_service.get_news_async(10, city)
+    )
+    relevance_analysis = news_service.analyze_news_relevance(news_data, city, ranked=True)
+    result = await flask_module.ollama_service.generate_summary_with_meta_async(
+        weather_data, news_data, city, relevance_analysis
+    )
+    return 200, {
+        'success': True,
+        'data': {
+            'summary': result['summary'],
+            'summary_source': result['source'],
+            'fallback': result['source'] == 'fallback',
+            'weather': weather_data,
+            'news': news_data,
+            'city': city
+        }
+    }
+
+
+async def get_dashboard(request):
+    """一次请求获取天气、新闻和AI汇总"""
+    city = request.args.get('city', '北京')
+    limit = request.arg_int('limit', 10)
+    news_service = flask_module.news_service
+
+    weather_data, news_data = await asyncio.gather(
+        flask_module.weather_service.get_weather_async(city),
+        news_service.get_news_async(limit, city)
+    )
+    relevance_analysis = news_service.analyze_news_relevance(news_data, city, ranked=True)
+    result = await flask_module.ollama_service.generate_summary_with_meta_async(
+        weather_data, news_data, city, relevance_analysis
+    )
+    return 200, {
+        'success': True,
+        'data': {
+            'summary': result['summary'],
+            'summary_source': result['source'],
+            'fallback': result['source'] == 'fallback',
+            'weather': weather_data,
+            'news': news_data,
+            'city': city,
+            'relevance': {
+                'relevant_count': relevance_analysis['relevant_count'],
+                'total_count': relevance_analysis['total_count'],
+                'relevance_rate': relevance_analysis['relevance_rate']
+            }
+        }
+    }
+
+
+async def discuss_news(request):
+    """与AI讨论新闻，支持持续性对话"""
+    data = request.get_json()
+    url = data.get('url', '')
+    question = data.get('question', '')
+    session_id = data.get('session_id', '')
+
+    if not url or not question:
+        return 400, {
+            'success': False,
+            'error': '缺少必要参数'
+        }
+
+    content_data = await flask_module.news_service.get_news_content_async(url)
+    if not content_data['success']:
+        return 400, {
+            'success': False,
+            'error': '无法获取新闻内容'
+        }
+
+    # 对话历史可能读写SQLite，在线程中进行
+    conversation_store = flask_module.conversation_store
+    conversation_history = await asyncio.to_thread(conversation_store.get, session_id)
+    result = await flask_module.ollama_service.discuss_news_with_meta_async(
+        content_data['content'],
+        question,
+        content_data['title'],
+        conversation_history,
+        session_id=session_id
+    )
+    conversation_count = await asyncio.to_thread(conversation_store.append, session_id, question, result['answer'])
+
+    return 200, {
+        'success': True,
+        'data': {
+            'question': question,
+            'answer': result['answer'],
+            'answer_source': result['source'],
+            'fallback': result['source'] == 'fallback',
+            'prompt_eval': result.get('prompt_eval'),
+            'news_title': content_data['title'],
+            'news_content_length': content_data['length'],
+            'session_id': session_id,
+            'conversation_count': conversation_count
+        }
+    }
+
+
+# 使用异步服务的接口，其余请求转交给Flask应用
+ROUTES = {
+    ('GET', '/api/weather'): get_weather,
+    ('GET', '/api/news'): get_news,
+    ('GET', '/api/news-content'): get_news_content,
+    ('GET', '/api/summary'): get_summary,
+    ('GET', '/api/dashboard'): get_dashboard,
+    ('POST', '/api/discuss-news'): discuss_news
+}
+
+flask_asgi = WsgiToAsgi(flask_module.app)
+
+
+async def _read_body(receive) -> bytes:
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def _send_json(send, status: int, data):
+    body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json; charset=utf-8'),
+            (b'content-length', str(len(body)).encode())
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # 在后台预热模型、启动新闻轮询，不阻塞启动
+            flask_module.start_background_services()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            # 关闭已创建服务的异步客户端连接池
+            registry = flask_module.registry
+            clients = []
+            if registry.created('weather_service'):
+                clients.append(registry.weather_service.async_http)
+            if registry.created('news_service'):
+                clients += [registry.news_service.async_feed_http, registry.news_service.async_article_http]
+            for client in clients:
+                await client.aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """
+    ASGI入口
+    """
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    handler = ROUTES.get((scope['method'], scope['path']))
+    if handler is None:
+        await flask_asgi(scope, receive, send)
+        return
+
+    start = time.perf_counter()
+    try:
+        request = Request(scope, await _read_body(receive))
+        status, data = await handler(request)
+    except Exception as e:
+        print(f"处理请求 {scope['path']} 时出错: {e}")
+        status, data = 500, {
+            'success': False,
+            'error': str(e)
+        }
+    await _send_json(send, status, data)
+    # 转交Flask的接口由Flask统计
+    HTTP_REQUESTS.inc(method=scope['method'], route=scope['path'], status=status)
+    HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, method=scope['method'], route=scope['path'])
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run('asgi_app:app', host='0.0.0.0', port=5000)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+新闻正文提取性能测试
+对比原实现（html.parser + 逐个select）与各提取器后端的解析耗时和峰值内存
+
+用法: python benchmarks/bench_html_extract.py [--corpus 保存的新浪新闻页面目录] [--repeat 5]
+没有指定语料目录时使用生成的新浪风格页面。
+峰值内存由tracemalloc统计，只包含Python对象的分配，不包含lxml在C层分配的内存。
+"""
+
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from services.html_extractor import EXTRACTORS, HAS_LXML, detect_encoding
+
+def legacy_extract(html):
+    """原NewsService._extract_news_content中的解析逻辑，作为对照"""
+    soup = BeautifulSoup(html, 'html.parser')
+    content_selectors = [
+        '.article-content', '.article-body', '.content', '.main-content', '.article',
+        '.news-content', '#artibody', '.article-content-left', '.article-body-content'
+    ]
+    content = ""
+    for selector in content_selectors:
+        elements = soup.select(selector)
+        if elements:
+            content = elements[0].get_text(strip=True)
+            break
+    if not content:
+        paragraphs = soup.find_all('p')
+        content = '\n'.join([p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 50])
+    title = ""
+    for selector in ['h1', '.article-title', '.title', '.headline', '.article-headline']:
+        elements = soup.select(selector)
+        if elements:
+            title = elements[0].get_text(strip=True)
+            break
+    if not title:
+        title = soup.find('title')
+        title = title.get_text(strip=True) if title else "未知标题"
+    return title, content
+
+def build_sina_page(seed):
+    """构造新浪新闻风格的页面：大量导航、脚本和推荐列表，正文在#artibody中"""
+    rng = random.Random(seed)
+    words = ['北京', '科技', '创新', '发展', '经济', '政策', '城市', '市场', '企业', '数据', '服务', '建设']
+
+    def sentence(n):
+        return ''.join(rng.choice(words) for _ in range(n)) + '。'
+
+    nav = ''.join(f'<li class="nav-item"><a href="/c{i}">{sentence(2)}</a></li>' for i in range(80))
+    scripts = ''.join(f'<script>var ad{i} = {{"id": {i}, "text": "{sentence(10)}"}};</script>' for i in range(20))
+    related = ''.join(
+        f'<div class="feed-card"><a href="/n{i}"><span class="title">{sentence(6)}</span></a><p>{sentence(8)}</p></div>'
+        for i in range(60)
+    )
+    body = ''.join(f'<p>　　{sentence(rng.randint(20, 60))}</p>\n' for _ in range(rng.randint(15, 40)))
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{sentence(5)}_新浪新闻</title>
+<style>.nav-item {{ float: left; }} .feed-card {{ margin: 4px; }}</style>{scripts}</head>
+<body><div class="top-nav"><ul>{nav}</ul></div>
+<div class="main-content w1240"><h1 class="main-title">{sentence(6)}</h1>
+<div class="date-source"><span class="date">2024年08月04日</span></div>
+<!-- 正文开始 -->
+<div class="article" id="artibody">{body}</div>
+</div><div class="feed-list">{related}</div></body></html>"""
+
+def load_corpus(corpus_dir, count):
+    """读取语料目录中的页面，没有时生成页面"""
+    pages = []
+    if corpus_dir:
+        for path in sorted(glob.glob(os.path.join(corpus_dir, '*.htm*'))):
+            with open(path, 'rb') as f:
+                content = f.read()
+            pages.append(content.decode(detect_encoding(content) or 'utf-8', errors='replace'))
+    if not pages:
+        pages = [build_sina_page(seed) for seed in range(count)]
+    return pages
+
+def measure(extract, pages, repeat):
+    """返回(每页平均耗时ms, 单页最大峰值内存KB, 提取结果)"""
+    results = [extract(html) for html in pages]
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            extract(html)
+    elapsed = (time.perf_counter() - start) / (repeat * len(pages)) * 1000
+
+    peak = 0
+    for html in pages:
+        tracemalloc.start()
+        extract(html)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return elapsed, peak / 1024, results
+
+def main():
+    parser = argparse.ArgumentParser(description='新闻正文提取性能测试')
+    parser.add_argument('--corpus', help='保存的新浪新闻页面目录（*.html）')
+    parser.add_argument('--count', type=int, default=20, help='没有语料时生成的页面数')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus, args.count)
+    average_kb = sum(len(html.encode('utf-8')) for html in pages) / len(pages) / 1024
+
+    print("📄 新闻正文提取性能测试")
+    print(f"页面数: {len(pages)}，平均大小: {average_kb:.1f}KB")
+    print("=" * 60)
+    print(f"{'后端':>10} {'耗时(ms/页)':>14} {'峰值内存(KB)':>14} {'加速比':>8} {'结果一致':>8}")
+
+    backends = [('legacy', legacy_extract)]
+    for name, extractor_class in EXTRACTORS.items():
+        if name == 'lxml' and not HAS_LXML:
+            print(f"{name:>10} 未安装，跳过")
+            continue
+        backends.append((name, extractor_class().extract))
+
+    baseline_ms, expected = None, None
+    for name, extract in backends:
+        elapsed, peak_kb, results = measure(extract, pages, args.repeat)
+        if baseline_ms is None:
+            baseline_ms, expected = elapsed, results
+        same = sum(result == reference for result, reference in zip(results, expected))
+        print(f"{name:>10} {elapsed:>14.2f} {peak_kb:>14.0f} {baseline_ms / elapsed:>7.1f}x {same:>4}/{len(pages)}")
+
+    print("=" * 60)
+    print("注: 提取器删除了script/style内容，正文选中的元素包含脚本时结果会与原实现不同")
+
+if __name__ == '__main__':
+    main()
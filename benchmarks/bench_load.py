@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+线程模式与异步模式的并发压测
+本地启动一个固定延迟的模拟wttr.in接口，分别以子进程启动线程池WSGI服务（Flask）和ASGI服务（uvicorn），
+用不同城市请求 /api/weather（关闭天气缓存），统计吞吐量和延迟分位数
+
+用法: python benchmarks/bench_load.py [--requests 1000] [--concurrency 200] [--delay 0.2] [--threads 8]
+需要安装 uvicorn
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+WEATHER_BODY = json.dumps({
+    'current_condition': [{
+        'temp_C': '20', 'FeelsLikeC': '21', 'humidity': '50', 'weatherDesc': [{'value': 'Sunny'}],
+        'windspeedKmph': '10', 'winddir16Point': 'N', 'visibility': '10', 'pressure': '1013'
+    }]
+}).encode()
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def run_upstream(port, delay):
+    """子进程：模拟天气接口，每个请求等待delay秒后返回"""
+    async def handle(reader, writer):
+        try:
+            await reader.readuntil(b'\r\n\r\n')
+            await asyncio.sleep(delay)
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nConnection: close\r\n'
+                         b'Content-Length: %d\r\n\r\n' % len(WEATHER_BODY) + WEATHER_BODY)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve():
+        server = await asyncio.start_server(handle, '127.0.0.1', port, backlog=4096)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+def serve(mode, port, upstream, threads):
+    """子进程：把天气服务指向模拟接口并关闭缓存，然后启动指定模式的服务"""
+    os.environ['NEWS_POLL_ENABLED'] = 'False'
+    os.environ['OLLAMA_WARMUP'] = 'False'
+    import app as flask_module
+    from services.cache import TTLCache
+
+    weather_service = flask_module.weather_service
+    weather_service.base_url = upstream
+    weather_service.cache = TTLCache(ttl=0, name='weather')
+
+    if mode == 'asgi':
+        import uvicorn
+        uvicorn.run('asgi_app:app', host='127.0.0.1', port=port, log_level='warning', backlog=4096)
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', port, flask_module.app, threaded=threads <= 0)
+    if threads > 0:
+        # 固定大小的线程池，同时处理的请求数等于线程数（与waitress/gunicorn gthread相同）
+        pool = ThreadPoolExecutor(max_workers=threads)
+
+        def handle(request, address):
+            try:
+                server.finish_request(request, address)
+            except Exception:
+                server.handle_error(request, address)
+            finally:
+                server.shutdown_request(request)
+
+        server.process_request = lambda request, address: pool.submit(handle, request, address)
+    server.serve_forever()
+
+async def run_load(base_url, total, concurrency):
+    """以concurrency个并发连接发送total个请求，返回(耗时, 各请求延迟, 失败数)"""
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    # 每个请求使用新连接，两种服务模式的连接开销相同
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=0)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def one(i):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.get('/api/weather', params={'city': f'city{i}'})
+                    if response.status_code != 200 or response.json()['data'].get('note'):
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[one(i) for i in range(total)])
+        return time.perf_counter() - start, latencies, errors
+
+def wait_ready(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f'http://127.0.0.1:{port}/api/cities', timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError('服务启动超时')
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+def bench(mode, args, upstream):
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--serve', mode, '--port', str(port),
+         '--upstream', upstream, '--threads', str(args.threads)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_ready(port)
+        asyncio.run(run_load(f'http://127.0.0.1:{port}', min(args.concurrency, 50), min(args.concurrency, 50)))  # 预热连接
+        elapsed, latencies, errors = asyncio.run(run_load(f'http://127.0.0.1:{port}', args.requests, args.concurrency))
+    finally:
+        process.terminate()
+        process.wait(10)
+
+    name = f'线程池({args.threads}线程)' if mode == 'threaded' and args.threads > 0 else ('每请求一个线程' if mode == 'threaded' else 'ASGI单进程')
+    print(f"{name:<16} 吞吐 {args.requests / elapsed:8.1f} req/s   "
+          f"p50 {percentile(latencies, 0.5) * 1000:8.1f}ms   p99 {percentile(latencies, 0.99) * 1000:8.1f}ms   失败 {errors}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--delay', type=float, default=0.2, help='模拟上游接口的延迟秒数')
+    parser.add_argument('--threads', type=int, default=8, help='线程模式的线程数，0表示每个请求一个线程')
+    parser.add_argument('--serve', choices=['threaded', 'asgi', 'upstream'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--upstream', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve == 'upstream':
+        run_upstream(args.port, args.delay)
+        return
+    if args.serve:
+        serve(args.serve, args.port, args.upstream, args.threads)
+        return
+
+    # 模拟接口、被测服务和压测客户端分别在独立进程中运行，互不争用GIL
+    upstream_port = free_port()
+    upstream_process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--serve', 'upstream', '--port', str(upstream_port),
+         '--delay', str(args.delay)]
+    )
+    upstream = f'http://127.0.0.1:{upstream_port}'
+    try:
+        time.sleep(1)
+        print(f"{args.requests}个请求，{args.concurrency}并发，上游延迟{args.delay * 1000:.0f}ms\n")
+        bench('threaded', args, upstream)
+        bench('asgi', args, upstream)
+    finally:
+        upstream_process.terminate()
+        upstream_process.wait(10)
+
+if __name__ == '__main__':
+    main()
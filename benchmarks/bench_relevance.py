@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+新闻地域相关性计算性能测试
+对比原逐个关键词查找的实现与Aho-Corasick自动机一次扫描计算所有城市
+
+用法: python benchmarks/bench_relevance.py [--count 5000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.news_service import NewsService
+from services.relevance import CityRelevanceScorer
+
+def legacy_calculate_relevance(city_keywords, news_item, city):
+    """原NewsService._calculate_relevance实现，作为对照"""
+    title = news_item.get('title', '').lower()
+    summary = news_item.get('summary', '').lower()
+    score = 0
+    matched_keywords = []
+    for keyword in city_keywords[city]:
+        keyword_lower = keyword.lower()
+        if keyword_lower in title:
+            score += 3
+            matched_keywords.append(keyword)
+        if keyword_lower in summary:
+            score += 1
+            if keyword not in matched_keywords:
+                matched_keywords.append(keyword)
+    return score, matched_keywords
+
+def build_headlines(city_keywords, count, seed=0):
+    """构造新闻标题和摘要，约三成包含城市关键词"""
+    rng = random.Random(seed)
+    keywords = [keyword for words in city_keywords.values() for keyword in words]
+    words = ['科技', '创新', '发展', '经济', '政策', '市场', '企业', '数据', '服务', '建设', '教育', '医疗', '交通']
+
+    def text(length):
+        parts = [rng.choice(words) for _ in range(length)]
+        if rng.random() < 0.3:
+            parts.insert(rng.randrange(len(parts) + 1), rng.choice(keywords))
+        return ''.join(parts)
+
+    return [{'title': text(rng.randint(6, 14)), 'summary': text(rng.randint(20, 50))} for _ in range(count)]
+
+def main():
+    parser = argparse.ArgumentParser(description='新闻地域相关性计算性能测试')
+    parser.add_argument('--count', type=int, default=5000)
+    args = parser.parse_args()
+
+    city_keywords = NewsService().city_keywords
+    cities = list(city_keywords)
+    news_list = build_headlines(city_keywords, args.count)
+
+    print("📍 新闻地域相关性计算性能测试")
+    print(f"新闻数: {len(news_list)}，城市数: {len(cities)}")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    scorer = CityRelevanceScorer(city_keywords)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"构建自动机: {build_ms:.2f}ms，关键词数: {len(scorer.automaton.keywords)}")
+
+    # 原实现：每个城市对每条新闻逐个关键词查找
+    start = time.perf_counter()
+    legacy = {city: [legacy_calculate_relevance(city_keywords, news, city) for news in news_list] for city in cities}
+    legacy_all_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for news in news_list:
+        legacy_calculate_relevance(city_keywords, news, cities[0])
+    legacy_one_ms = (time.perf_counter() - start) * 1000
+
+    # 自动机：每条新闻扫描一次得到所有城市
+    start = time.perf_counter()
+    scored = [scorer.score(news['title'], news['summary']) for news in news_list]
+    scan_ms = (time.perf_counter() - start) * 1000
+
+    # 已保存结果后，再按城市查询只需读取
+    start = time.perf_counter()
+    for city in cities:
+        for relevance in scored:
+            relevance.get(city)
+    read_ms = (time.perf_counter() - start) * 1000
+
+    for city in cities:
+        for (score, matched), relevance in zip(legacy[city], scored):
+            entry = relevance.get(city, {'score': 0, 'matched_keywords': []})
+            assert (score, matched) == (entry['score'], entry['matched_keywords']), '计算结果与原实现不一致'
+
+    print(f"{'场景':<28} {'原实现(ms)':>12} {'自动机(ms)':>12} {'加速比':>8}")
+    print(f"{'单个城市':<28} {legacy_one_ms:>12.2f} {scan_ms:>12.2f} {legacy_one_ms / scan_ms:>7.1f}x")
+    print(f"{'全部城市':<28} {legacy_all_ms:>12.2f} {scan_ms:>12.2f} {legacy_all_ms / scan_ms:>7.1f}x")
+    print(f"{'已计算后切换全部城市':<26} {legacy_all_ms:>12.2f} {read_ms:>12.2f} {legacy_all_ms / read_ms:>7.1f}x")
+    print("=" * 60)
+    print("✅ 计算结果与原实现一致")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+启动时间测试
+在子进程中导入app并启动服务，统计导入app模块的耗时和从启动进程到 / 第一次返回200的耗时
+
+--ollama-down 把OLLAMA_HOST指向没有响应的端口，模拟Ollama无响应时的启动时间
+--record 把结果追加到 benchmarks/startup_history.jsonl（带提交号），用于跟踪启动时间的变化
+
+用法: python benchmarks/bench_startup.py [--runs 5] [--ollama-down] [--record]
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_FILE = os.path.join(ROOT, 'benchmarks', 'startup_history.jsonl')
+
+# 子进程：导入app并启动服务，导入耗时写到标准输出
+SERVER_CODE = """
+import sys, time
+start = time.perf_counter()
+import app
+print(f'IMPORT {(time.perf_counter() - start) * 1000:.1f}', flush=True)
+app.start_background_services()
+app.app.run(host='127.0.0.1', port=int(sys.argv[1]), debug=False, use_reloader=False, threaded=True)
+"""
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def measure(env, timeout):
+    """启动一次服务，返回(导入耗时ms, 第一次返回200的耗时ms)，超时时后者为None"""
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-c', SERVER_CODE, str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    try:
+        ready_ms = None
+        deadline = start + timeout
+        while time.perf_counter() < deadline and process.poll() is None:
+            try:
+                if httpx.get(f'http://127.0.0.1:{port}/', timeout=1).status_code == 200:
+                    ready_ms = (time.perf_counter() - start) * 1000
+                    break
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.01)
+    finally:
+        process.terminate()
+        output, _ = process.communicate(timeout=10)
+
+    import_ms = None
+    for line in output.splitlines():
+        if line.startswith('IMPORT '):
+            import_ms = float(line.split()[1])
+    return import_ms, ready_ms
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=60, help='等待服务就绪的最长秒数')
+    parser.add_argument('--ollama-down', action='store_true', help='模拟Ollama无响应')
+    parser.add_argument('--record', action='store_true', help='把结果追加到startup_history.jsonl')
+    args = parser.parse_args()
+
+    env = dict(os.environ, NEWS_POLL_ENABLED='False')
+    if args.ollama_down:
+        # 只监听不接受连接的端口：连接能建立但永远没有响应，与Ollama卡住时相同
+        blackhole = socket.socket()
+        blackhole.bind(('127.0.0.1', 0))
+        blackhole.listen(128)
+        env['OLLAMA_HOST'] = f'http://127.0.0.1:{blackhole.getsockname()[1]}'
+
+    imports, readies = [], []
+    for i in range(args.runs):
+        import_ms, ready_ms = measure(env, args.timeout)
+        import_text = f"{import_ms:8.1f}ms" if import_ms is not None else '   未完成'
+        ready_text = f"{ready_ms:8.1f}ms" if ready_ms is not None else '     超时'
+        print(f"第{i + 1}次: 导入app {import_text}   首次200 {ready_text}")
+        if import_ms is not None:
+            imports.append(import_ms)
+        if ready_ms is not None:
+            readies.append(ready_ms)
+
+    result = {
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'ollama_down': args.ollama_down,
+        'runs': args.runs,
+        'import_ms': round(statistics.median(imports), 1) if imports else None,
+        'first_ok_ms': round(statistics.median(readies), 1) if readies else None,
+        'timeouts': args.runs - len(readies)
+    }
+    print(f"\n中位数: 导入app {result['import_ms']}ms   首次200 {result['first_ok_ms']}ms   超时{result['timeouts']}次")
+
+    if args.record:
+        with open(HISTORY_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(result, ensure_ascii=False) + '\n')
+        print(f"已记录到 {os.path.relpath(HISTORY_FILE, ROOT)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+思考内容过滤性能测试
+对比原多次正则替换实现与单次扫描的ThinkingFilter在长推理输出上的耗时
+
+用法: python benchmarks/bench_think_filter.py [--repeat 20]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.text_filter import ThinkingFilter, remove_thinking
+
+def legacy_remove_thinking(text):
+    """原OllamaService._remove_thinking_content实现，作为对照"""
+    if not text:
+        return text
+    text = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL)
+    text = re.sub(r'<thinking>.*?</thinking>', '', text, flags=re.DOTALL)
+    thinking_keywords = [
+        r'现在构思具体内容:.*?(?=\n\n|\n[A-Z]|\n#|\n##|\n###|\n-|\n\d+\.|$)',
+        r'让我分析一下.*?(?=\n\n|\n[A-Z]|\n#|\n##|\n###|\n-|\n\d+\.|$)',
+        r'我需要思考.*?(?=\n\n|\n[A-Z]|\n#|\n##|\n###|\n-|\n\d+\.|$)',
+        r'基于以上信息.*?(?=\n\n|\n[A-Z]|\n#|\n##|\n###|\n-|\n\d+\.|$)',
+        r'现在让我.*?(?=\n\n|\n[A-Z]|\n#|\n##|\n###|\n-|\n\d+\.|$)',
+        r'我会把这些内容.*?(?=\n\n|\n[A-Z]|\n#|\n##|\n###|\n-|\n\d+\.|$)',
+        r'让我来总结.*?(?=\n\n|\n[A-Z]|\n#|\n##|\n###|\n-|\n\d+\.|$)',
+        r'现在我来.*?(?=\n\n|\n[A-Z]|\n#|\n##|\n###|\n-|\n\d+\.|$)',
+        r'基于天气和新闻.*?(?=\n\n|\n[A-Z]|\n#|\n##|\n###|\n-|\n\d+\.|$)',
+        r'让我为您.*?(?=\n\n|\n[A-Z]|\n#|\n##|\n###|\n-|\n\d+\.|$)'
+    ]
+    for pattern in thinking_keywords:
+        text = re.sub(pattern, '', text, flags=re.DOTALL | re.IGNORECASE)
+    text = re.sub(r'\n\s*\n\s*\n', '\n\n', text)
+    return text.strip()
+
+def build_reasoning_output(seed, think_chars=20000):
+    """构造推理模型风格的输出：很长的<think>块，后面是带开头语的markdown报告"""
+    rng = random.Random(seed)
+    sentences = [
+        '用户想要一份天气和新闻的汇总。', '首先看温度和湿度。', '新闻里有几条与城市相关。',
+        '需要控制在300字以内。', '结构包括三个部分。', '风速不大，适合出行。'
+    ]
+    think = []
+    while sum(len(s) for s in think) < think_chars:
+        think.append(rng.choice(sentences))
+        if rng.random() < 0.1:
+            think.append('\n\n')
+    report = [
+        '让我为您整理今天的信息：\n\n',
+        '## 今日天气概况\n\n北京今日多云，气温22°C，湿度65%。\n\n\n\n',
+        '基于以上信息，可以看出天气适宜。\n',
+        '## 热点新闻聚焦（北京相关）\n\n',
+        '1. 北京科技创新中心建设加速推进\n2. 人工智能技术发展迅速\n\n',
+        '## 生活工作建议\n\n- 适合户外活动\n- 关注本地新闻动态\n'
+    ]
+    return '<think>\n' + ''.join(think) + '\n</think>\n\n' + ''.join(report)
+
+def timeit(fn, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - start) / repeat * 1000
+
+def stream_filter(text, chunk_size=4):
+    """模拟流式输出：按token大小分段输入"""
+    text_filter = ThinkingFilter()
+    parts = [text_filter.feed(text[i:i + chunk_size]) for i in range(0, len(text), chunk_size)]
+    parts.append(text_filter.flush())
+    return ''.join(parts)
+
+def main():
+    parser = argparse.ArgumentParser(description='思考内容过滤性能测试')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print("🧠 思考内容过滤性能测试")
+    print("=" * 60)
+    print(f"{'输出长度':>10} {'原实现(ms)':>12} {'单次扫描(ms)':>14} {'流式(ms)':>10} {'加速比':>8}")
+
+    for think_chars in (2000, 20000, 100000):
+        text = build_reasoning_output(think_chars, think_chars)
+        expected = legacy_remove_thinking(text)
+        assert remove_thinking(text) == expected, '过滤结果与原实现不一致'
+        assert stream_filter(text) == expected, '流式过滤结果与原实现不一致'
+
+        legacy_ms = timeit(legacy_remove_thinking, text, args.repeat)
+        filter_ms = timeit(remove_thinking, text, args.repeat)
+        stream_ms = timeit(stream_filter, text, max(1, args.repeat // 10))
+        print(f"{len(text):>10} {legacy_ms:>12.3f} {filter_ms:>14.3f} {stream_ms:>10.3f} {legacy_ms / filter_ms:>7.1f}x")
+
+    print("=" * 60)
+    print("✅ 过滤结果与原实现一致")
+
+if __name__ == '__main__':
+    main()
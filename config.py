@@ -14,12 +14,92 @@ class Config:
     # Ollama配置
     OLLAMA_HOST = os.environ.get('OLLAMA_HOST', 'http://localhost:11434')
     OLLAMA_MODEL = os.environ.get('OLLAMA_MODEL', 'qwen2.5:7b')
+    OLLAMA_MAX_CONCURRENCY = int(os.environ.get('OLLAMA_MAX_CONCURRENCY', '2'))
+    OLLAMA_MAX_QUEUE = int(os.environ.get('OLLAMA_MAX_QUEUE', '16'))
+    OLLAMA_QUEUE_TIMEOUT = int(os.environ.get('OLLAMA_QUEUE_TIMEOUT', '30'))
+    # 启动时预热模型；模型空闲后在内存中保留的时长（如30m，纯数字为秒数，-1为一直保留）
+    OLLAMA_WARMUP = os.environ.get('OLLAMA_WARMUP', 'True').lower() == 'true'
+    OLLAMA_KEEP_ALIVE = os.environ.get('OLLAMA_KEEP_ALIVE', '30m')
+    # 模型的上下文窗口token数，所有请求（包括预热）使用相同的值，num_ctx变化时Ollama会重新加载模型
+    OLLAMA_NUM_CTX = int(os.environ.get('OLLAMA_NUM_CTX', '8192'))
+    # 模型列表缓存秒数、过期后仍可返回旧列表的秒数，以及后台刷新间隔（0表示不在后台刷新）
+    OLLAMA_MODELS_CACHE_TTL = int(os.environ.get('OLLAMA_MODELS_CACHE_TTL', '300'))
+    OLLAMA_MODELS_STALE_TTL = int(os.environ.get('OLLAMA_MODELS_STALE_TTL', '3600'))
+    OLLAMA_MODELS_REFRESH_INTERVAL = int(os.environ.get('OLLAMA_MODELS_REFRESH_INTERVAL', '0'))
+    # 等待模型生成的最长秒数，超过后返回备用结果，0表示不限制
+    SUMMARY_DEADLINE = float(os.environ.get('SUMMARY_DEADLINE', '20'))
+    DISCUSSION_DEADLINE = float(os.environ.get('DISCUSSION_DEADLINE', '60'))
     
     # 天气API配置
     WEATHER_API_TIMEOUT = int(os.environ.get('WEATHER_API_TIMEOUT', '10'))
+    WEATHER_CACHE_TTL = int(os.environ.get('WEATHER_CACHE_TTL', '600'))
+    WEATHER_CACHE_STALE_TTL = int(os.environ.get('WEATHER_CACHE_STALE_TTL', '3600'))
+    # 按城市缓存的最多条目数，城市名来自请求参数，超出后按LRU淘汰
+    WEATHER_CACHE_SIZE = int(os.environ.get('WEATHER_CACHE_SIZE', '200'))
     
     # 新闻配置
     NEWS_LIMIT = int(os.environ.get('NEWS_LIMIT', '10'))
+    NEWS_API_TIMEOUT = int(os.environ.get('NEWS_API_TIMEOUT', '10'))
+    NEWS_CONTENT_TIMEOUT = int(os.environ.get('NEWS_CONTENT_TIMEOUT', '15'))
+    NEWS_MAX_PAGES = int(os.environ.get('NEWS_MAX_PAGES', '3'))
+    NEWS_PAGE_CONCURRENCY = int(os.environ.get('NEWS_PAGE_CONCURRENCY', '3'))
+    
+    # 新闻后台轮询配置
+    NEWS_POLL_ENABLED = os.environ.get('NEWS_POLL_ENABLED', 'True').lower() == 'true'
+    NEWS_POLL_INTERVAL = int(os.environ.get('NEWS_POLL_INTERVAL', '60'))
+    NEWS_POLL_MAX_INTERVAL = int(os.environ.get('NEWS_POLL_MAX_INTERVAL', '600'))
+    # 第一次成功拉取之前失败时的重试间隔，期间请求直接访问新闻接口
+    NEWS_POLL_RETRY_INTERVAL = int(os.environ.get('NEWS_POLL_RETRY_INTERVAL', '5'))
+    NEWS_BUFFER_SIZE = int(os.environ.get('NEWS_BUFFER_SIZE', '200'))
+    NEWS_INDEX_TOP_K = int(os.environ.get('NEWS_INDEX_TOP_K', '50'))
+    
+    # 新闻正文缓存配置（ARTICLE_CACHE_DB为空时只缓存在内存中）
+    ARTICLE_CACHE_TTL = int(os.environ.get('ARTICLE_CACHE_TTL', '3600'))
+    ARTICLE_CACHE_SIZE = int(os.environ.get('ARTICLE_CACHE_SIZE', '200'))
+    ARTICLE_CACHE_DB = os.environ.get('ARTICLE_CACHE_DB') or None
+    
+    # 多进程共享缓存（SHARED_CACHE_DB为空时每个进程只使用自己的内存缓存）
+    # 设置后天气、新闻列表、新闻正文和AI汇总经过同一个SQLite文件，多个工作进程共用缓存结果
+    SHARED_CACHE_DB = os.environ.get('SHARED_CACHE_DB') or None
+    # 等待其他进程加载同一条目的最长秒数；新闻列表页在共享缓存中保留的秒数
+    SHARED_CACHE_LEASE_TIMEOUT = float(os.environ.get('SHARED_CACHE_LEASE_TIMEOUT', '30'))
+    NEWS_FEED_CACHE_TTL = int(os.environ.get('NEWS_FEED_CACHE_TTL', '30'))
+    
+    # 生产环境多进程服务配置（serve.py），SERVER_WORKERS为0时使用CPU核数
+    SERVER_HOST = os.environ.get('SERVER_HOST', '0.0.0.0')
+    SERVER_PORT = int(os.environ.get('SERVER_PORT', '5000'))
+    SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', '0'))
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS', '8'))
+    
+    # 新闻正文提取器：auto（安装了lxml时使用lxml）、lxml或bs4
+    HTML_EXTRACTOR = os.environ.get('HTML_EXTRACTOR', 'auto')
+    
+    # HTTP连接池配置
+    HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', '10'))
+    HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', '10'))
+    HTTP_MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', '2'))
+    HTTP_BACKOFF_FACTOR = float(os.environ.get('HTTP_BACKOFF_FACTOR', '0.3'))
+    # 异步服务模式下每个HTTP客户端同时打开的最大连接数
+    ASYNC_HTTP_MAX_CONNECTIONS = int(os.environ.get('ASYNC_HTTP_MAX_CONNECTIONS', '100'))
+    
+    # 新闻讨论会话配置
+    CONVERSATION_MAX_SESSIONS = int(os.environ.get('CONVERSATION_MAX_SESSIONS', '1000'))
+    CONVERSATION_TTL = int(os.environ.get('CONVERSATION_TTL', '3600'))
+    CONVERSATION_MAX_BYTES = int(os.environ.get('CONVERSATION_MAX_BYTES', str(16 * 1024 * 1024)))
+    CONVERSATION_MAX_TURNS = int(os.environ.get('CONVERSATION_MAX_TURNS', '10'))
+    CONVERSATION_DB = os.environ.get('CONVERSATION_DB') or None
+    # 多个工作进程共用CONVERSATION_DB时每次都从磁盘读取，serve.py默认开启
+    CONVERSATION_SHARED = os.environ.get('CONVERSATION_SHARED', 'False').lower() == 'true'
+    
+    # AI汇总缓存配置
+    SUMMARY_CACHE_TTL = int(os.environ.get('SUMMARY_CACHE_TTL', '300'))
+    SUMMARY_CACHE_SIZE = int(os.environ.get('SUMMARY_CACHE_SIZE', '256'))
+    # 新闻讨论保存context的最多会话数，过期时间与对话历史相同
+    DISCUSSION_CONTEXT_CACHE_SIZE = int(os.environ.get('DISCUSSION_CONTEXT_CACHE_SIZE', '200'))
+    # context连续复用的最多轮数，以及为下一轮问答预留的token数（context超过OLLAMA_NUM_CTX减去预留时），
+    # 超出后重新发送完整提示词，避免context超过num_ctx后Ollama从开头截断，丢掉正在讨论的新闻正文
+    DISCUSSION_CONTEXT_MAX_TURNS = int(os.environ.get('DISCUSSION_CONTEXT_MAX_TURNS', '4'))
+    DISCUSSION_CONTEXT_RESERVE_TOKENS = int(os.environ.get('DISCUSSION_CONTEXT_RESERVE_TOKENS', '1024'))
     
     # 应用配置
     APP_NAME = 'AI智能体'
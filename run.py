@@ -5,14 +5,13 @@ AI智能体应用启动脚本
 
 import os
 import sys
-from app import app
-from services.ollama_service import OllamaService
+from app import app, registry, start_background_services
 
 def check_ollama():
     """检查Ollama服务是否可用"""
     try:
-        ollama_service = OllamaService()
-        if ollama_service.test_connection():
+        # 使用应用中的Ollama服务，不再单独创建一个实例
+        if registry.ollama_service.test_connection():
             print("✅ Ollama服务连接正常")
             return True
         else:
@@ -35,6 +34,10 @@ def main():
         print("💡 提示: 请确保Ollama已安装并运行在 http://localhost:11434")
         print("💡 安装指南: https://ollama.ai/")
     
+    # 调试模式的重载器会再启动一个子进程处理请求，只在该子进程中启动后台工作
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services()
+    
     # 启动Flask应用
     print("🌐 启动Web服务器...")
     print("📱 访问地址: http://localhost:5000")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+生产环境启动脚本：多进程WSGI服务
+
+不开启调试模式和重载器，每个工作进程各自创建一次服务实例。
+- Linux/macOS: 使用gunicorn预先fork多个工作进程，每个进程用线程池处理请求
+- Windows: 没有fork，使用waitress单进程多线程运行
+- 都没有安装时使用Werkzeug的多线程服务器（不适合生产环境）
+requirements.txt按平台安装gunicorn或waitress
+
+多个工作进程通过SHARED_CACHE_DB指定的SQLite文件共用天气、新闻列表、新闻正文和AI汇总缓存，
+增加进程数不会成倍增加对上游接口和Ollama的请求；未设置时默认使用shared_cache.db。
+新闻讨论的对话历史通过CONVERSATION_DB共用（默认conversations.db），追问由任何工作进程处理都能读到之前的对话；
+CONVERSATION_DB设置为空时只能使用一个工作进程。
+注意：OLLAMA_MAX_CONCURRENCY等生成限制在每个工作进程中分别生效。
+
+用法: python serve.py [--workers 4] [--threads 8] [--host 0.0.0.0] [--port 5000]
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+
+# 必须在导入配置之前设置，工作进程启动时读取
+os.environ.setdefault('SHARED_CACHE_DB', 'shared_cache.db')
+os.environ.setdefault('CONVERSATION_DB', 'conversations.db')
+os.environ.setdefault('CONVERSATION_SHARED', 'True')
+os.environ.setdefault('FLASK_DEBUG', 'False')
+
+from config import Config
+
+
+def run_gunicorn(host, port, workers, threads):
+    """使用gunicorn启动多个工作进程"""
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            options = {
+                'bind': f'{host}:{port}',
+                'workers': workers,
+                'worker_class': 'gthread',
+                'threads': threads,
+                # 流式接口的连接会保持到生成结束，只限制工作进程无响应的时间
+                'timeout': 120,
+                # 不在主进程中导入应用，每个工作进程fork后再创建服务实例和后台线程
+                'preload_app': False
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app import app, start_background_services
+            start_background_services()
+            return app
+
+    Application().run()
+
+
+def run_waitress(host, port, threads):
+    """使用waitress单进程多线程运行"""
+    from waitress import serve
+    from app import app, start_background_services
+    start_background_services()
+    serve(app, host=host, port=port, threads=threads)
+
+
+def run_werkzeug(host, port):
+    """没有安装生产服务器时使用Werkzeug多线程运行，不开启调试和重载"""
+    from app import app, start_background_services
+    start_background_services()
+    app.run(host=host, port=port, debug=False, use_reloader=False, threaded=True)
+
+
+def _installed(module):
+    return importlib.util.find_spec(module) is not None
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='AI智能体生产环境启动脚本')
+    parser.add_argument('--host', default=Config.SERVER_HOST)
+    parser.add_argument('--port', type=int, default=Config.SERVER_PORT)
+    parser.add_argument('--workers', type=int, default=Config.SERVER_WORKERS, help='工作进程数，0表示CPU核数')
+    parser.add_argument('--threads', type=int, default=Config.SERVER_THREADS, help='每个工作进程的线程数')
+    args = parser.parse_args()
+
+    workers = args.workers or os.cpu_count() or 1
+    print(f"🚀 启动AI智能体服务: http://{args.host}:{args.port}")
+    print(f"🗄️  共享缓存: {Config.SHARED_CACHE_DB}   对话历史: {Config.CONVERSATION_DB}")
+
+    if os.name != 'nt':
+        if _installed('gunicorn'):
+            if workers > 1 and not (Config.CONVERSATION_DB and Config.CONVERSATION_SHARED):
+                # 每个工作进程各自保存对话历史时，追问由哪个进程处理决定能否读到之前的对话
+                sys.exit("❌ 多个工作进程需要共用对话历史：请设置CONVERSATION_DB并开启CONVERSATION_SHARED，或使用 --workers 1")
+            print(f"⚙️  gunicorn {workers}个工作进程 x {args.threads}线程")
+            run_gunicorn(args.host, args.port, workers, args.threads)
+            return
+        print("⚠️  未安装gunicorn，无法启动多个工作进程: pip install gunicorn")
+
+    if _installed('waitress'):
+        print(f"⚙️  waitress单进程 x {args.threads}线程")
+        run_waitress(args.host, args.port, args.threads)
+    else:
+        print("⚠️  未安装waitress，使用Werkzeug多线程服务器: pip install waitress")
+        run_werkzeug(args.host, args.port)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n👋 应用已停止")
+        sys.exit(0)
@@ -0,0 +1,483 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    线程安全的TTL缓存，支持过期后继续返回旧值并在后台刷新（stale-while-revalidate）
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = 0, max_size: Optional[int] = None, name: str = 'cache',
+                 shared: Optional['SQLiteCache'] = None):
+        """
+        ttl: 条目保持新鲜的秒数
+        stale_ttl: 过期后仍可返回旧值的额外秒数，0表示不返回旧值
+        max_size: 最大条目数，超出后按LRU淘汰，None表示不限制
+        shared: 多个进程共用的SQLite缓存层，内存未命中时先查询它，写入和加载的结果同时写入它
+        """
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+        self.name = name
+        self.shared = shared
+
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self._refreshing = set()
+
+        self._hits = 0
+        self._misses = 0
+        self._stale_hits = 0
+        self._refreshes = 0
+        self._refresh_errors = 0
+        self._evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        获取新鲜的缓存值，不存在或已过期时返回default
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._data.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+            self._misses += 1
+
+        entry = self._lookup_shared(key)
+        return default if entry is None else entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """
+        写入缓存值，有共享层时同时写入共享层
+        """
+        self._set_local(key, value, ttl)
+        if self.shared is not None:
+            self.shared.set(self._shared_key(key), value, ttl)
+
+    async def get_async(self, key: Hashable, default: Any = None) -> Any:
+        """
+        get的异步版本，查询共享层（SQLite）在线程中进行，不阻塞事件循环
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._data.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+            self._misses += 1
+
+        entry = await self._lookup_shared_async(key)
+        return default if entry is None else entry[0]
+
+    async def set_async(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """
+        set的异步版本，写入共享层在线程中进行
+        """
+        self._set_local(key, value, ttl)
+        if self.shared is not None:
+            await asyncio.to_thread(self.shared.set, self._shared_key(key), value, ttl)
+
+    def _set_local(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            self._evict_locked()
+
+    def _shared_key(self, key: Hashable) -> str:
+        return key if isinstance(key, str) else json.dumps(key, ensure_ascii=False, default=str)
+
+    def _lookup_shared(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """
+        查询共享层，命中时按剩余有效期写回内存，返回(值, 剩余秒数)
+        """
+        if self.shared is None:
+            return None
+        entry = self.shared.lookup(self._shared_key(key))
+        if entry is not None:
+            self._set_local(key, entry[0], entry[1])
+        return entry
+
+    async def _lookup_shared_async(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        if self.shared is None:
+            return None
+        return await asyncio.to_thread(self._lookup_shared, key)
+
+    def _load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        调用loader加载并写入缓存；有共享层时多个进程同时未命中的同一条目只加载一次
+        """
+        if self.shared is None:
+            value = loader()
+            self._set_local(key, value)
+            return value
+        value, ttl = self.shared.load(self._shared_key(key), loader, self.ttl)
+        self._set_local(key, value, ttl)
+        return value
+
+    def lease(self, key: Hashable, timeout: Optional[float] = None) -> Tuple[Any, Optional[str]]:
+        """
+        调用方已经通过get确认未命中、准备自行加载前调用，不计入命中统计
+        有共享层时等待其他进程正在加载的同一条目：返回(值, None)表示对方已经写入；
+        返回(None, 租约)表示由本进程加载，写入后调用release。等待超过timeout秒时抛出TimeoutError
+        """
+        if self.shared is None:
+            return None, None
+        entry, owner = self.shared.lease(self._shared_key(key), timeout)
+        if entry is None:
+            return None, owner
+        self._set_local(key, entry[0], entry[1])
+        return entry[0], None
+
+    def release(self, key: Hashable, lease: Optional[str]):
+        """
+        释放lease取得的租约
+        """
+        if lease is not None:
+            self.shared.release_lease(self._shared_key(key), lease)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        获取缓存值，未命中时调用loader加载
+
+        条目过期但仍在stale_ttl窗口内时，立即返回旧值并在后台线程中刷新；
+        loader抛出的异常会直接传给调用方（后台刷新的异常只计数）。
+        有共享层时，内存未命中的条目先从共享层读取，其他进程正在加载同一条目时等待其结果。
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self._hits += 1
+                    return value
+                if expires_at + self.stale_ttl > now:
+                    self._data.move_to_end(key)
+                    self._stale_hits += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        threading.Thread(
+                            target=self._refresh, args=(key, loader),
+                            name=f'{self.name}-refresh', daemon=True
+                        ).start()
+                    return value
+            self._misses += 1
+
+        return self._load(key, loader)
+
+    async def get_or_load_async(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        get_or_load的异步版本，loader为协程函数；旧值在当前事件循环的后台任务中刷新
+        有共享层时先查询共享层，但不等待其他进程的加载（等待会阻塞事件循环）；共享层的读写在线程中进行
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self._hits += 1
+                    return value
+                if expires_at + self.stale_ttl > now:
+                    self._data.move_to_end(key)
+                    self._stale_hits += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        asyncio.ensure_future(self._refresh_async(key, loader))
+                    return value
+            self._misses += 1
+
+        entry = await self._lookup_shared_async(key)
+        if entry is not None:
+            return entry[0]
+        value = await loader()
+        await self.set_async(key, value)
+        return value
+
+    async def _refresh_async(self, key: Hashable, loader: Callable[[], Awaitable[Any]]):
+        """
+        在后台任务中刷新单个条目，失败时保留旧值
+        """
+        try:
+            if await self._lookup_shared_async(key) is None:
+                await self.set_async(key, await loader())
+            with self._lock:
+                self._refreshes += 1
+        except Exception as e:
+            print(f"缓存{self.name}后台刷新失败: {e}")
+            with self._lock:
+                self._refresh_errors += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any]):
+        """
+        后台刷新单个条目，失败时保留旧值
+        """
+        try:
+            self._load(key, loader)
+            with self._lock:
+                self._refreshes += 1
+        except Exception as e:
+            print(f"缓存{self.name}后台刷新失败: {e}")
+            with self._lock:
+                self._refresh_errors += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def invalidate(self, key: Hashable = None):
+        """
+        删除指定条目，key为None时清空缓存（有共享层时同时删除共享层中的条目）
+        """
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+        if self.shared is not None:
+            self.shared.invalidate(None if key is None else self._shared_key(key))
+
+    def _evict_locked(self):
+        """
+        按LRU淘汰超出容量的条目（调用方需持有锁）
+        """
+        if self.max_size is None:
+            return
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self._evictions += 1
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def stats(self) -> Dict:
+        """
+        获取缓存命中统计
+        """
+        with self._lock:
+            lookups = self._hits + self._misses + self._stale_hits
+            stats = {
+                'name': self.name,
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'stale_ttl': self.stale_ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'stale_hits': self._stale_hits,
+                'refreshes': self._refreshes,
+                'refresh_errors': self._refresh_errors,
+                'evictions': self._evictions,
+                'hit_rate': (self._hits + self._stale_hits) / lookups if lookups else 0
+            }
+        if self.shared is not None:
+            stats['shared'] = self.shared.stats()
+        return stats
+
+
+class SQLiteCache:
+    """
+    基于SQLite文件的TTL缓存，作为内存缓存之下的磁盘层，进程重启后仍然有效
+
+    使用WAL模式，多个工作进程可以同时读写同一个文件，作为进程间共享的缓存层；
+    多个进程同时未命中同一key时，通过租约表只让一个进程加载。
+    key为字符串，value需要可以序列化为JSON。
+    """
+
+    def __init__(self, path: str, ttl: float, name: str = 'disk', table: str = 'cache', lease_timeout: float = 30):
+        """
+        path: SQLite文件路径
+        ttl: 条目有效的秒数
+        table: 表名，同一个文件中的多个缓存使用不同的表
+        lease_timeout: 等待其他进程加载同一条目的最长秒数
+        """
+        self.path = path
+        self.ttl = ttl
+        self.name = name
+        self.table = table
+        self.lease_timeout = lease_timeout
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            f'CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+        self._db.execute(
+            f'CREATE TABLE IF NOT EXISTS {table}_lease (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+        self._db.execute(f'DELETE FROM {table} WHERE expires_at <= ?', (time.time(),))
+        self._db.commit()
+
+        self._hits = 0
+        self._misses = 0
+        self._loads = 0
+        self._lease_waits = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        获取未过期的缓存值，不存在或已过期时返回default
+        """
+        entry = self.lookup(key)
+        return default if entry is None else entry[0]
+
+    def lookup(self, key: str) -> Optional[Tuple[Any, float]]:
+        """
+        获取未过期的缓存值和剩余有效秒数，不存在或已过期时返回None
+        """
+        entry = self._read(key)
+        with self._lock:
+            if entry is not None:
+                self._hits += 1
+            else:
+                self._misses += 1
+        return entry
+
+    def _read(self, key: str) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            row = self._db.execute(f'SELECT value, expires_at FROM {self.table} WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        remaining = row[1] - time.time()
+        return (json.loads(row[0]), remaining) if remaining > 0 else None
+
+    def load(self, key: str, loader: Callable[[], Any], ttl: Optional[float] = None) -> Tuple[Any, float]:
+        """
+        获取缓存值，未命中时调用loader加载并写入，返回(值, 剩余有效秒数)
+
+        多个进程同时未命中同一key时，只有取得租约的进程调用loader，其余进程等待它写入结果，
+        等待超过lease_timeout秒或对方加载失败时自行加载；loader返回None时不写入。
+        """
+        entry = self.lookup(key)
+        if entry is not None:
+            return entry
+
+        entry, owner = self.lease(key)
+        if entry is not None:
+            return entry
+        try:
+            ttl = self.ttl if ttl is None else ttl
+            value = loader()
+            with self._lock:
+                self._loads += 1
+            if value is not None:
+                self.set(key, value, ttl)
+            return value, ttl
+        finally:
+            self.release_lease(key, owner)
+
+    def lease(self, key: str, timeout: Optional[float] = None) -> Tuple[Optional[Tuple[Any, float]], Optional[str]]:
+        """
+        等待其他进程加载key或取得加载key的租约
+        返回(条目, None)表示其他进程已经写入；返回(None, 租约)表示由本进程加载，结束后调用release_lease；
+        等待超过lease_timeout秒时视为对方加载失败，返回(None, None)由本进程自行加载。
+        timeout: 调用方最多等待的秒数，先于lease_timeout到期时抛出TimeoutError
+        """
+        owner = uuid.uuid4().hex
+        start = time.time()
+        waited = False
+        while not self._acquire_lease(key, owner):
+            if not waited:
+                waited = True
+                with self._lock:
+                    self._lease_waits += 1
+            time.sleep(0.05)
+            entry = self._read(key)
+            if entry is not None:
+                return entry, None
+            elapsed = time.time() - start
+            if elapsed >= self.lease_timeout:
+                return None, None
+            if timeout is not None and elapsed >= timeout:
+                raise TimeoutError(f"等待其他进程加载超过{timeout:g}秒")
+
+        # 取得租约前其他进程可能刚好写入并释放了租约
+        entry = self._read(key)
+        if entry is not None:
+            self.release_lease(key, owner)
+            return entry, None
+        return None, owner
+
+    def _acquire_lease(self, key: str, owner: str) -> bool:
+        """
+        尝试取得加载key的租约，已过期的租约视为已释放
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute(f'DELETE FROM {self.table}_lease WHERE key = ? AND expires_at <= ?', (key, now))
+            cursor = self._db.execute(
+                f'INSERT OR IGNORE INTO {self.table}_lease (key, owner, expires_at) VALUES (?, ?, ?)',
+                (key, owner, now + self.lease_timeout)
+            )
+            self._db.commit()
+            return cursor.rowcount == 1
+
+    def release_lease(self, key: str, owner: Optional[str]):
+        """
+        释放lease取得的租约，owner为None时不做任何操作
+        """
+        if owner is None:
+            return
+        with self._lock:
+            self._db.execute(f'DELETE FROM {self.table}_lease WHERE key = ? AND owner = ?', (key, owner))
+            self._db.commit()
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """
+        写入缓存值
+        """
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._db.execute(
+                f'INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, payload, expires_at)
+            )
+            self._db.commit()
+
+    def invalidate(self, key: str = None):
+        """
+        删除指定条目，key为None时清空缓存
+        """
+        with self._lock:
+            if key is None:
+                self._db.execute(f'DELETE FROM {self.table}')
+            else:
+                self._db.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def stats(self) -> Dict:
+        """
+        获取缓存命中统计
+        """
+        with self._lock:
+            size = self._db.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+            lookups = self._hits + self._misses
+            return {
+                'name': self.name,
+                'path': self.path,
+                'size': size,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'loads': self._loads,
+                'lease_waits': self._lease_waits,
+                'hit_rate': self._hits / lookups if lookups else 0
+            }
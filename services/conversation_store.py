@@ -0,0 +1,208 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+class ConversationStore:
+    """
+    有界的新闻讨论对话历史存储
+
+    - 每个会话保留最近max_turns轮问答，超过ttl秒未访问的会话过期删除
+    - 内存中的会话数和问答文本总字节数有上限，超出后按LRU淘汰
+    - 指定db_path时同时写入SQLite：被淘汰的会话下次访问时从磁盘读回，进程重启后会话仍然保留
+    - shared为True时多个工作进程共用同一个SQLite文件：每次读取都以磁盘为准，追加在写事务中读取并写回，
+      不会覆盖其他进程刚保存的对话
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl: float = 3600, max_bytes: int = 16 * 1024 * 1024,
+                 max_turns: int = 10, db_path: Optional[str] = None, shared: bool = False):
+        """
+        max_sessions: 内存中最多保留的会话数
+        ttl: 会话未访问多少秒后过期
+        max_bytes: 内存中问答文本的总字节数上限
+        max_turns: 每个会话保留的对话轮数
+        db_path: SQLite文件路径，None表示只保存在内存中
+        shared: 是否与其他工作进程共用db_path，需要指定db_path
+        """
+        if shared and not db_path:
+            raise ValueError("多个工作进程共用对话历史需要指定db_path")
+        self.shared = shared
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_turns = max_turns
+        self.db_path = db_path
+
+        self._sessions = OrderedDict()  # session_id -> (history, size, last_access)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self._evictions = 0
+        self._expirations = 0
+        self._disk_loads = 0
+
+        self._db = None
+        self._in_transaction = False
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS conversations ('
+                'session_id TEXT PRIMARY KEY, history TEXT NOT NULL, last_access REAL NOT NULL)'
+            )
+            self._db.execute('DELETE FROM conversations WHERE last_access < ?', (time.time() - ttl,))
+            self._db.commit()
+
+    def get(self, session_id: str) -> List[Tuple[str, str]]:
+        """
+        获取会话的对话历史（副本），不存在或已过期时返回空列表
+        """
+        with self._lock:
+            history = self._load_locked(session_id)
+            return list(history) if history else []
+
+    def append(self, session_id: str, question: str, answer: str) -> int:
+        """
+        保存一轮对话，返回当前对话轮数
+        """
+        with self._lock:
+            self._expire_locked(time.time())
+            if self.shared:
+                # 锁住数据库直到写回，读取和写入之间其他工作进程不能追加
+                self._db.execute('BEGIN IMMEDIATE')
+                self._in_transaction = True
+            try:
+                history = list(self._load_locked(session_id) or [])
+                history.append((question, answer))
+                # 只保留最近几轮对话，避免历史过长
+                history = history[-self.max_turns:]
+                now = time.time()
+                self._put_locked(session_id, history, now)
+                if self._db is not None:
+                    self._db.execute(
+                        'INSERT OR REPLACE INTO conversations (session_id, history, last_access) VALUES (?, ?, ?)',
+                        (session_id, json.dumps(history, ensure_ascii=False), now)
+                    )
+                    self._db.commit()
+            except BaseException:
+                if self._in_transaction:
+                    self._db.rollback()
+                raise
+            finally:
+                self._in_transaction = False
+            return len(history)
+
+    def clear(self, session_id: str):
+        """
+        删除会话的对话历史
+        """
+        with self._lock:
+            self._remove_locked(session_id)
+            if self._db is not None:
+                self._db.execute('DELETE FROM conversations WHERE session_id = ?', (session_id,))
+                self._db.commit()
+
+    def _load_locked(self, session_id: str) -> Optional[List[Tuple[str, str]]]:
+        """
+        从内存或磁盘读取会话并刷新访问时间（调用方需持有锁）
+        共用数据库时内存中的副本可能已被其他工作进程更新，总是从磁盘读取
+        """
+        now = time.time()
+        self._expire_locked(now)
+
+        entry = self._sessions.get(session_id)
+        if entry is not None and not self.shared:
+            history, size, _ = entry
+            self._sessions[session_id] = (history, size, now)
+            self._sessions.move_to_end(session_id)
+            return history
+
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            'SELECT history, last_access FROM conversations WHERE session_id = ?', (session_id,)
+        ).fetchone()
+        if row is None:
+            # 其他工作进程已清除
+            self._remove_locked(session_id)
+            return None
+        if row[1] + self.ttl <= now:
+            self._remove_locked(session_id)
+            self._db.execute('DELETE FROM conversations WHERE session_id = ?', (session_id,))
+            self._commit_locked()
+            self._expirations += 1
+            return None
+
+        history = [tuple(turn) for turn in json.loads(row[0])]
+        self._disk_loads += 1
+        self._put_locked(session_id, history, now)
+        return history
+
+    def _put_locked(self, session_id: str, history: List[Tuple[str, str]], now: float):
+        """
+        写入内存并按会话数和字节数上限淘汰（调用方需持有锁）
+        """
+        self._remove_locked(session_id)
+        size = sum(len(q.encode('utf-8')) + len(a.encode('utf-8')) for q, a in history)
+        self._sessions[session_id] = (history, size, now)
+        self._bytes += size
+
+        # 至少保留当前会话；被淘汰的会话在磁盘上仍然保留
+        while len(self._sessions) > 1 and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+            _, (_, evicted_size, _) = self._sessions.popitem(last=False)
+            self._bytes -= evicted_size
+            self._evictions += 1
+
+    def _remove_locked(self, session_id: str):
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def _expire_locked(self, now: float):
+        """
+        删除超过ttl未访问的会话，按访问顺序排列，只需检查最久未访问的一端（调用方需持有锁）
+        """
+        while self._sessions:
+            session_id, (_, size, last_access) = next(iter(self._sessions.items()))
+            if last_access + self.ttl > now:
+                break
+            self._sessions.popitem(last=False)
+            self._bytes -= size
+            self._expirations += 1
+            if self._db is not None:
+                # 其他工作进程可能刚访问过，只删除磁盘上同样过期的会话
+                self._db.execute(
+                    'DELETE FROM conversations WHERE session_id = ? AND last_access <= ?', (session_id, now - self.ttl)
+                )
+                self._commit_locked()
+
+    def _commit_locked(self):
+        # append的写事务在写回后统一提交
+        if not self._in_transaction:
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def stats(self) -> Dict:
+        """
+        获取会话数、内存占用和淘汰统计
+        """
+        with self._lock:
+            stats = {
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'disk_loads': self._disk_loads
+            }
+            if self._db is not None:
+                stats['disk_sessions'] = self._db.execute('SELECT COUNT(*) FROM conversations').fetchone()[0]
+            return stats
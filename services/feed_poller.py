@@ -0,0 +1,188 @@
+import threading
+import time
+from collections import deque
+from itertools import islice
+from typing import Callable, Dict, List, Optional
+
+
+class FeedPoller:
+    """
+    后台定时轮询新闻接口，增量写入环形缓冲区
+
+    - 按docid/url去重，只把新条目（经transform转换后）加入缓冲区，缓冲区满后丢弃最旧的条目
+    - 没有新条目或请求失败时轮询间隔加倍（不超过max_interval），有新条目时恢复；
+      还没有成功拉取过时不退避，每隔retry_interval秒重试
+    - latest(n)按从新到旧返回前n条，耗时只与n有关
+    """
+
+    def __init__(self, fetch: Callable[[], Optional[List[Dict]]], transform: Optional[Callable[[Dict], Dict]] = None,
+                 interval: float = 60, max_interval: float = 600, buffer_size: int = 200, name: str = 'feed',
+                 on_add: Optional[Callable] = None, on_evict: Optional[Callable] = None, retry_interval: float = 5):
+        """
+        fetch: 返回从新到旧排列的原始条目，失败时返回None或抛出异常
+        transform: 新条目写入缓冲区前的转换，每个条目只转换一次
+        on_add/on_evict: 条目写入（按从旧到新的顺序）和被丢弃时的回调，参数为(key, 条目)和key
+        interval: 正常轮询间隔秒数
+        max_interval: 退避后的最大轮询间隔秒数
+        retry_interval: 第一次成功拉取之前失败时的重试间隔秒数
+        buffer_size: 缓冲区保留的最大条目数
+        """
+        self.fetch = fetch
+        self.transform = transform
+        self.on_add = on_add
+        self.on_evict = on_evict
+        self.interval = interval
+        self.max_interval = max_interval
+        self.retry_interval = retry_interval
+        self.buffer_size = buffer_size
+        self.name = name
+
+        self._buffer = deque()  # (key, 条目)，从新到旧
+        self._seen = set()
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._current_interval = interval
+        self._polls = 0
+        self._errors = 0
+        self._new_items = 0
+        self._last_poll = None
+        self._last_success = None
+        self._last_new_item = None
+
+    @staticmethod
+    def item_key(item: Dict):
+        """
+        条目去重的key：优先使用docid，没有时使用url
+        """
+        return item.get('docid') or item.get('url') or item.get('title')
+
+    def poll_once(self) -> int:
+        """
+        拉取一次并写入新条目，返回新条目数量；失败时返回-1
+        """
+        try:
+            items = self.fetch()
+            if items is None:
+                raise ValueError('接口返回错误状态')
+        except Exception as e:
+            print(f"轮询{self.name}失败: {e}")
+            with self._lock:
+                self._polls += 1
+                self._errors += 1
+                self._last_poll = time.time()
+                if self._last_success is None:
+                    # 缓冲区还是空的，尽快重试
+                    self._current_interval = min(self.retry_interval, self.interval)
+                else:
+                    self._current_interval = min(self._current_interval * 2, self.max_interval)
+            return -1
+
+        with self._lock:
+            new_items = []
+            keys = set()
+            for item in items:
+                key = self.item_key(item)
+                if key is not None and key not in self._seen and key not in keys:
+                    keys.add(key)
+                    new_items.append((key, item))
+        if self.transform is not None:
+            new_items = self._transform_items(new_items)
+
+        with self._lock:
+            # 写入缓冲区时才标记为已见过，转换失败的条目下次轮询时重试
+            new_items = [(key, item) for key, item in new_items if key not in self._seen]
+            # 接口按从新到旧返回，倒序插入到缓冲区头部
+            new_count = len(new_items)
+            for key, item in reversed(new_items):
+                self._seen.add(key)
+                self._buffer.appendleft((key, item))
+                if self.on_add is not None:
+                    self.on_add(key, item)
+                if len(self._buffer) > self.buffer_size:
+                    evicted_key = self._buffer.pop()[0]
+                    self._seen.discard(evicted_key)
+                    if self.on_evict is not None:
+                        self.on_evict(evicted_key)
+
+            now = time.time()
+            self._polls += 1
+            self._new_items += new_count
+            self._last_poll = now
+            self._last_success = now
+            if new_count:
+                self._last_new_item = now
+                self._current_interval = self.interval
+            else:
+                self._current_interval = min(self._current_interval * 2, self.max_interval)
+            return new_count
+
+    def _transform_items(self, items: List) -> List:
+        """
+        逐条转换新条目，跳过转换失败的条目
+        """
+        transformed = []
+        for key, item in items:
+            try:
+                transformed.append((key, self.transform(item)))
+            except Exception as e:
+                print(f"转换{self.name}条目{key}失败: {e}")
+        return transformed
+
+    def latest(self, limit: int) -> List[Dict]:
+        """
+        返回最新的limit条条目
+        """
+        with self._lock:
+            return [item for _, item in islice(self._buffer, limit)]
+
+    def start(self):
+        """
+        启动后台轮询；还没有拉取过时先同步拉取一次，保证缓冲区有数据
+        """
+        with self._start_lock:
+            if self.running:
+                return
+            if self._last_success is None:
+                self.poll_once()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f'{self.name}-poller', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        停止后台轮询
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while not self._stop.wait(self._current_interval):
+            self.poll_once()
+
+    def stats(self) -> Dict:
+        """
+        获取轮询状态；lag为距上次成功拉取的秒数
+        """
+        now = time.time()
+        with self._lock:
+            return {
+                'name': self.name,
+                'running': self.running,
+                'buffer_size': len(self._buffer),
+                'max_buffer_size': self.buffer_size,
+                'interval': self._current_interval,
+                'polls': self._polls,
+                'errors': self._errors,
+                'new_items': self._new_items,
+                'lag': now - self._last_success if self._last_success else None,
+                'last_new_item_age': now - self._last_new_item if self._last_new_item else None
+            }
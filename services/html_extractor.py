@@ -0,0 +1,246 @@
+import codecs
+import re
+from typing import Iterable, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+# 正文选择器，按优先级排列
+CONTENT_SELECTORS = [
+    '.article-content',
+    '.article-body',
+    '.content',
+    '.main-content',
+    '.article',
+    '.news-content',
+    '#artibody',
+    '.article-content-left',
+    '.article-body-content'
+]
+
+# 标题选择器，按优先级排列
+TITLE_SELECTORS = [
+    'h1',
+    '.article-title',
+    '.title',
+    '.headline',
+    '.article-headline'
+]
+
+# 没有匹配正文选择器时，只保留长度超过该值的段落
+MIN_PARAGRAPH_LENGTH = 50
+
+# 不包含正文的标签，解析后直接删除
+SKIP_TAGS = ('script', 'style', 'noscript')
+
+_CHARSET_PATTERN = re.compile(r'charset=["\']?([\w.:-]+)', re.IGNORECASE)
+_META_CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset=["\']?([\w.:-]+)', re.IGNORECASE)
+
+# 网页中声明的编码实际常用其超集编码
+_ENCODING_ALIASES = {
+    'gb2312': 'gb18030',
+    'gbk': 'gb18030'
+}
+
+
+def detect_encoding(content: bytes, content_type: str = '') -> Optional[str]:
+    """
+    从Content-Type响应头或页面开头的<meta>标签中读取编码，都没有声明时返回None
+    """
+    match = _CHARSET_PATTERN.search(content_type or '')
+    if match is None:
+        match = _META_CHARSET_PATTERN.search(content[:4096])
+    if match is None:
+        return None
+
+    encoding = match.group(1)
+    if isinstance(encoding, bytes):
+        encoding = encoding.decode('ascii', 'ignore')
+    encoding = _ENCODING_ALIASES.get(encoding.lower(), encoding)
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        return None
+    return encoding
+
+
+class SelectorSet:
+    """
+    按优先级排列的简单选择器（标签名、.class、#id）
+
+    遍历一次文档即可找出与select逐个尝试相同的结果：优先级最高的选择器匹配到的第一个元素。
+    """
+
+    def __init__(self, selectors):
+        self.by_tag = {}
+        self.by_class = {}
+        self.by_id = {}
+        for priority, selector in enumerate(selectors):
+            if selector.startswith('.'):
+                self.by_class.setdefault(selector[1:], priority)
+            elif selector.startswith('#'):
+                self.by_id.setdefault(selector[1:], priority)
+            else:
+                self.by_tag.setdefault(selector, priority)
+
+    def priority(self, tag: str, classes: Iterable[str], element_id: Optional[str]) -> Optional[int]:
+        """
+        返回元素匹配的最高优先级，不匹配时返回None
+        """
+        best = self.by_tag.get(tag)
+        for name in classes:
+            priority = self.by_class.get(name)
+            if priority is not None and (best is None or priority < best):
+                best = priority
+        if element_id:
+            priority = self.by_id.get(element_id)
+            if priority is not None and (best is None or priority < best):
+                best = priority
+        return best
+
+
+CONTENT_SELECTOR_SET = SelectorSet(CONTENT_SELECTORS)
+TITLE_SELECTOR_SET = SelectorSet(TITLE_SELECTORS)
+
+
+def _match_elements(elements):
+    """
+    一次遍历同时匹配正文和标题选择器
+    elements: 按文档顺序排列的(元素, 标签名, class列表, id)
+    返回(正文元素, 标题元素)，没有匹配时为None
+    """
+    content, content_priority = None, None
+    title, title_priority = None, None
+    for element, tag, classes, element_id in elements:
+        priority = CONTENT_SELECTOR_SET.priority(tag, classes, element_id)
+        if priority is not None and (content_priority is None or priority < content_priority):
+            content, content_priority = element, priority
+        priority = TITLE_SELECTOR_SET.priority(tag, classes, element_id)
+        if priority is not None and (title_priority is None or priority < title_priority):
+            title, title_priority = element, priority
+        if content_priority == 0 and title_priority == 0:
+            break
+    return content, title
+
+
+class BeautifulSoupExtractor:
+    """
+    基于BeautifulSoup的正文提取，不依赖额外的C扩展
+    """
+
+    name = 'bs4'
+
+    def __init__(self, parser: str = 'html.parser'):
+        self.parser = parser
+
+    def extract(self, html: str) -> Tuple[str, str]:
+        """
+        提取标题和正文，返回(标题, 正文)
+        """
+        soup = BeautifulSoup(html, self.parser)
+        for element in soup(SKIP_TAGS):
+            element.decompose()
+
+        content_element, title_element = _match_elements(
+            (element, element.name, element.get('class') or (), element.get('id'))
+            for element in soup.find_all(True)
+        )
+
+        if content_element is not None:
+            content = content_element.get_text(strip=True)
+        else:
+            content = ''
+        # 如果没有找到特定选择器，提取所有较长的段落
+        if not content:
+            texts = (p.get_text(strip=True) for p in soup.find_all('p'))
+            content = '\n'.join(text for text in texts if len(text) > MIN_PARAGRAPH_LENGTH)
+
+        title = title_element.get_text(strip=True) if title_element is not None else ''
+        if not title:
+            title_tag = soup.find('title')
+            title = title_tag.get_text(strip=True) if title_tag else '未知标题'
+
+        return title, content
+
+
+class LxmlExtractor:
+    """
+    基于lxml（libxml2）的正文提取
+
+    解析时丢弃注释和处理指令，删除script/style后只遍历元素节点，
+    只对选中的正文和标题元素拼接文本。
+    """
+
+    name = 'lxml'
+
+    def __init__(self):
+        if not HAS_LXML:
+            raise ImportError('lxml未安装')
+        self.parser = lxml_html.HTMLParser(remove_comments=True, remove_pis=True)
+        self._paragraphs = etree.XPath('//p')
+        self._title = etree.XPath('//title')
+
+    def extract(self, html: str) -> Tuple[str, str]:
+        """
+        提取标题和正文，返回(标题, 正文)
+        """
+        try:
+            root = lxml_html.document_fromstring(html, parser=self.parser)
+        except ValueError:
+            # 带有XML编码声明的字符串需要以字节形式解析
+            root = lxml_html.document_fromstring(html.encode('utf-8'), parser=self.parser)
+        except etree.ParserError:
+            return '未知标题', ''
+        etree.strip_elements(root, *SKIP_TAGS, with_tail=False)
+
+        content_element, title_element = _match_elements(
+            (element, element.tag, element.get('class', '').split(), element.get('id'))
+            for element in root.iter(etree.Element)
+        )
+
+        content = self._text(content_element) if content_element is not None else ''
+        # 如果没有找到特定选择器，提取所有较长的段落
+        if not content:
+            texts = (self._text(p) for p in self._paragraphs(root))
+            content = '\n'.join(text for text in texts if len(text) > MIN_PARAGRAPH_LENGTH)
+
+        title = self._text(title_element) if title_element is not None else ''
+        if not title:
+            title_tags = self._title(root)
+            title = self._text(title_tags[0]) if title_tags else '未知标题'
+
+        return title, content
+
+    def _text(self, element) -> str:
+        """
+        与BeautifulSoup的get_text(strip=True)相同：拼接去除首尾空白后的各段文本
+        """
+        return ''.join(text.strip() for text in element.itertext())
+
+
+EXTRACTORS = {
+    'bs4': BeautifulSoupExtractor,
+    'lxml': LxmlExtractor
+}
+
+
+def create_extractor(name: str = 'auto'):
+    """
+    创建正文提取器
+    name: 'auto'在安装了lxml时使用lxml，否则使用BeautifulSoup；也可以指定'lxml'或'bs4'
+    """
+    name = (name or 'auto').lower()
+    if name == 'auto':
+        name = 'lxml' if HAS_LXML else 'bs4'
+    if name == 'lxml' and not HAS_LXML:
+        print("lxml未安装，使用BeautifulSoup提取新闻正文")
+        name = 'bs4'
+    if name not in EXTRACTORS:
+        raise ValueError(f"未知的正文提取器: {name}")
+    return EXTRACTORS[name]()
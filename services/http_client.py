@@ -0,0 +1,233 @@
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from services.metrics import observe_upstream
+
+
+class PooledHTTPClient:
+    """
+    带连接池的HTTP客户端
+
+    所有线程共享同一组连接池（keep-alive复用TCP/TLS连接），每个线程使用独立的
+    requests.Session，避免在线程间共享cookie等会话状态。
+    """
+
+    def __init__(self, name: str, timeout: float, pool_connections: int = 10, pool_maxsize: int = 10,
+                 max_retries: int = 2, backoff_factor: float = 0.3,
+                 host_pool_sizes: Optional[Dict[str, int]] = None, headers: Optional[Dict[str, str]] = None,
+                 upstream: Optional[str] = None):
+        """
+        name: 客户端名称，用于统计
+        timeout: 默认超时秒数
+        pool_connections: 缓存的主机连接池数量
+        pool_maxsize: 每个主机连接池保留的最大连接数
+        host_pool_sizes: 按URL前缀单独设置连接池大小，例如 {'http://wttr.in': 4}
+        upstream: 指标中的上游名称，默认与name相同
+        """
+        self.name = name
+        self.upstream = upstream or name
+        self.timeout = timeout
+        self.headers = headers or {}
+
+        # 只重试连接错误和429/5xx响应；读取超时不重试，timeout即为等待上游响应的上限
+        self.retry = Retry(
+            total=max_retries,
+            read=False,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False
+        )
+
+        # 默认适配器，外加按主机前缀单独设置大小的适配器
+        self.adapters = {
+            'http://': self._create_adapter(pool_connections, pool_maxsize),
+            'https://': self._create_adapter(pool_connections, pool_maxsize)
+        }
+        for prefix, size in (host_pool_sizes or {}).items():
+            self.adapters[prefix] = self._create_adapter(1, size)
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+        self._timeouts = 0
+
+    def _create_adapter(self, pool_connections: int, pool_maxsize: int) -> HTTPAdapter:
+        return HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=self.retry
+        )
+
+    def _session(self) -> requests.Session:
+        """
+        获取当前线程的Session，所有Session挂载同一组适配器
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            for prefix, adapter in self.adapters.items():
+                session.mount(prefix, adapter)
+            self._local.session = session
+        return session
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        发送GET请求，未指定timeout时使用默认超时
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        with self._lock:
+            self._requests += 1
+        start = time.perf_counter()
+        try:
+            response = self._session().get(url, **kwargs)
+        except requests.Timeout:
+            observe_upstream(self.upstream, 'timeout', time.perf_counter() - start)
+            with self._lock:
+                self._errors += 1
+                self._timeouts += 1
+            raise
+        except requests.RequestException:
+            observe_upstream(self.upstream, 'error', time.perf_counter() - start)
+            with self._lock:
+                self._errors += 1
+            raise
+        observe_upstream(self.upstream, 'http_error' if response.status_code >= 400 else 'ok', time.perf_counter() - start)
+        return response
+
+    def stats(self) -> Dict:
+        """
+        获取请求和连接池使用统计
+        """
+        hosts = {}
+        for adapter in set(self.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                hosts[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                    'connections_opened': pool.num_connections,
+                    'requests': pool.num_requests,
+                    'idle_connections': pool.pool.qsize() if pool.pool is not None else 0,
+                    'pool_maxsize': pool.pool.maxsize if pool.pool is not None else 0
+                }
+
+        with self._lock:
+            return {
+                'name': self.name,
+                'requests': self._requests,
+                'errors': self._errors,
+                'timeouts': self._timeouts,
+                'hosts': hosts
+            }
+
+
+class AsyncHTTPClient:
+    """
+    异步HTTP客户端，异步服务模式下使用
+
+    基于httpx.AsyncClient，一个事件循环中的所有协程共享同一个连接池，等待上游响应时不占用线程；
+    同时进行的请求数由信号量限制在max_connections以内（httpcore连接池排队的开销随排队数增长）；
+    连接错误和429/5xx响应按backoff_factor指数退避后重试，读取超时不重试。
+    """
+
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+
+    def __init__(self, name: str, timeout: float, max_connections: int = 100, max_keepalive: int = 20,
+                 max_retries: int = 2, backoff_factor: float = 0.3, headers: Optional[Dict[str, str]] = None,
+                 upstream: Optional[str] = None):
+        """
+        name: 客户端名称，用于统计
+        timeout: 默认超时秒数
+        max_connections: 同时打开的最大连接数
+        max_keepalive: 保留的最大空闲连接数
+        upstream: 指标中的上游名称，默认与name相同
+        """
+        self.name = name
+        self.upstream = upstream or name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.headers = headers or {}
+        self.max_connections = max_connections
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+
+        self._client = None
+        self._semaphore = None
+        self._requests = 0
+        self._errors = 0
+        self._timeouts = 0
+        self._retries = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(headers=self.headers, limits=self.limits, timeout=self.timeout)
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+        return self._client
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """
+        发送GET请求，未指定timeout时使用默认超时
+        """
+        self._requests += 1
+        client = self._get_client()
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    response = await client.get(url, **kwargs)
+                if response.status_code not in self.RETRY_STATUS or attempt >= self.max_retries:
+                    outcome = 'http_error' if response.status_code >= 400 else 'ok'
+                    observe_upstream(self.upstream, outcome, time.perf_counter() - start)
+                    return response
+            except (httpx.PoolTimeout, httpx.ReadTimeout):
+                # 本地连接池拥塞时重试只会加重排队；上游响应慢时重试会使等待时间成倍增加
+                observe_upstream(self.upstream, 'timeout', time.perf_counter() - start)
+                self._errors += 1
+                self._timeouts += 1
+                raise
+            except httpx.TimeoutException:
+                if attempt >= self.max_retries:
+                    observe_upstream(self.upstream, 'timeout', time.perf_counter() - start)
+                    self._errors += 1
+                    self._timeouts += 1
+                    raise
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    observe_upstream(self.upstream, 'error', time.perf_counter() - start)
+                    self._errors += 1
+                    raise
+            attempt += 1
+            self._retries += 1
+            await asyncio.sleep(self.backoff_factor * (2 ** (attempt - 1)))
+
+    async def aclose(self):
+        """
+        关闭连接池
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict:
+        """
+        获取请求统计
+        """
+        return {
+            'name': self.name,
+            'requests': self._requests,
+            'errors': self._errors,
+            'timeouts': self._timeouts,
+            'retries': self._retries
+        }
@@ -0,0 +1,239 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+# 优先级：数值越小越先执行
+INTERACTIVE = 0  # 新闻讨论等用户正在等待的对话
+BATCH = 1  # 汇总报告
+
+PRIORITY_NAMES = {
+    INTERACTIVE: 'interactive',
+    BATCH: 'batch'
+}
+
+
+class SchedulerBusyError(Exception):
+    """
+    等待队列已满或排队超时
+    """
+
+
+class LLMScheduler:
+    """
+    限制同时进行的模型生成数量，排队的请求按优先级（同优先级按先后）获得执行槽位
+
+    队列已满时立即抛出SchedulerBusyError，排队超过timeout秒时同样抛出，调用方据此返回备用结果。
+    队列已满但有优先级更低的请求在排队时，挤出其中最后排队的一个（该请求抛出SchedulerBusyError），
+    汇总报告排满队列时新闻讨论仍然可以排队。
+    """
+
+    def __init__(self, max_concurrency: int = 2, max_queue: int = 16, timeout: float = 30, name: str = 'llm'):
+        """
+        max_concurrency: 同时进行的最大生成数
+        max_queue: 最多排队的请求数
+        timeout: 默认的最长排队秒数
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.name = name
+
+        self._condition = threading.Condition()
+        self._waiters = []  # (优先级, 序号)
+        self._evicted = set()  # 被优先级更高的请求挤出队列、尚未返回的等待者
+        self._async_waiters = {}  # 在事件循环中等待的请求：序号 -> (事件循环, asyncio.Event)
+        self._counter = itertools.count()
+        self._in_flight = 0
+        self._local = threading.local()  # run_holding中的线程已持有槽位，depth为嵌套获取的层数
+
+        self._started = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def acquire(self, priority: int = BATCH, timeout: Optional[float] = None):
+        """
+        获取执行槽位，队列已满或等待超时时抛出SchedulerBusyError
+        """
+        depth = getattr(self._local, 'depth', 0)
+        if depth:
+            self._local.depth = depth + 1
+            return
+        
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        with self._condition:
+            ticket = self._enqueue_locked(priority)
+            if ticket is None:
+                return
+            deadline = start + timeout
+            while not self._take_locked(ticket, start):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._expire_locked(ticket, timeout)
+                self._condition.wait(remaining)
+
+    async def acquire_async(self, priority: int = BATCH, timeout: Optional[float] = None):
+        """
+        acquire的异步版本：在事件循环中等待槽位，排队期间不占用线程
+        与同步请求共用同一个队列；排队期间被取消时退出队列
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        event = asyncio.Event()
+        with self._condition:
+            ticket = self._enqueue_locked(priority)
+            if ticket is None:
+                return
+            self._async_waiters[ticket] = (asyncio.get_running_loop(), event)
+        deadline = start + timeout
+        try:
+            while True:
+                with self._condition:
+                    event.clear()
+                    if self._take_locked(ticket, start):
+                        return
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._expire_locked(ticket, timeout)
+                try:
+                    await asyncio.wait_for(event.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            with self._condition:
+                self._evicted.discard(ticket)
+                if ticket in self._waiters:
+                    self._remove_locked(ticket)
+            raise
+        finally:
+            with self._condition:
+                self._async_waiters.pop(ticket, None)
+
+    def _enqueue_locked(self, priority):
+        """
+        有空闲槽位且无人排队时直接占用并返回None，否则加入队列并返回排队序号
+        """
+        if self._in_flight < self.max_concurrency and not self._waiters:
+            self._in_flight += 1
+            self._started += 1
+            return None
+        if len(self._waiters) >= self.max_queue:
+            # 优先级最低的请求中最后排队的一个
+            lowest = max(self._waiters, default=None)
+            if lowest is None or lowest[0] <= priority:
+                self._rejected += 1
+                raise SchedulerBusyError(f"模型繁忙：{len(self._waiters)}个请求正在排队")
+            self._evicted.add(lowest)
+            self._rejected += 1
+            self._remove_locked(lowest)
+
+        ticket = (priority, next(self._counter))
+        heapq.heappush(self._waiters, ticket)
+        return ticket
+
+    def _take_locked(self, ticket, start) -> bool:
+        """
+        排在队首且有空闲槽位时占用槽位，被挤出队列时抛出SchedulerBusyError
+        """
+        if ticket in self._evicted:
+            self._evicted.remove(ticket)
+            raise SchedulerBusyError("模型繁忙：被优先级更高的请求挤出队列")
+        if self._waiters[0] != ticket or self._in_flight >= self.max_concurrency:
+            return False
+        heapq.heappop(self._waiters)
+        self._in_flight += 1
+        self._started += 1
+        waited = time.monotonic() - start
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        self._notify_locked()
+        return True
+
+    def _expire_locked(self, ticket, timeout):
+        self._timeouts += 1
+        self._remove_locked(ticket)
+        raise SchedulerBusyError(f"模型繁忙：排队超过{timeout:g}秒")
+
+    def _remove_locked(self, ticket):
+        self._waiters.remove(ticket)
+        heapq.heapify(self._waiters)
+        # 队首变化后其他等待者可能可以执行
+        self._notify_locked()
+
+    def _notify_locked(self):
+        """
+        唤醒所有等待者，包括在事件循环中等待的请求
+        """
+        self._condition.notify_all()
+        for loop, event in self._async_waiters.values():
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # 事件循环已经关闭
+                pass
+
+    def release(self):
+        """
+        释放执行槽位
+        """
+        depth = getattr(self._local, 'depth', 0)
+        if depth > 1:
+            self._local.depth = depth - 1
+            return
+        
+        with self._condition:
+            self._in_flight -= 1
+            self._completed += 1
+            self._notify_locked()
+
+    @contextmanager
+    def slot(self, priority: int = BATCH, timeout: Optional[float] = None):
+        """
+        在with块内占用一个执行槽位
+        """
+        self.acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def run_holding(self, fn: Callable, *args, **kwargs):
+        """
+        在调用方已经acquire的槽位中执行fn，结束后释放槽位
+        用于先在请求线程中排队获取槽位、再交给线程池执行：fn中再次获取槽位时不再排队
+        """
+        self._local.depth = 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._local.depth = 0
+            self.release()
+
+    def stats(self) -> Dict:
+        """
+        获取并发和排队统计
+        """
+        with self._condition:
+            queued = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _ in self._waiters:
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                queued[name] = queued.get(name, 0) + 1
+            return {
+                'name': self.name,
+                'in_flight': self._in_flight,
+                'max_concurrency': self.max_concurrency,
+                'queued': queued,
+                'max_queue': self.max_queue,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'timeouts': self._timeouts,
+                'avg_wait': self._wait_total / self._started if self._started else 0,
+                'max_wait': self._wait_max
+            }
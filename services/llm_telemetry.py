@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, List
+
+# Ollama返回的计数和耗时字段，耗时单位为纳秒
+COUNT_FIELDS = ('prompt_eval_count', 'eval_count')
+DURATION_FIELDS = ('load_duration', 'prompt_eval_duration', 'eval_duration', 'total_duration')
+
+# 按(模型, 调用类型)累计的字段，耗时单位为毫秒
+TOTAL_FIELDS = ('prompt_eval_count', 'eval_count', 'load_ms', 'prompt_eval_ms', 'eval_ms', 'total_ms')
+
+
+def _per_second(count, ms) -> float:
+    return count / (ms / 1000) if ms else 0.0
+
+
+class LLMTelemetry:
+    """
+    记录每次生成的token数和耗时，按模型和调用类型（summary/discussion/warmup等）汇总
+
+    load_ms为加载模型、prompt_eval_ms为计算提示词、eval_ms为逐个生成token的耗时，
+    据此区分延迟来自模型加载、提示词长度还是生成速度，并比较不同模型的实际生成速度。
+    """
+
+    def __init__(self, recent_size: int = 20):
+        """
+        recent_size: 保留的最近调用记录数
+        """
+        self._totals = {}  # (模型, 调用类型) -> 累计值
+        self._recent = deque(maxlen=recent_size)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def call_stats(response: Dict) -> Dict:
+        """
+        从Ollama的返回（或流式输出的最后一个片段）中取出本次调用的token数、耗时（毫秒）和速度
+        """
+        call = {field: response.get(field) or 0 for field in COUNT_FIELDS}
+        for field in DURATION_FIELDS:
+            call[field.replace('_duration', '_ms')] = (response.get(field) or 0) / 1e6
+        call['prompt_tokens_per_sec'] = _per_second(call['prompt_eval_count'], call['prompt_eval_ms'])
+        call['tokens_per_sec'] = _per_second(call['eval_count'], call['eval_ms'])
+        return call
+
+    def record(self, model: str, endpoint: str, response: Dict) -> Dict:
+        """
+        记录一次调用，返回本次调用的统计
+        """
+        call = self.call_stats(response)
+        key = (model, endpoint)
+        with self._lock:
+            totals = self._totals.get(key)
+            if totals is None:
+                totals = self._totals[key] = dict.fromkeys(('calls',) + TOTAL_FIELDS, 0)
+                totals['max_load_ms'] = 0.0
+            totals['calls'] += 1
+            for field in TOTAL_FIELDS:
+                totals[field] += call[field]
+            totals['max_load_ms'] = max(totals['max_load_ms'], call['load_ms'])
+            self._recent.append(dict(call, model=model, endpoint=endpoint, time=time.time()))
+        return call
+
+    @staticmethod
+    def _summarize(totals: Dict) -> Dict:
+        """
+        由累计值计算平均耗时和按总量计算的速度（长输出的调用权重更大）
+        """
+        calls = totals['calls']
+        summary = dict(totals)
+        for field in TOTAL_FIELDS:
+            summary[f'avg_{field}'] = totals[field] / calls if calls else 0
+        summary['prompt_tokens_per_sec'] = _per_second(totals['prompt_eval_count'], totals['prompt_eval_ms'])
+        summary['tokens_per_sec'] = _per_second(totals['eval_count'], totals['eval_ms'])
+        return summary
+
+    @staticmethod
+    def _merge(items: List[Dict]) -> Dict:
+        merged = {}
+        for totals in items:
+            for field, value in totals.items():
+                if field == 'max_load_ms':
+                    merged[field] = max(merged.get(field, 0.0), value)
+                else:
+                    merged[field] = merged.get(field, 0) + value
+        return merged
+
+    def stats(self) -> Dict:
+        """
+        获取按模型、按调用类型和按两者组合的汇总，以及最近的调用记录
+        """
+        with self._lock:
+            items = [(key, dict(totals)) for key, totals in self._totals.items()]
+            recent = list(self._recent)
+
+        by_model, by_endpoint = {}, {}
+        for (model, endpoint), totals in items:
+            by_model.setdefault(model, []).append(totals)
+            by_endpoint.setdefault(endpoint, []).append(totals)
+        return {
+            'models': {model: self._summarize(self._merge(group)) for model, group in by_model.items()},
+            'endpoints': {endpoint: self._summarize(self._merge(group)) for endpoint, group in by_endpoint.items()},
+            'by_model_endpoint': [
+                dict(self._summarize(totals), model=model, endpoint=endpoint) for (model, endpoint), totals in items
+            ],
+            'recent': recent
+        }
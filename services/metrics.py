@@ -0,0 +1,230 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# 默认的延迟分桶（秒），覆盖缓存命中的毫秒级到模型生成的分钟级
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    """
+    只增不减的计数器，按标签值分别计数
+    """
+
+    type = 'counter'
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values = {}  # 标签值元组 -> 计数
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self) -> List[Tuple[str, Dict, float]]:
+        with self._lock:
+            return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """
+    延迟直方图：按标签值统计落入各分桶的次数、总和与次数
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # 标签值元组 -> [各分桶计数, 总和, 次数]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels) -> int:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            entry = self._values.get(key)
+            return entry[2] if entry else 0
+
+    def samples(self) -> List[Tuple[str, Dict, float]]:
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                labels = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    samples.append((f'{self.name}_bucket', dict(labels, le=_format_value(bound)), cumulative))
+                samples.append((f'{self.name}_bucket', dict(labels, le='+Inf'), count))
+                samples.append((f'{self.name}_sum', labels, total))
+                samples.append((f'{self.name}_count', labels, count))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    指标注册表，按Prometheus文本格式导出
+
+    计数器和直方图在请求处理中更新；缓存命中率、会话数等已有统计通过collector在导出时读取。
+    collector返回 (指标名, 类型, 说明, [(标签, 值), ...]) 的列表。
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help_text, labelnames, buckets)
+
+    def _register(self, cls, name, help_text, labelnames, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, tuple(labelnames), *args)
+            return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict, float]]]]]):
+        """
+        注册在导出时调用的collector
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        按Prometheus文本格式导出全部指标
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+        for collector in collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                print(f"收集指标失败: {e}")
+                continue
+            for name, metric_type, help_text, samples in families:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+# 进程内共享的指标注册表
+metrics = MetricsRegistry()
+
+HTTP_REQUESTS = metrics.counter(
+    'http_requests_total', '按路由和状态码统计的请求数', ('method', 'route', 'status')
+)
+HTTP_REQUEST_DURATION = metrics.histogram(
+    'http_request_duration_seconds', '按路由统计的请求处理耗时（流式接口只统计到开始返回）', ('method', 'route')
+)
+UPSTREAM_REQUESTS = metrics.counter(
+    'upstream_requests_total', '按上游和结果（ok/http_error/timeout/cancelled/error）统计的请求数', ('upstream', 'outcome')
+)
+UPSTREAM_REQUEST_DURATION = metrics.histogram(
+    'upstream_request_duration_seconds', '按上游统计的请求耗时（含重试）', ('upstream',)
+)
+
+
+class UpstreamCancelled(Exception):
+    """
+    调用方主动放弃的上游请求（如超过截止时间），统计为cancelled
+    """
+
+
+def observe_upstream(upstream: str, outcome: str, duration: float):
+    """
+    记录一次上游请求的结果和耗时
+    """
+    UPSTREAM_REQUESTS.inc(upstream=upstream, outcome=outcome)
+    UPSTREAM_REQUEST_DURATION.observe(duration, upstream=upstream)
+
+
+@contextmanager
+def track_upstream(upstream: str, timeout_errors: Tuple[type, ...] = (TimeoutError,)):
+    """
+    统计with块中的上游调用：正常结束记为ok，抛出timeout_errors中的异常记为timeout，
+    调用方取消或停止读取流式输出时记为cancelled，其他异常记为error
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except timeout_errors:
+        observe_upstream(upstream, 'timeout', time.perf_counter() - start)
+        raise
+    except (GeneratorExit, asyncio.CancelledError, UpstreamCancelled):
+        observe_upstream(upstream, 'cancelled', time.perf_counter() - start)
+        raise
+    except BaseException:
+        observe_upstream(upstream, 'error', time.perf_counter() - start)
+        raise
+    observe_upstream(upstream, 'ok', time.perf_counter() - start)
+
+
+def cache_samples(stats: Dict) -> Tuple[List[Tuple[Dict, float]], Tuple[Dict, float]]:
+    """
+    把缓存的stats()转换为(按结果统计的查询次数, 命中率)样本
+    """
+    labels = {'cache': stats['name']}
+    requests = [
+        (dict(labels, result='hit'), stats.get('hits', 0)),
+        (dict(labels, result='miss'), stats.get('misses', 0))
+    ]
+    if 'stale_hits' in stats:
+        requests.append((dict(labels, result='stale'), stats['stale_hits']))
+    return requests, (labels, stats.get('hit_rate', 0))
@@ -0,0 +1,123 @@
+import threading
+from typing import Callable, Dict, List, Optional
+
+import ollama
+
+from config import Config
+from services.cache import TTLCache
+from services.singleflight import shared_flight
+
+
+class ModelCatalog:
+    """
+    进程内共享的Ollama模型列表缓存
+
+    列表在ttl秒内直接从内存返回，过期后stale_ttl秒内先返回旧列表并在后台刷新；
+    同时到达的加载请求合并为一次client.list()。可选按固定间隔在后台主动刷新。
+    """
+
+    def __init__(self, loader: Optional[Callable[[], List[Dict]]] = None, ttl: float = 300, stale_ttl: float = 3600,
+                 flight=None, name: str = 'models'):
+        """
+        loader: 返回模型列表的函数，默认调用ollama.Client().list()
+        ttl: 列表保持新鲜的秒数
+        stale_ttl: 过期后仍可返回旧列表的额外秒数
+        """
+        self.loader = loader or self._list_models
+        self.flight = flight or shared_flight
+        self.name = name
+        self.cache = TTLCache(ttl=ttl, stale_ttl=stale_ttl, name=name)
+        self._client = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _list_models(self) -> List[Dict]:
+        if self._client is None:
+            self._client = ollama.Client()
+        models = self._client.list()
+        return [
+            {
+                'name': model['name'],
+                'size': model.get('size', '未知'),
+                'modified_at': model.get('modified_at', '未知'),
+                'digest': model.get('digest', '未知')
+            }
+            for model in models['models']
+        ]
+
+    def _load(self) -> List[Dict]:
+        return self.flight.do(('ollama', self.name), self.loader)
+
+    def models(self) -> List[Dict]:
+        """
+        获取模型列表，加载失败时返回空列表（失败结果不缓存）
+        """
+        try:
+            return list(self.cache.get_or_load(self.name, self._load))
+        except Exception as e:
+            print(f"获取模型列表失败: {e}")
+            return []
+
+    def has(self, model_name: str) -> bool:
+        """
+        判断模型是否存在；缓存的列表中没有时重新加载一次，以便发现刚下载的模型
+        """
+        if any(m['name'] == model_name for m in self.models()):
+            return True
+        self.invalidate()
+        return any(m['name'] == model_name for m in self.models())
+
+    def invalidate(self):
+        """
+        清除缓存的模型列表，下次访问时重新加载
+        """
+        self.cache.invalidate(self.name)
+
+    def refresh(self) -> bool:
+        """
+        立即重新加载模型列表，失败时保留原列表
+        """
+        try:
+            self.cache.set(self.name, self._load())
+            return True
+        except Exception as e:
+            print(f"刷新模型列表失败: {e}")
+            return False
+
+    def start_refresh(self, interval: float):
+        """
+        启动后台线程，每隔interval秒刷新一次模型列表
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name=f'{self.name}-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        停止后台刷新
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            self.refresh()
+
+    def stats(self) -> Dict:
+        """
+        获取模型列表缓存的命中统计
+        """
+        stats = self.cache.stats()
+        stats['refreshing'] = self._thread is not None and self._thread.is_alive()
+        return stats
+
+
+# 进程内共享的模型列表，OllamaService默认使用它
+shared_model_catalog = ModelCatalog(
+    ttl=Config.OLLAMA_MODELS_CACHE_TTL,
+    stale_ttl=Config.OLLAMA_MODELS_STALE_TTL
+)
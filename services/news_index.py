@@ -0,0 +1,101 @@
+import heapq
+import threading
+from typing import Dict, Iterable, List
+
+from services.relevance import relevance_level
+
+
+class NewsRankingIndex:
+    """
+    按城市预先排好序的新闻索引
+
+    新闻写入时按已计算的city_relevance加入各相关城市的top-K堆（分数高、时间新的在前），
+    查询时直接返回排好序的列表；新闻从缓冲区删除后在下次查询时从堆中清理。
+    堆满时被挤出的新闻仍在缓冲区中，堆中的新闻被删除后从缓冲区的全部新闻重建该城市的堆。
+    """
+
+    def __init__(self, cities: Iterable[str], top_k: int = 50):
+        """
+        cities: 建立索引的城市
+        top_k: 每个城市保留的最多新闻数
+        """
+        self.top_k = top_k
+        self._heaps = {city: [] for city in cities}  # 城市 -> [(分数, 写入序号, key)]
+        self._items = {}  # key -> (写入序号, {城市: 带该城市相关程度的新闻})
+        self._ranked = {}  # 城市 -> 排好序的新闻列表，写入或删除后失效
+        self._truncated = set()  # 堆满后挤出过新闻的城市
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def add(self, key, item: Dict):
+        """
+        写入一条新闻，调用顺序即新闻从旧到新的顺序
+        """
+        with self._lock:
+            self._seq += 1
+            entries = {}
+            for city, relevance in item.get('city_relevance', {}).items():
+                heap = self._heaps.get(city)
+                if heap is None:
+                    continue
+                score = relevance['score']
+                entries[city] = dict(item, relevance_score=score, relevance_level=relevance_level(score))
+                heapq.heappush(heap, (score, self._seq, key))
+                if len(heap) > self.top_k:
+                    heapq.heappop(heap)
+                    self._truncated.add(city)
+                self._ranked.pop(city, None)
+            self._items[key] = (self._seq, entries)
+
+    def remove(self, key):
+        """
+        删除一条新闻
+        """
+        with self._lock:
+            entry = self._items.pop(key, None)
+            if entry is not None:
+                for city in entry[1]:
+                    self._ranked.pop(city, None)
+
+    def ranked(self, city: str, limit: int) -> List[Dict]:
+        """
+        返回与城市相关的前limit条新闻，按相关分数从高到低、同分时从新到旧排列
+        """
+        with self._lock:
+            ranked = self._ranked.get(city)
+            if ranked is None:
+                heap = [
+                    (score, seq, key) for score, seq, key in self._heaps.get(city, ())
+                    if key in self._items and self._items[key][0] == seq
+                ]
+                if city in self._truncated and len(heap) < self.top_k:
+                    heap = self._rebuild_locked(city)
+                if city in self._heaps:
+                    heapq.heapify(heap)
+                    self._heaps[city] = heap
+                ranked = [self._items[key][1][city] for _, _, key in sorted(heap, reverse=True)]
+                self._ranked[city] = ranked
+            return ranked[:limit]
+
+    def _rebuild_locked(self, city: str) -> List:
+        """
+        从全部新闻重建城市的top-K堆，找回之前被挤出、仍在缓冲区中的相关新闻（调用方需持有锁）
+        """
+        candidates = [
+            (entries[city]['relevance_score'], seq, key)
+            for key, (seq, entries) in self._items.items() if city in entries
+        ]
+        if len(candidates) <= self.top_k:
+            self._truncated.discard(city)
+        return heapq.nlargest(self.top_k, candidates)
+
+    def stats(self) -> Dict:
+        """
+        获取各城市索引的新闻数
+        """
+        with self._lock:
+            return {
+                'items': len(self._items),
+                'top_k': self.top_k,
+                'cities': {city: len(heap) for city, heap in self._heaps.items() if heap}
+            }
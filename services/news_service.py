@@ -1,12 +1,91 @@
-import requests
-import json
 from datetime import datetime
-from typing import List, Dict, Optional
-from bs4 import BeautifulSoup
+from typing import Callable, List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import re
+from config import Config
+from services.html_extractor import create_extractor, detect_encoding
+from services.cache import TTLCache, SQLiteCache
+from services.singleflight import shared_flight, shared_async_flight
+from services.http_client import PooledHTTPClient, AsyncHTTPClient
+from services.relevance import CityRelevanceScorer, relevance_level
+from services.feed_poller import FeedPoller
+from services.news_index import NewsRankingIndex
 
 class NewsService:
-    def __init__(self):
+    def __init__(self, flight=None, article_cache_ttl=None, article_cache_db=None, poll=False, async_flight=None,
+                 shared_cache_db=None):
+        """
+        poll: 是否在后台定时轮询新闻接口，get_news直接从缓冲区读取
+        shared_cache_db: 多进程共享缓存的SQLite文件，默认使用SHARED_CACHE_DB；没有单独设置新闻正文磁盘缓存时正文也写入这里
+        """
+        # 合并相同新闻源和文章的并发请求
+        self.flight = flight or shared_flight
+        self.async_flight = async_flight or shared_async_flight
+        
+        # 缓存提取成功的新闻正文，同一新闻的后续讨论不再重复下载和解析
+        article_cache_ttl = Config.ARTICLE_CACHE_TTL if article_cache_ttl is None else article_cache_ttl
+        shared_cache_db = shared_cache_db or Config.SHARED_CACHE_DB
+        article_cache_db = article_cache_db or Config.ARTICLE_CACHE_DB or shared_cache_db
+        self.article_cache = TTLCache(
+            ttl=article_cache_ttl,
+            max_size=Config.ARTICLE_CACHE_SIZE,
+            name='article'
+        )
+        # 可选的磁盘缓存层，进程重启后仍然有效
+        self.article_disk_cache = SQLiteCache(article_cache_db, article_cache_ttl, name='article_disk') if article_cache_db else None
+        
+        # 设置了共享缓存时新闻列表页也写入共享缓存，多个工作进程在NEWS_FEED_CACHE_TTL秒内只请求一次接口
+        self.feed_cache = SQLiteCache(
+            shared_cache_db, Config.NEWS_FEED_CACHE_TTL, name='news_feed_shared', table='news_feed',
+            lease_timeout=Config.SHARED_CACHE_LEASE_TIMEOUT
+        ) if shared_cache_db else None
+        
+        # 新闻接口只有一个主机；新闻正文分布在多个主机上，需要缓存更多连接池
+        self.feed_http = PooledHTTPClient(
+            'news_feed',
+            timeout=Config.NEWS_API_TIMEOUT,
+            pool_connections=1,
+            pool_maxsize=Config.HTTP_POOL_MAXSIZE,
+            max_retries=Config.HTTP_MAX_RETRIES,
+            backoff_factor=Config.HTTP_BACKOFF_FACTOR,
+            upstream='sina_feed'
+        )
+        self.article_http = PooledHTTPClient(
+            'article',
+            timeout=Config.NEWS_CONTENT_TIMEOUT,
+            pool_connections=Config.HTTP_POOL_CONNECTIONS,
+            pool_maxsize=Config.HTTP_POOL_MAXSIZE,
+            max_retries=Config.HTTP_MAX_RETRIES,
+            backoff_factor=Config.HTTP_BACKOFF_FACTOR,
+            headers={
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            },
+            upstream='article'
+        )
+        
+        # 异步服务模式使用的客户端
+        self.async_feed_http = AsyncHTTPClient(
+            'news_feed_async',
+            timeout=Config.NEWS_API_TIMEOUT,
+            max_connections=Config.ASYNC_HTTP_MAX_CONNECTIONS,
+            max_retries=Config.HTTP_MAX_RETRIES,
+            backoff_factor=Config.HTTP_BACKOFF_FACTOR,
+            upstream='sina_feed'
+        )
+        self.async_article_http = AsyncHTTPClient(
+            'article_async',
+            timeout=Config.NEWS_CONTENT_TIMEOUT,
+            max_connections=Config.ASYNC_HTTP_MAX_CONNECTIONS,
+            max_retries=Config.HTTP_MAX_RETRIES,
+            backoff_factor=Config.HTTP_BACKOFF_FACTOR,
+            headers=self.article_http.headers,
+            upstream='article'
+        )
+        
+        # 新闻正文提取器，安装了lxml时默认使用lxml
+        self.extractor = create_extractor(Config.HTML_EXTRACTOR)
+        
         self.api_url = "https://feed.mix.sina.com.cn/api/roll/get"
         self.params = {
             'pageid': '153',
@@ -39,51 +118,49 @@ class NewsService:
             '郑州': ['郑州', '河南', '华中', '金水', '二七', '管城'],
             '济南': ['济南', '山东', '华东', '历下', '市中', '槐荫']
         }
+        
+        # 由全部城市关键词构建的匹配自动机，扫描一次新闻即可得到所有城市的相关程度
+        self.relevance_scorer = CityRelevanceScorer(self.city_keywords)
+        
+        # 相关新闻不足时最多查找的新闻页数；先单独请求第一页，不够时每批并发请求page_concurrency页
+        self.max_pages = Config.NEWS_MAX_PAGES
+        self.page_concurrency = max(1, min(Config.NEWS_PAGE_CONCURRENCY, self.max_pages))
+        self.page_executor = ThreadPoolExecutor(max_workers=self.page_concurrency, thread_name_prefix='news-page')
+        
+        # 后台轮询新闻接口，新条目转换并计算相关程度后写入缓冲区；第一次获取新闻时启动
+        # 写入缓冲区的新闻同时加入按城市排好序的索引
+        self._buffer_filled = False
+        self.poller = None
+        self.index = None
+        if poll:
+            self.index = NewsRankingIndex(self.city_keywords, top_k=Config.NEWS_INDEX_TOP_K)
+            self.poller = FeedPoller(
+                self._poll_feed,
+                transform=self._to_news_item,
+                interval=Config.NEWS_POLL_INTERVAL,
+                max_interval=Config.NEWS_POLL_MAX_INTERVAL,
+                retry_interval=Config.NEWS_POLL_RETRY_INTERVAL,
+                buffer_size=Config.NEWS_BUFFER_SIZE,
+                name='news_feed',
+                on_add=self.index.add,
+                on_evict=self.index.remove
+            )
 
     def get_news(self, limit: int = 10, city: str = None) -> List[Dict]:
         """
         获取热点新闻，支持按城市相关程度排序
         """
         try:
-            response = requests.get(self.api_url, params=self.params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            # 开启轮询时直接读取按城市排好序的索引，不再逐条计算和排序
+            if self.index is not None and city in self.city_keywords:
+                news_list = self._ranked_news(limit, city)
+                if news_list:
+                    return news_list
             
-            if data.get('result', {}).get('status', {}).get('code') == 0:
-                news_list = []
-                items = data.get('result', {}).get('data', [])
-                
-                for item in items[:limit * 2]:  # 获取更多新闻用于筛选
-                    # 确保URL是有效的
-                    news_url = item.get('url', '')
-                    if not news_url or news_url == '#':
-                        # 如果没有有效URL，尝试构建一个
-                        news_url = f"https://news.sina.com.cn/roll/#pageid=153&lid=2509&num=1&page=1&r={datetime.now().timestamp()}"
-
-                    news_item = {
-                        'title': item.get('title', ''),
-                        'url': news_url,
-                        'summary': item.get('intro', ''),
-                        'source': '新浪新闻',
-                        'publish_time': item.get('ctime', ''),
-                        'category': item.get('category', '热点'),
-                        'relevance_score': 0,  # 默认相关程度
-                        'relevance_level': '一般'  # 默认相关级别
-                    }
-                    
-                    # 如果指定了城市，计算相关程度
-                    if city:
-                        relevance_info = self._calculate_relevance(news_item, city)
-                        news_item['relevance_score'] = relevance_info['score']
-                        news_item['relevance_level'] = relevance_info['level']
-                    
-                    news_list.append(news_item)
-                
-                # 如果指定了城市，按相关程度排序
-                if city:
-                    news_list.sort(key=lambda x: x['relevance_score'], reverse=True)
-                
-                return news_list[:limit]
+            items = self._latest_news(limit, city)  # 获取更多新闻用于筛选
+            
+            if items is not None:
+                return self._rank_news(items, limit, city)
             else:
                 print("获取新闻失败，使用模拟数据")
                 return self._get_mock_news(limit, city)
@@ -92,87 +169,431 @@ class NewsService:
             print(f"获取新闻信息时出错: {e}")
             return self._get_mock_news(limit, city)
 
-    def get_news_content(self, url: str) -> Dict:
+    async def get_news_async(self, limit: int = 10, city: str = None) -> List[Dict]:
         """
-        从新闻链接中提取正文内容
+        get_news的异步版本：并发请求的各页在同一个事件循环中等待
+        开启轮询时新闻已在缓冲区中，只有第一次调用需要在线程中同步拉取
         """
+        if self.poller is not None:
+            return await asyncio.to_thread(self.get_news, limit, city)
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
+            items = await self._fetch_pages_async(
+                transform=self._to_news_item,
+                enough=lambda items: self._enough_candidates(items, limit, city)
+            )
             
-            response = requests.get(url, headers=headers, timeout=15)
-            response.raise_for_status()
-            response.encoding = response.apparent_encoding
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # 尝试多种选择器来提取正文
-            content_selectors = [
-                '.article-content',
-                '.article-body',
-                '.content',
-                '.main-content',
-                '.article',
-                '.news-content',
-                '#artibody',
-                '.article-content-left',
-                '.article-body-content'
-            ]
-            
-            content = ""
-            for selector in content_selectors:
-                elements = soup.select(selector)
-                if elements:
-                    content = elements[0].get_text(strip=True)
-                    break
-            
-            # 如果没有找到特定选择器，尝试提取所有段落
-            if not content:
-                paragraphs = soup.find_all('p')
-                content = '\n'.join([p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 50])
-            
-            # 清理内容
-            content = self._clean_content(content)
+            if items:
+                return self._rank_news(self._select_candidates(items, limit, city), limit, city)
+            else:
+                print("获取新闻失败，使用模拟数据")
+                return self._get_mock_news(limit, city)
+                
+        except Exception as e:
+            print(f"获取新闻信息时出错: {e}")
+            return self._get_mock_news(limit, city)
+
+    def _rank_news(self, items: List[Dict], limit: int, city: str = None) -> List[Dict]:
+        """
+        复制候选新闻并写入与城市的相关程度，按相关程度排序后返回前limit条
+        """
+        news_list = []
+        
+        for item in items:
+            # 缓冲区中的条目是共享的，复制后再写入相关程度
+            news_item = self._public_item(item)
             
-            # 提取标题
-            title_selectors = [
-                'h1',
-                '.article-title',
-                '.title',
-                '.headline',
-                '.article-headline'
-            ]
+            # 如果指定了城市，计算相关程度
+            if city:
+                relevance_info = self._calculate_relevance(item, city)
+                news_item['relevance_score'] = relevance_info['score']
+                news_item['relevance_level'] = relevance_info['level']
             
-            title = ""
-            for selector in title_selectors:
-                elements = soup.select(selector)
-                if elements:
-                    title = elements[0].get_text(strip=True)
-                    break
+            news_list.append(news_item)
+        
+        # 如果指定了城市，按相关程度排序
+        if city:
+            news_list.sort(key=lambda x: x['relevance_score'], reverse=True)
+        
+        return news_list[:limit]
+
+    def _ranked_news(self, limit: int, city: str) -> List[Dict]:
+        """
+        从索引读取与城市最相关的limit条新闻，相关新闻不足时用最新的其他新闻补足
+        """
+        self.poller.start()
+        ranked = self.index.ranked(city, limit)
+        if len(ranked) < limit:
+            latest = self.poller.latest(self.max_pages * int(self.params['num']))
+            others = [item for item in latest if city not in item['city_relevance']]
+            ranked = ranked + others[:limit - len(ranked)]
+        return [self._public_item(item) for item in ranked]
+
+    @staticmethod
+    def _public_item(item: Dict) -> Dict:
+        """
+        复制新闻条目，去掉只在服务内部使用的各城市相关程度（不出现在接口返回和汇总缓存key中）
+        """
+        news_item = dict(item)
+        news_item.pop('city_relevance', None)
+        return news_item
+
+    def _latest_news(self, limit: int, city: str = None) -> Optional[List[Dict]]:
+        """
+        获取候选新闻
+        开启轮询时从缓冲区读取（第一次调用时同步拉取一次并启动轮询），否则并发请求多页接口，
+        候选新闻足够时不再请求后面的页；轮询还没有成功拉取过（缓冲区为空）时同样直接请求接口
+        """
+        items = None
+        if self.poller is not None:
+            self.poller.start()
+            items = self.poller.latest(self.max_pages * int(self.params['num']))
+        if not items:
+            items = self._fetch_pages(
+                transform=self._to_news_item,
+                enough=lambda items: self._enough_candidates(items, limit, city)
+            )
+        if not items:
+            return None
+        return self._select_candidates(items, limit, city)
+
+    def _enough_candidates(self, items: List[Dict], limit: int, city: str = None) -> bool:
+        """
+        候选新闻是否足够：至少limit*2条，指定城市时其中至少limit条与城市相关
+        """
+        if len(items) < limit * 2:
+            return False
+        if not city or city not in self.city_keywords:
+            return True
+        return sum(1 for item in items if city in item['city_relevance']) >= limit
+
+    def _select_candidates(self, items: List[Dict], limit: int, city: str = None) -> List[Dict]:
+        """
+        选取最新的limit*2条新闻；指定城市且相关新闻不足limit条时，从更早的新闻中补充相关新闻
+        """
+        candidates = items[:limit * 2]
+        if not city or city not in self.city_keywords:
+            return candidates
+        
+        relevant_count = sum(1 for item in candidates if city in item['city_relevance'])
+        for item in items[limit * 2:]:
+            if relevant_count >= limit:
+                break
+            if city in item['city_relevance']:
+                candidates.append(item)
+                relevant_count += 1
+        return candidates
+
+    def _fetch_pages(self, transform: Callable[[Dict], Dict] = None,
+                     enough: Callable[[List[Dict]], bool] = None) -> Optional[List[Dict]]:
+        """
+        按批并发请求第1到max_pages页，合并去重后按页顺序返回
+        每批完成后enough返回True时停止；第一页失败时返回None或抛出异常，后面的页失败时跳过
+        """
+        items = []
+        seen = set()
+        for batch in self._page_batches():
+            futures = [self.page_executor.submit(self._fetch_feed, page) for page in batch]
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append(e)
+            if not self._merge_pages(batch, results, items, seen, transform):
+                return None
             
-            if not title:
-                title = soup.find('title')
-                title = title.get_text(strip=True) if title else "未知标题"
+            if enough is not None and enough(items):
+                break
+        return items
+
+    async def _fetch_pages_async(self, transform: Callable[[Dict], Dict] = None,
+                                 enough: Callable[[List[Dict]], bool] = None) -> Optional[List[Dict]]:
+        """
+        _fetch_pages的异步版本，同一批的页用asyncio.gather并发请求
+        """
+        items = []
+        seen = set()
+        for batch in self._page_batches():
+            results = await asyncio.gather(*[self._fetch_feed_async(page) for page in batch], return_exceptions=True)
+            if not self._merge_pages(batch, results, items, seen, transform):
+                return None
             
-            return {
-                'success': True,
-                'title': title,
-                'content': content,
-                'url': url,
-                'length': len(content)
-            }
+            if enough is not None and enough(items):
+                break
+        return items
+
+    def _page_batches(self) -> List[List[int]]:
+        """
+        第一页单独作为一批，第一页的新闻已经足够时不再请求后面的页；其余页每page_concurrency页一批
+        """
+        pages = list(range(2, self.max_pages + 1))
+        return [[1]] + [pages[start:start + self.page_concurrency] for start in range(0, len(pages), self.page_concurrency)]
+
+    def _merge_pages(self, pages: List[int], results: List, items: List[Dict], seen: set,
+                     transform: Callable[[Dict], Dict] = None) -> bool:
+        """
+        按页顺序把一批页的结果去重后追加到items，results中的异常表示该页请求失败
+        第一页返回错误状态时返回False，第一页请求失败时抛出异常，后面的页失败时跳过
+        """
+        for page, page_items in zip(pages, results):
+            if isinstance(page_items, Exception):
+                if page == 1:
+                    raise page_items
+                print(f"获取第{page}页新闻失败: {page_items}")
+                continue
+            if page_items is None:
+                if page == 1:
+                    return False
+                continue
             
+            for item in page_items:
+                key = FeedPoller.item_key(item)
+                if key in seen:
+                    continue
+                seen.add(key)
+                items.append(transform(item) if transform else item)
+        return True
+
+    def _poll_feed(self) -> Optional[List[Dict]]:
+        """
+        轮询拉取：第一次拉取前max_pages页填满缓冲区，之后只拉取第一页的新条目
+        """
+        if self._buffer_filled:
+            return self._fetch_feed()
+        items = self._fetch_pages()
+        if items is not None:
+            self._buffer_filled = True
+        return items
+
+    def _to_news_item(self, item: Dict) -> Dict:
+        """
+        把接口返回的原始条目转换为新闻条目，并计算与各城市的相关程度
+        """
+        # 确保URL是有效的
+        news_url = item.get('url', '')
+        if not news_url or news_url == '#':
+            # 如果没有有效URL，尝试构建一个
+            news_url = f"https://news.sina.com.cn/roll/#pageid=153&lid=2509&num=1&page=1&r={datetime.now().timestamp()}"
+
+        news_item = {
+            'title': item.get('title', ''),
+            'url': news_url,
+            'summary': item.get('intro', ''),
+            'source': '新浪新闻',
+            'publish_time': item.get('ctime', ''),
+            'category': item.get('category', '热点'),
+            'relevance_score': 0,  # 默认相关程度
+            'relevance_level': '一般'  # 默认相关级别
+        }
+        news_item['city_relevance'] = self.relevance_scorer.score(news_item['title'], news_item['summary'])
+        return news_item
+
+    def get_feed_stats(self) -> Dict:
+        """
+        获取新闻轮询状态，lag为距上次成功拉取的秒数
+        """
+        if self.poller is None:
+            return {'name': 'news_feed', 'running': False}
+        stats = self.poller.stats()
+        stats['index'] = self.index.stats()
+        return stats
+
+    def _fetch_feed(self, page: int = 1) -> Optional[List[Dict]]:
+        """
+        获取新浪滚动新闻指定页的原始条目，相同页的并发请求只访问一次接口
+        接口返回错误状态时返回None，网络错误时抛出异常
+        """
+        key = ('news_feed', page, self.params['num'])
+        return self.flight.do(key, lambda: self._load_feed(page))
+
+    def _load_feed(self, page: int = 1) -> Optional[List[Dict]]:
+        """
+        设置了共享缓存时先查询共享缓存，其他进程正在请求同一页时等待其结果
+        """
+        if self.feed_cache is None:
+            return self._request_feed(page)
+        return self.feed_cache.load(f'{page}:{self.params["num"]}', lambda: self._request_feed(page))[0]
+
+    def _request_feed(self, page: int = 1) -> Optional[List[Dict]]:
+        """
+        请求新浪滚动新闻接口
+        """
+        params = dict(self.params, page=str(page))
+        response = self.feed_http.get(self.api_url, params=params)
+        response.raise_for_status()
+        return self._parse_feed(response.json())
+
+    async def _fetch_feed_async(self, page: int = 1) -> Optional[List[Dict]]:
+        """
+        _fetch_feed的异步版本
+        """
+        key = ('news_feed', page, self.params['num'])
+        return await self.async_flight.do(key, lambda: self._load_feed_async(page))
+
+    async def _load_feed_async(self, page: int = 1) -> Optional[List[Dict]]:
+        """
+        先查询共享缓存，未命中时请求接口并写入（不等待其他进程的加载）；读写SQLite在线程中进行
+        """
+        if self.feed_cache is None:
+            return await self._request_feed_async(page)
+        cache_key = f'{page}:{self.params["num"]}'
+        items = await asyncio.to_thread(self.feed_cache.get, cache_key)
+        if items is None:
+            items = await self._request_feed_async(page)
+            if items is not None:
+                await asyncio.to_thread(self.feed_cache.set, cache_key, items)
+        return items
+
+    async def _request_feed_async(self, page: int = 1) -> Optional[List[Dict]]:
+        """
+        异步请求新浪滚动新闻接口
+        """
+        params = dict(self.params, page=str(page))
+        response = await self.async_feed_http.get(self.api_url, params=params)
+        response.raise_for_status()
+        return self._parse_feed(response.json())
+
+    def _parse_feed(self, data: Dict) -> Optional[List[Dict]]:
+        """
+        接口返回成功状态时返回新闻条目，否则返回None
+        """
+        if data.get('result', {}).get('status', {}).get('code') == 0:
+            return data.get('result', {}).get('data', [])
+        return None
+
+    def get_news_content(self, url: str) -> Dict:
+        """
+        从新闻链接中提取正文内容
+        依次查询内存缓存和磁盘缓存，未命中时下载解析，相同链接的并发请求共享一次抓取结果
+        """
+        content_data = self._cached_news_content(url)
+        if content_data is None:
+            content_data = self.flight.do(('article', url), lambda: self._load_news_content(url))
+        return dict(content_data)
+
+    async def get_news_content_async(self, url: str) -> Dict:
+        """
+        get_news_content的异步版本，与同步版本共用内存和磁盘缓存，查询磁盘缓存在线程中进行
+        """
+        content_data = self.article_cache.get(url)
+        if content_data is None and self.article_disk_cache is not None:
+            content_data = await asyncio.to_thread(self._disk_news_content, url)
+        if content_data is None:
+            content_data = await self.async_flight.do(('article', url), lambda: self._load_news_content_async(url))
+        return dict(content_data)
+
+    def _cached_news_content(self, url: str) -> Optional[Dict]:
+        """
+        依次查询内存缓存和磁盘缓存，磁盘命中时写回内存缓存
+        """
+        content_data = self.article_cache.get(url)
+        if content_data is None and self.article_disk_cache is not None:
+            content_data = self._disk_news_content(url)
+        return content_data
+
+    def _disk_news_content(self, url: str) -> Optional[Dict]:
+        content_data = self.article_disk_cache.get(url)
+        if content_data is not None:
+            self.article_cache.set(url, content_data)
+        return content_data
+
+    def _load_news_content(self, url: str) -> Dict:
+        """
+        提取新闻正文，只缓存提取成功的结果
+        """
+        content_data = self._extract_news_content(url)
+        self._store_news_content(url, content_data)
+        return content_data
+
+    async def _load_news_content_async(self, url: str) -> Dict:
+        """
+        _load_news_content的异步版本，页面解析在线程中进行，不阻塞事件循环
+        """
+        try:
+            response = await self.async_article_http.get(url, follow_redirects=True)
+            response.raise_for_status()
+            encoding = detect_encoding(response.content, response.headers.get('Content-Type', ''))
+            content_data = await asyncio.to_thread(self._parse_news_page, url, response.content, encoding)
         except Exception as e:
-            print(f"提取新闻内容失败: {e}")
-            return {
-                'success': False,
-                'error': str(e),
-                'title': '',
-                'content': '',
-                'url': url,
-                'length': 0
-            }
+            content_data = self._failed_news_content(url, e)
+        if self.article_disk_cache is not None:
+            await asyncio.to_thread(self._store_news_content, url, content_data)
+        else:
+            self._store_news_content(url, content_data)
+        return content_data
+
+    def _store_news_content(self, url: str, content_data: Dict):
+        if content_data['success']:
+            self.article_cache.set(url, content_data)
+            if self.article_disk_cache is not None:
+                self.article_disk_cache.set(url, content_data)
+
+    def _extract_news_content(self, url: str) -> Dict:
+        """
+        下载新闻页面并提取正文内容
+        """
+        try:
+            response = self.article_http.get(url)
+            response.raise_for_status()
+            # 只有响应头和页面都没有声明编码时才检测编码（需要扫描整个页面）
+            encoding = detect_encoding(response.content, response.headers.get('Content-Type', ''))
+            return self._parse_news_page(url, response.content, encoding or response.apparent_encoding)
+        except Exception as e:
+            return self._failed_news_content(url, e)
+
+    def _parse_news_page(self, url: str, page: bytes, encoding: Optional[str]) -> Dict:
+        """
+        按编码解码页面并提取正文，没有检测到编码时按utf-8解码
+        """
+        try:
+            html = page.decode(encoding or 'utf-8', errors='replace')
+        except LookupError:
+            html = page.decode('utf-8', errors='replace')
+        title, content = self.extractor.extract(html)
+        
+        # 清理内容
+        content = self._clean_content(content)
+        
+        return {
+            'success': True,
+            'title': title,
+            'content': content,
+            'url': url,
+            'length': len(content)
+        }
+
+    def _failed_news_content(self, url: str, error: Exception) -> Dict:
+        print(f"提取新闻内容失败: {error}")
+        return {
+            'success': False,
+            'error': str(error),
+            'title': '',
+            'content': '',
+            'url': url,
+            'length': 0
+        }
+
+    def get_cache_stats(self) -> Dict:
+        """
+        获取新闻正文缓存统计
+        """
+        stats = {'article': self.article_cache.stats()}
+        if self.article_disk_cache is not None:
+            stats['article_disk'] = self.article_disk_cache.stats()
+        if self.feed_cache is not None:
+            stats['news_feed_shared'] = self.feed_cache.stats()
+        return stats
+
+    def get_http_stats(self) -> Dict:
+        """
+        获取新闻接口和新闻正文的连接池统计
+        """
+        return {
+            'news_feed': self.feed_http.stats(),
+            'article': self.article_http.stats(),
+            'news_feed_async': self.async_feed_http.stats(),
+            'article_async': self.async_article_http.stats()
+        }
 
     def _clean_content(self, content: str) -> str:
         """
@@ -217,34 +638,17 @@ class NewsService:
         if not city or city not in self.city_keywords:
             return {'score': 0, 'level': '一般'}
         
-        city_keywords = self.city_keywords[city]
-        title = news_item.get('title', '').lower()
-        summary = news_item.get('summary', '').lower()
-        
-        score = 0
-        matched_keywords = []
-        
-        for keyword in city_keywords:
-            keyword_lower = keyword.lower()
-            # 标题匹配权重更高
-            if keyword_lower in title:
-                score += 3
-                matched_keywords.append(keyword)
-            # 摘要匹配权重较低
-            if keyword_lower in summary:
-                score += 1
-                if keyword not in matched_keywords:
-                    matched_keywords.append(keyword)
+        # 接口拉取的新闻在转换时已经计算了各城市的相关程度，直接读取；其余新闻扫描一次得到所有城市的结果
+        city_relevance = news_item.get('city_relevance')
+        if city_relevance is None:
+            city_relevance = self.relevance_scorer.score(news_item.get('title', ''), news_item.get('summary', ''))
+        
+        relevance = city_relevance.get(city)
+        score = relevance['score'] if relevance else 0
+        matched_keywords = list(relevance['matched_keywords']) if relevance else []
         
         # 根据分数确定相关级别
-        if score >= 6:
-            level = '高度相关'
-        elif score >= 3:
-            level = '相关'
-        elif score >= 1:
-            level = '一般相关'
-        else:
-            level = '一般'
+        level = relevance_level(score)
         
         return {
             'score': score,
@@ -272,9 +676,10 @@ class NewsService:
         else:
             return news_list[:3]
 
-    def analyze_news_relevance(self, news_list: List[Dict], city: str) -> Dict:
+    def analyze_news_relevance(self, news_list: List[Dict], city: str, ranked: bool = False) -> Dict:
         """
         分析新闻与城市的相关性
+        ranked: 新闻已经由get_news(limit, city)计算并排序过时为True，跳过重复计算和排序
         """
         if not city or city not in self.city_keywords:
             return {
@@ -284,14 +689,15 @@ class NewsService:
                 'relevant_news': news_list[:3]
             }
         
-        # 为每条新闻计算相关程度
-        for news in news_list:
-            relevance_info = self._calculate_relevance(news, city)
-            news['relevance_score'] = relevance_info['score']
-            news['relevance_level'] = relevance_info['level']
-        
-        # 按相关程度排序
-        news_list.sort(key=lambda x: x['relevance_score'], reverse=True)
+        if not ranked:
+            # 为每条新闻计算相关程度
+            for news in news_list:
+                relevance_info = self._calculate_relevance(news, city)
+                news['relevance_score'] = relevance_info['score']
+                news['relevance_level'] = relevance_info['level']
+            
+            # 按相关程度排序
+            news_list.sort(key=lambda x: x['relevance_score'], reverse=True)
         
         relevant_news = [news for news in news_list if news['relevance_score'] > 0]
         
@@ -1,73 +1,227 @@
 import ollama
 import json
-from datetime import datetime
-import re
+import hashlib
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from config import Config
+from services.cache import TTLCache, SQLiteCache
+from services.metrics import UpstreamCancelled, track_upstream
+from services.llm_scheduler import LLMScheduler, SchedulerBusyError, INTERACTIVE, BATCH
+from services.llm_telemetry import LLMTelemetry
+from services.model_catalog import shared_model_catalog
+from services.news_service import NewsService
+from services.text_filter import ThinkingFilter, remove_thinking
+
+# 影响汇总内容的天气字段（不含更新时间，否则每次刷新天气都会使缓存失效）
+SUMMARY_WEATHER_FIELDS = (
+    'city', 'temperature', 'feels_like', 'description', 'humidity',
+    'wind_speed', 'wind_direction', 'visibility', 'pressure'
+)
+
+# 影响汇总内容的新闻字段，只取提示词中使用的前5条新闻
+SUMMARY_NEWS_FIELDS = ('title', 'source', 'category', 'summary')
+
+# 生成统计中按优先级区分的调用类型
+GENERATION_ENDPOINTS = {
+    INTERACTIVE: 'discussion',
+    BATCH: 'summary'
+}
 
 class OllamaService:
-    def __init__(self, model_name=None):
+    def __init__(self, model_name=None, summary_cache_ttl=None, summary_cache_size=None, catalog=None, news_service=None,
+                 shared_cache_db=None):
         """
         初始化Ollama服务
-        model_name: 使用的模型名称，如果为None则自动选择第一个可用模型
+        model_name: 使用的模型名称，如果为None则自动选择第一个可用模型（第一次使用模型时才查询模型列表）
+        catalog: 模型列表缓存，默认使用进程内共享的列表
+        news_service: 调用方没有提供相关性分析时用来分析的新闻服务，默认在第一次需要时创建一个
+        shared_cache_db: 多进程共享缓存的SQLite文件，默认使用SHARED_CACHE_DB，为空时汇总只缓存在内存中
         """
         self.client = ollama.Client()
-        self.model_name = model_name
-        self._initialize_model()
+        self._model_name = model_name
+        self._model_resolved = False
+        self._model_lock = threading.Lock()
+        self.catalog = catalog or shared_model_catalog
+        self.news_service = news_service
+        
+        # 按模型、城市、天气和新闻内容指纹缓存AI汇总，输入不变时不再重复生成
+        # 设置了共享缓存时，一个工作进程生成的汇总其他进程直接使用，正在生成时其他进程等待其结果
+        summary_cache_ttl = Config.SUMMARY_CACHE_TTL if summary_cache_ttl is None else summary_cache_ttl
+        shared_cache_db = shared_cache_db or Config.SHARED_CACHE_DB
+        self.summary_cache = TTLCache(
+            ttl=summary_cache_ttl,
+            max_size=Config.SUMMARY_CACHE_SIZE if summary_cache_size is None else summary_cache_size,
+            name='summary',
+            shared=SQLiteCache(
+                shared_cache_db, summary_cache_ttl, name='summary_shared', table='summary',
+                lease_timeout=Config.SHARED_CACHE_LEASE_TIMEOUT
+            ) if shared_cache_db else None
+        )
+        
+        # 限制同时进行的生成数量，新闻讨论优先于汇总报告
+        self.scheduler = LLMScheduler(
+            max_concurrency=Config.OLLAMA_MAX_CONCURRENCY,
+            max_queue=Config.OLLAMA_MAX_QUEUE,
+            timeout=Config.OLLAMA_QUEUE_TIMEOUT
+        )
+        
+        # 在后台线程中生成，超过截止时间时请求先返回备用结果，生成完成后仍写入汇总缓存
+        # 请求线程先在调度器中排队获取槽位再提交，线程池不超过最大并发数，不会形成第二个队列
+        self.executor = ThreadPoolExecutor(
+            max_workers=Config.OLLAMA_MAX_CONCURRENCY,
+            thread_name_prefix='llm'
+        )
+        self._pending_summaries = {}  # 缓存key -> 正在排队或生成的Future
+        self._pending_lock = threading.Lock()
+        
+        # 异步服务模式使用的客户端和正在生成的汇总任务，只在ASGI应用的事件循环中使用
+        self.async_client = None
+        self._pending_async_summaries = {}
+        
+        # 按会话保存Ollama返回的context，追问时只发送新问题，复用已计算的新闻和历史
+        self.discussion_contexts = TTLCache(
+            ttl=Config.CONVERSATION_TTL,
+            max_size=Config.DISCUSSION_CONTEXT_CACHE_SIZE,
+            name='discussion_context'
+        )
+        self.num_ctx = Config.OLLAMA_NUM_CTX
+        self.context_max_turns = Config.DISCUSSION_CONTEXT_MAX_TURNS
+        self.context_max_tokens = self.num_ctx - Config.DISCUSSION_CONTEXT_RESERVE_TOKENS
+        self._discussion_stats = {
+            'turns': 0,
+            'context_reused': 0,
+            'context_resets': 0,
+            'prompt_eval_count': 0,
+            'prompt_eval_ms': 0.0,
+            'last_turn': None
+        }
+        self._discussion_stats_lock = threading.Lock()
+        
+        # 模型在Ollama中空闲后保留的时长，每次调用都会带上，空字符串表示使用服务端默认值
+        self.keep_alive = self._parse_keep_alive(Config.OLLAMA_KEEP_ALIVE)
+        self._warm_models = {}  # 模型名 -> 预热结果
+        self._warm_lock = threading.Lock()
+        
+        # 每次生成的token数和加载、提示词计算、生成耗时，按模型和调用类型汇总
+        self.telemetry = LLMTelemetry()
+
+    @property
+    def model_name(self):
+        """
+        当前使用的模型，第一次访问时查询模型列表并自动选择，创建服务时不访问Ollama
+        """
+        if not self._model_resolved:
+            with self._model_lock:
+                if not self._model_resolved:
+                    self._initialize_model()
+                    self._model_resolved = True
+        return self._model_name
+
+    @model_name.setter
+    def model_name(self, value):
+        with self._model_lock:
+            self._model_name = value
+            self._model_resolved = True
         
     def _initialize_model(self):
         """初始化模型，自动选择可用模型"""
         try:
             models = self.get_available_models()
             if models:
-                if self.model_name is None:
+                if self._model_name is None:
                     # 优先选择qwen模型，如果没有则选择第一个
                     qwen_models = [m for m in models if 'qwen' in m['name'].lower()]
                     if qwen_models:
-                        self.model_name = qwen_models[0]['name']
+                        self._model_name = qwen_models[0]['name']
                     else:
-                        self.model_name = models[0]['name']
-                    print(f"自动选择模型: {self.model_name}")
+                        self._model_name = models[0]['name']
+                    print(f"自动选择模型: {self._model_name}")
                 else:
                     # 检查指定的模型是否存在
                     model_names = [m['name'] for m in models]
-                    if self.model_name not in model_names:
-                        print(f"指定的模型 {self.model_name} 不存在，使用第一个可用模型")
-                        self.model_name = models[0]['name']
+                    if self._model_name not in model_names:
+                        print(f"指定的模型 {self._model_name} 不存在，使用第一个可用模型")
+                        self._model_name = models[0]['name']
             else:
                 print("警告: 未找到可用模型")
-                self.model_name = "qwen:latest"  # 默认模型
+                self._model_name = "qwen:latest"  # 默认模型
         except Exception as e:
             print(f"初始化模型时出错: {e}")
-            self.model_name = "qwen:latest"  # 默认模型
+            self._model_name = "qwen:latest"  # 默认模型
     
     def get_available_models(self):
         """
-        获取可用的模型列表
+        获取可用的模型列表，从共享的模型列表缓存读取
+        """
+        return self.catalog.models()
+    
+    def warm_up(self, model_name=None) -> bool:
+        """
+        预先把模型加载到内存：发送空提示词只加载模型不生成内容，并设置keep_alive
         """
+        model_name = model_name or self.model_name
+        start = time.monotonic()
         try:
-            models = self.client.list()
-            model_list = []
-            for model in models['models']:
-                model_list.append({
-                    'name': model['name'],
-                    'size': model.get('size', '未知'),
-                    'modified_at': model.get('modified_at', '未知'),
-                    'digest': model.get('digest', '未知')
-                })
-            return model_list
+            response = ollama.generate(model=model_name, prompt='', stream=False, **self._generate_options())
+            self.telemetry.record(model_name, 'warmup', response)
         except Exception as e:
-            print(f"获取模型列表失败: {e}")
-            return []
-    
+            print(f"预热模型 {model_name} 失败: {e}")
+            with self._warm_lock:
+                self._warm_models[model_name] = {'success': False, 'error': str(e), 'warmed_at': time.time()}
+            return False
+        
+        elapsed = time.monotonic() - start
+        with self._warm_lock:
+            self._warm_models[model_name] = {
+                'success': True,
+                'elapsed_ms': elapsed * 1000,
+                'load_ms': response.get('load_duration', 0) / 1e6,
+                'warmed_at': time.time()
+            }
+        print(f"模型 {model_name} 预热完成，耗时{elapsed:.1f}秒")
+        return True
+
+    @staticmethod
+    def _parse_keep_alive(value: str):
+        """
+        纯数字按秒数传给Ollama（-1表示一直保留），其他按时长字符串（如30m）原样传递
+        """
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return value
+
+    def start_warm_up(self):
+        """
+        在后台线程中选择并预热当前模型，不阻塞应用启动
+        """
+        thread = threading.Thread(target=self.warm_up, name='llm-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def get_warmup_stats(self):
+        """
+        获取各模型的预热结果和keep_alive设置
+        """
+        with self._warm_lock:
+            return {
+                'model': self.model_name,
+                'keep_alive': self.keep_alive,
+                'models': dict(self._warm_models)
+            }
+
     def set_model(self, model_name):
         """
-        设置使用的模型
+        设置使用的模型，切换前先预热新模型，预热失败时保持原模型
         """
         try:
-            # 检查模型是否存在
-            models = self.get_available_models()
-            model_names = [m['name'] for m in models]
-            
-            if model_name in model_names:
+            # 检查模型是否存在，列表已缓存时不再访问Ollama
+            if self.catalog.has(model_name):
+                if model_name != self.model_name and not self.warm_up(model_name):
+                    print(f"模型 {model_name} 加载失败，继续使用 {self.model_name}")
+                    return False
                 self.model_name = model_name
                 return True
             else:
@@ -77,95 +231,414 @@ class OllamaService:
             print(f"设置模型失败: {e}")
             return False
         
-    def generate_summary(self, weather_data: dict, news_data: list, city: str = "北京") -> str:
+    def generate_summary(self, weather_data: dict, news_data: list, city: str = "北京", relevance_analysis: dict = None,
+                         deadline: float = None) -> str:
         """
         生成AI汇总报告
+        relevance_analysis: 调用方已经完成的地域相关性分析，提供时不再重复分析
+        deadline: 等待生成的最长秒数，None时使用SUMMARY_DEADLINE，0表示不限制
+        """
+        return self.generate_summary_with_meta(weather_data, news_data, city, relevance_analysis, deadline)['summary']
+
+    def generate_summary_with_meta(self, weather_data: dict, news_data: list, city: str = "北京",
+                                   relevance_analysis: dict = None, deadline: float = None) -> dict:
         """
+        生成AI汇总报告并标明来源
+        返回 {'summary': 汇总, 'source': 'llm'/'cache'/'fallback', 'fallback_reason': 'timeout'/'busy'/'error'}
+        超过截止时间时立即返回备用汇总，模型生成完成后写入缓存供下次请求使用
+        """
+        deadline = Config.SUMMARY_DEADLINE if deadline is None else deadline
+        start = time.monotonic()
         try:
-            # 如果提供了城市信息，进行地域相关性分析
-            if city and news_data:
-                from services.news_service import NewsService
-                news_service = NewsService()
-                
-                # 分析新闻与城市的相关性
-                relevance_analysis = news_service.analyze_news_relevance(news_data, city)
-                
-                # 使用相关性分析后的新闻
-                filtered_news = relevance_analysis['relevant_news']
-                
-                # 构建包含地域分析信息的提示词
-                prompt = self._build_prompt_with_relevance(weather_data, filtered_news, city, relevance_analysis)
-            else:
-                # 如果没有城市信息，使用原始新闻
-                filtered_news = news_data
-                prompt = self._build_prompt(weather_data, filtered_news)
+            prompt, relevance_analysis = self._prepare_summary_prompt(weather_data, news_data, city, relevance_analysis)
             
-            response = ollama.generate(
-                model=self.model_name,
-                prompt=prompt,
-                stream=False
-            )
+            cache_key = self._summary_cache_key(weather_data, news_data, city, relevance_analysis)
+            summary = self.summary_cache.get(cache_key)
+            if summary is not None:
+                return {'summary': summary, 'source': 'cache'}
             
-            summary = response['response']
+            future = self._submit_summary(cache_key, prompt, self._queue_timeout(deadline), self._remaining(start, deadline))
+            summary = future.result(timeout=self._remaining(start, deadline))
+            return {'summary': summary, 'source': 'llm'}
             
-            # 使用字符串匹配去除思考内容
-            summary = self._remove_thinking_content(summary)
+        except FutureTimeoutError:
+            print(f"AI汇总生成超过{deadline}秒，先返回备用汇总")
+            reason = 'timeout'
+        except SchedulerBusyError as e:
+            print(f"AI汇总生成失败: {e}")
+            reason = 'busy'
+        except Exception as e:
+            print(f"AI汇总生成失败: {e}")
+            reason = 'error'
+        
+        # 使用备用汇总方案
+        return {
+            'summary': self._fallback_summary(weather_data, news_data, city, relevance_analysis),
+            'source': 'fallback',
+            'fallback_reason': reason
+        }
+
+    def _submit_summary(self, cache_key, prompt, queue_timeout=None, lease_timeout=None):
+        """
+        在后台线程中生成汇总，相同输入正在排队或生成时复用同一个Future
+        其他工作进程正在生成相同汇总时，先在调用线程中等待其结果（最多lease_timeout秒），
+        等待期间不占用调度槽位和线程池
+        """
+        with self._pending_lock:
+            future = self._pending_summaries.get(cache_key)
+            if future is not None:
+                return future
+            future = self._pending_summaries[cache_key] = Future()
+        future.add_done_callback(lambda _: self._finish_summary(cache_key, future))
+        lease = None
+        try:
+            summary, lease = self.summary_cache.lease(cache_key, lease_timeout)
+            if summary is not None:
+                future.set_result(summary)
+                return future
+            self._submit_with_slot(BATCH, queue_timeout, self._run_summary, future, cache_key, prompt, lease)
+        except Exception as e:
+            self.summary_cache.release(cache_key, lease)
+            future.set_exception(e)
+        return future
+
+    def _run_summary(self, future, cache_key, prompt, lease=None):
+        """
+        调用模型生成汇总并写入缓存，结束后释放共享缓存的租约
+        """
+        try:
+            summary = self._request_summary(prompt)
+            # 只缓存模型生成的结果，备用汇总不缓存
+            self.summary_cache.set(cache_key, summary)
+            future.set_result(summary)
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            self.summary_cache.release(cache_key, lease)
+
+    def _submit_with_slot(self, priority, queue_timeout, fn, *args, **kwargs) -> Future:
+        """
+        在调用线程中排队获取调度槽位，获取后交给线程池执行并在结束时释放
+        排队只发生在调度器中，受队列上限、优先级和排队超时约束；队列已满或超时时抛出SchedulerBusyError
+        """
+        self.scheduler.acquire(priority, queue_timeout)
+        try:
+            return self.executor.submit(self.scheduler.run_holding, fn, *args, **kwargs)
+        except BaseException:
+            self.scheduler.release()
+            raise
+
+    def _queue_timeout(self, deadline):
+        """
+        排队的最长秒数：不超过请求的截止时间
+        """
+        return min(deadline, self.scheduler.timeout) if deadline else None
+
+    @staticmethod
+    def _remaining(start, deadline):
+        if not deadline:
+            return None
+        return max(0.0, deadline - (time.monotonic() - start))
+
+    def _finish_summary(self, cache_key, future):
+        with self._pending_lock:
+            if self._pending_summaries.get(cache_key) is future:
+                del self._pending_summaries[cache_key]
+
+    async def generate_summary_with_meta_async(self, weather_data: dict, news_data: list, city: str = "北京",
+                                               relevance_analysis: dict = None, deadline: float = None) -> dict:
+        """
+        generate_summary_with_meta的异步版本，等待模型时不占用线程
+        超过截止时间时生成任务继续在事件循环中运行，完成后写入汇总缓存
+        """
+        deadline = Config.SUMMARY_DEADLINE if deadline is None else deadline
+        try:
+            await self._resolve_model_async()
+            prompt, relevance_analysis = self._prepare_summary_prompt(weather_data, news_data, city, relevance_analysis)
             
-            return summary
+            cache_key = self._summary_cache_key(weather_data, news_data, city, relevance_analysis)
+            summary = await self.summary_cache.get_async(cache_key)
+            if summary is not None:
+                return {'summary': summary, 'source': 'cache'}
             
+            task = self._pending_async_summaries.get(cache_key)
+            if task is None:
+                task = asyncio.ensure_future(
+                    self._generate_summary_text_async(cache_key, prompt, self._queue_timeout(deadline)))
+                self._pending_async_summaries[cache_key] = task
+                task.add_done_callback(lambda _: self._pending_async_summaries.pop(cache_key, None))
+            summary = await asyncio.wait_for(asyncio.shield(task), deadline or None)
+            return {'summary': summary, 'source': 'llm'}
+            
+        except asyncio.TimeoutError:
+            print(f"AI汇总生成超过{deadline}秒，先返回备用汇总")
+            reason = 'timeout'
+        except SchedulerBusyError as e:
+            print(f"AI汇总生成失败: {e}")
+            reason = 'busy'
         except Exception as e:
             print(f"AI汇总生成失败: {e}")
-            # 使用备用汇总方案
-            if city and news_data:
-                from services.news_service import NewsService
-                news_service = NewsService()
-                relevance_analysis = news_service.analyze_news_relevance(news_data, city)
-                filtered_news = relevance_analysis['relevant_news']
-                fallback_summary = self._generate_fallback_summary_with_relevance(weather_data, filtered_news, city, relevance_analysis)
-            else:
-                fallback_summary = self._generate_fallback_summary(weather_data, news_data, city)
-            
-            return self._remove_thinking_content(fallback_summary)
+            reason = 'error'
+        
+        return {
+            'summary': self._fallback_summary(weather_data, news_data, city, relevance_analysis),
+            'source': 'fallback',
+            'fallback_reason': reason
+        }
 
-    def _remove_thinking_content(self, text: str) -> str:
+    async def _generate_summary_text_async(self, cache_key, prompt: str, queue_timeout: float = None) -> str:
         """
-        使用字符串匹配去除思考内容
+        _run_summary的异步版本
         """
-        if not text:
-            return text
+        response = await self._generate_async(prompt, BATCH, queue_timeout=queue_timeout)
+        summary = self._remove_thinking_content(response['response'])
+        await self.summary_cache.set_async(cache_key, summary)
+        return summary
+
+    def _request_summary(self, prompt: str) -> str:
+        response = self._generate(prompt, BATCH)
         
-        # 去除<think>标签内的内容
+        summary = response['response']
         
-        # 匹配<think>...</think>标签
-        think_pattern = r'<think>.*?</think>'
-        text = re.sub(think_pattern, '', text, flags=re.DOTALL)
+        # 使用字符串匹配去除思考内容
+        return self._remove_thinking_content(summary)
+
+    def generate_summary_stream(self, weather_data: dict, news_data: list, city: str = "北京", relevance_analysis: dict = None):
+        """
+        流式生成AI汇总报告，逐段返回已去除思考内容的文本
+        生成开始前失败时返回备用汇总，输出部分内容后失败时抛出异常
+        """
+        emitted = False
+        try:
+            prompt, relevance_analysis = self._prepare_summary_prompt(weather_data, news_data, city, relevance_analysis)
+            
+            cache_key = self._summary_cache_key(weather_data, news_data, city, relevance_analysis)
+            summary = self.summary_cache.get(cache_key)
+            if summary is not None:
+                yield summary
+                return
+            
+            parts = []
+            for text in self._generate_stream(prompt, BATCH):
+                emitted = True
+                parts.append(text)
+                yield text
+            if parts:
+                self.summary_cache.set(cache_key, ''.join(parts))
+        except Exception as e:
+            print(f"AI汇总流式生成失败: {e}")
+            if emitted:
+                raise
+            yield self._fallback_summary(weather_data, news_data, city, relevance_analysis)
+
+    def _prepare_summary_prompt(self, weather_data, news_data, city, relevance_analysis):
+        """
+        构建汇总提示词，有城市信息时进行地域相关性分析
+        返回(提示词, 相关性分析结果)
+        """
+        # 如果提供了城市信息，进行地域相关性分析
+        if city and news_data:
+            relevance_analysis = self._analyze_relevance(news_data, city, relevance_analysis)
+            
+            # 使用相关性分析后的新闻
+            filtered_news = relevance_analysis['relevant_news']
+            
+            # 构建包含地域分析信息的提示词
+            return self._build_prompt_with_relevance(weather_data, filtered_news, city, relevance_analysis), relevance_analysis
         
-        # 匹配<thinking>...</thinking>标签
-        thinking_pattern = r'<thinking>.*?</thinking>'
-        text = re.sub(thinking_pattern, '', text, flags=re.DOTALL)
+        # 如果没有城市信息，使用原始新闻
+        return self._build_prompt(weather_data, news_data), relevance_analysis
+
+    def _analyze_relevance(self, news_data, city, relevance_analysis=None):
+        """
+        返回新闻与城市的相关性分析，调用方已经分析过时直接使用其结果
+        """
+        if relevance_analysis is not None:
+            return relevance_analysis
+        if self.news_service is None:
+            self.news_service = NewsService()
+        return self.news_service.analyze_news_relevance(news_data, city)
+
+    def _summary_cache_key(self, weather_data, news_data, city, relevance_analysis=None):
+        """
+        计算汇总缓存的key：(模型, 城市, 天气字段指纹, 排序后前5条新闻指纹)
+        """
+        weather = [weather_data.get(field) for field in SUMMARY_WEATHER_FIELDS]
         
-        # 匹配思考相关的关键词
-        thinking_keywords = [
-            r'现在构思具体内容:.*?(?=\n\n|\n[A-Z]|\n#|\n##|\n###|\n-|\n\d+\.|$)',
-            r'让我分析一下.*?(?=\n\n|\n[A-Z]|\n#|\n##|\n###|\n-|\n\d+\.|$)',
-            r'我需要思考.*?(?=\n\n|\n[A-Z]|\n#|\n##|\n###|\n-|\n\d+\.|$)',
-            r'基于以上信息.*?(?=\n\n|\n[A-Z]|\n#|\n##|\n###|\n-|\n\d+\.|$)',
-            r'现在让我.*?(?=\n\n|\n[A-Z]|\n#|\n##|\n###|\n-|\n\d+\.|$)',
-            r'我会把这些内容.*?(?=\n\n|\n[A-Z]|\n#|\n##|\n###|\n-|\n\d+\.|$)',
-            r'让我来总结.*?(?=\n\n|\n[A-Z]|\n#|\n##|\n###|\n-|\n\d+\.|$)',
-            r'现在我来.*?(?=\n\n|\n[A-Z]|\n#|\n##|\n###|\n-|\n\d+\.|$)',
-            r'基于天气和新闻.*?(?=\n\n|\n[A-Z]|\n#|\n##|\n###|\n-|\n\d+\.|$)',
-            r'让我为您.*?(?=\n\n|\n[A-Z]|\n#|\n##|\n###|\n-|\n\d+\.|$)'
-        ]
+        if city and news_data and relevance_analysis:
+            news = relevance_analysis['relevant_news']
+            counts = [relevance_analysis['relevant_count'], relevance_analysis['total_count']]
+        else:
+            news = news_data or []
+            counts = []
+        news = [[item.get(field) for field in SUMMARY_NEWS_FIELDS] for item in news[:5]]
         
-        for pattern in thinking_keywords:
-            text = re.sub(pattern, '', text, flags=re.DOTALL | re.IGNORECASE)
+        return (
+            self.model_name,
+            city,
+            self._fingerprint(weather),
+            self._fingerprint([counts, news])
+        )
+
+    def _fingerprint(self, data) -> str:
+        """
+        计算数据的内容指纹
+        """
+        payload = json.dumps(data, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def get_cache_stats(self):
+        """
+        获取AI汇总缓存统计
+        """
+        return self.summary_cache.stats()
+
+    def _fallback_summary(self, weather_data, news_data, city, relevance_analysis=None):
+        """
+        生成备用汇总，有城市信息时包含地域相关性
+        """
+        if city and news_data:
+            relevance_analysis = self._analyze_relevance(news_data, city, relevance_analysis)
+            filtered_news = relevance_analysis['relevant_news']
+            fallback_summary = self._generate_fallback_summary_with_relevance(weather_data, filtered_news, city, relevance_analysis)
+        else:
+            fallback_summary = self._generate_fallback_summary(weather_data, news_data)
         
-        # 清理多余的空行
-        text = re.sub(r'\n\s*\n\s*\n', '\n\n', text)
-        text = text.strip()
+        return self._remove_thinking_content(fallback_summary)
+
+    def _generate(self, prompt: str, priority: int = BATCH, context: list = None, cancelled: threading.Event = None) -> dict:
+        """
+        获取调度槽位后调用Ollama生成；排队已满或超时时抛出SchedulerBusyError
+        context: 上一轮返回的context，提供时模型从该状态继续生成
+        cancelled: 提供时改为流式接收，事件被设置后关闭连接让Ollama停止生成并抛出UpstreamCancelled，
+                   返回值与非流式调用相同
+        """
+        options = self._generate_options(context)
+        model = self.model_name
+        with self.scheduler.slot(priority), track_upstream('ollama'):
+            response = ollama.generate(
+                model=model,
+                prompt=prompt,
+                stream=cancelled is not None,
+                **options
+            )
+            if cancelled is not None:
+                response = self._collect_stream(response, cancelled)
+        self.telemetry.record(model, GENERATION_ENDPOINTS[priority], response)
+        return response
+
+    @staticmethod
+    def _collect_stream(stream, cancelled: threading.Event) -> dict:
+        """
+        拼接流式输出为完整的返回，每收到一个片段检查一次是否已取消
+        """
+        parts = []
+        final = {}
+        try:
+            for chunk in stream:
+                if cancelled.is_set():
+                    raise UpstreamCancelled('生成已取消')
+                parts.append(chunk.get('response', ''))
+                if chunk.get('done'):
+                    final = chunk
+        finally:
+            close = getattr(stream, 'close', None)
+            if close is not None:
+                close()
+        return dict(final, response=''.join(parts))
+
+    def _generate_stream(self, prompt: str, priority: int = BATCH, context: list = None, on_done=None):
+        """
+        获取调度槽位后调用Ollama流式生成，边接收边过滤<think>思考内容
+        输出结束或调用方停止读取时释放槽位；on_done接收包含context和耗时统计的最后一个片段
+        """
+        options = self._generate_options(context)
+        model = self.model_name
+        with self.scheduler.slot(priority), track_upstream('ollama_stream'):
+            text_filter = ThinkingFilter()
+            stream = ollama.generate(
+                model=model,
+                prompt=prompt,
+                stream=True,
+                **options
+            )
+            for chunk in stream:
+                if chunk.get('done'):
+                    self.telemetry.record(model, GENERATION_ENDPOINTS[priority] + '_stream', chunk)
+                    if on_done is not None:
+                        on_done(chunk)
+                text = text_filter.feed(chunk.get('response', ''))
+                if text:
+                    yield text
+            text = text_filter.flush()
+            if text:
+                yield text
+
+    async def _generate_async(self, prompt: str, priority: int = BATCH, context: list = None,
+                              queue_timeout: float = None) -> dict:
+        """
+        _generate的异步版本：在事件循环中排队获取调度槽位（与同步请求共用同一个调度器），
+        然后通过AsyncClient等待生成结果
+        """
+        await self._resolve_model_async()
+        await self.scheduler.acquire_async(priority, queue_timeout)
+        try:
+            model = self.model_name
+            with track_upstream('ollama'):
+                response = await self._get_async_client().generate(
+                    model=model,
+                    prompt=prompt,
+                    stream=False,
+                    **self._generate_options(context)
+                )
+            self.telemetry.record(model, GENERATION_ENDPOINTS[priority], response)
+            return response
+        finally:
+            self.scheduler.release()
+
+    async def _resolve_model_async(self):
+        """
+        第一次使用模型时需要查询模型列表（访问Ollama），在线程中进行，不阻塞事件循环
+        """
+        if not self._model_resolved:
+            await asyncio.to_thread(lambda: self.model_name)
+
+    def _get_async_client(self):
+        if self.async_client is None:
+            self.async_client = ollama.AsyncClient()
+        return self.async_client
+
+    def _generate_options(self, context: list = None) -> dict:
+        """
+        调用ollama.generate的可选参数：num_ctx、keep_alive和上一轮的context
+        """
+        options = {'options': {'num_ctx': self.num_ctx}}
+        if self.keep_alive:
+            options['keep_alive'] = self.keep_alive
+        if context:
+            options['context'] = context
+        return options
+
+    def get_scheduler_stats(self):
+        """
+        获取生成调度的并发和排队统计
+        """
+        return self.scheduler.stats()
+
+    def get_generation_stats(self):
+        """
+        获取按模型和调用类型汇总的生成速度（tokens/s）、提示词计算和模型加载耗时
+        """
+        return self.telemetry.stats()
+
+    def _remove_thinking_content(self, text: str) -> str:
+        """
+        去除思考内容：<think>标签、思考过程开头语和多余空行，单次扫描完成
+        """
+        if not text:
+            return text
         
-        return text
+        return remove_thinking(text)
 
     def _build_prompt_with_relevance(self, weather_data, news_data, city, relevance_analysis):
         """
@@ -354,30 +827,198 @@ class OllamaService:
             print(f"Ollama连接测试失败: {e}")
             return False 
 
-    def discuss_news(self, news_content: str, user_question: str, news_title: str = "", conversation_history: list = None) -> str:
+    def discuss_news(self, news_content: str, user_question: str, news_title: str = "", conversation_history: list = None,
+                     deadline: float = None, session_id: str = None) -> str:
         """
         与AI讨论特定新闻，支持持续性对话
         """
+        return self.discuss_news_with_meta(news_content, user_question, news_title, conversation_history,
+                                           deadline, session_id)['answer']
+
+    def discuss_news_with_meta(self, news_content: str, user_question: str, news_title: str = "",
+                               conversation_history: list = None, deadline: float = None, session_id: str = None) -> dict:
+        """
+        与AI讨论新闻并标明来源
+        返回 {'answer': 回复, 'source': 'llm'/'fallback', 'fallback_reason': 'timeout'/'busy'/'error', 'prompt_eval': 本轮提示词计算统计}
+        deadline: 等待生成的最长秒数，None时使用DISCUSSION_DEADLINE，0表示不限制
+        session_id: 提供时复用该会话上一轮的context，追问只需计算新问题
+        """
+        deadline = Config.DISCUSSION_DEADLINE if deadline is None else deadline
+        start = time.monotonic()
         try:
-            prompt = self._build_discussion_prompt(news_content, user_question, news_title, conversation_history)
+            prompt, context = self._discussion_request(session_id, news_content, user_question, news_title, conversation_history)
             
-            response = ollama.generate(
-                model=self.model_name,
-                prompt=prompt,
-                stream=False
-            )
+            # 超过截止时间后不再需要回答：取消生成，释放槽位给排队的请求
+            cancelled = threading.Event()
+            future = self._submit_with_slot(INTERACTIVE, self._queue_timeout(deadline),
+                                            self._generate, prompt, INTERACTIVE, context, cancelled=cancelled)
+            try:
+                response = future.result(timeout=self._remaining(start, deadline))
+            except FutureTimeoutError:
+                cancelled.set()
+                raise
             
             answer = response['response']
             
             # 使用字符串匹配去除思考内容
             answer = self._remove_thinking_content(answer)
             
-            return answer
+            prompt_eval = self._remember_discussion(session_id, news_title, user_question, answer, response, context is not None)
+            return {'answer': answer, 'source': 'llm', 'prompt_eval': prompt_eval}
+            
+        except FutureTimeoutError:
+            print(f"新闻讨论超过{deadline}秒，先返回备用回复")
+            reason = 'timeout'
+        except SchedulerBusyError as e:
+            print(f"新闻讨论失败: {e}")
+            reason = 'busy'
+        except Exception as e:
+            print(f"新闻讨论失败: {e}")
+            reason = 'error'
+        
+        fallback_answer = self._generate_fallback_discussion(news_content, user_question, news_title, conversation_history)
+        return {
+            'answer': self._remove_thinking_content(fallback_answer),
+            'source': 'fallback',
+            'fallback_reason': reason
+        }
+
+    async def discuss_news_with_meta_async(self, news_content: str, user_question: str, news_title: str = "",
+                                           conversation_history: list = None, deadline: float = None,
+                                           session_id: str = None) -> dict:
+        """
+        discuss_news_with_meta的异步版本
+        超过截止时间时取消生成请求，释放模型给排队的请求
+        """
+        deadline = Config.DISCUSSION_DEADLINE if deadline is None else deadline
+        try:
+            await self._resolve_model_async()
+            prompt, context = self._discussion_request(session_id, news_content, user_question, news_title, conversation_history)
+            
+            response = await asyncio.wait_for(self._generate_async(prompt, INTERACTIVE, context), deadline or None)
+            answer = self._remove_thinking_content(response['response'])
+            
+            prompt_eval = self._remember_discussion(session_id, news_title, user_question, answer, response, context is not None)
+            return {'answer': answer, 'source': 'llm', 'prompt_eval': prompt_eval}
             
+        except asyncio.TimeoutError:
+            print(f"新闻讨论超过{deadline}秒，先返回备用回复")
+            reason = 'timeout'
+        except SchedulerBusyError as e:
+            print(f"新闻讨论失败: {e}")
+            reason = 'busy'
         except Exception as e:
             print(f"新闻讨论失败: {e}")
+            reason = 'error'
+        
+        fallback_answer = self._generate_fallback_discussion(news_content, user_question, news_title, conversation_history)
+        return {
+            'answer': self._remove_thinking_content(fallback_answer),
+            'source': 'fallback',
+            'fallback_reason': reason
+        }
+
+    def discuss_news_stream(self, news_content: str, user_question: str, news_title: str = "", conversation_history: list = None,
+                            session_id: str = None, meta: dict = None):
+        """
+        流式与AI讨论新闻，逐段返回已去除思考内容的回答
+        生成开始前失败时返回备用回复，输出部分内容后失败时抛出异常
+        meta: 提供时在生成结束后写入本轮的prompt_eval统计
+        """
+        emitted = False
+        try:
+            prompt, context = self._discussion_request(session_id, news_content, user_question, news_title, conversation_history)
+            final = {}
+            parts = []
+            for text in self._generate_stream(prompt, INTERACTIVE, context, on_done=final.update):
+                emitted = True
+                parts.append(text)
+                yield text
+            prompt_eval = self._remember_discussion(session_id, news_title, user_question, ''.join(parts), final, context is not None)
+            if meta is not None:
+                meta['prompt_eval'] = prompt_eval
+        except Exception as e:
+            print(f"新闻讨论流式生成失败: {e}")
+            if emitted:
+                raise
             fallback_answer = self._generate_fallback_discussion(news_content, user_question, news_title, conversation_history)
-            return self._remove_thinking_content(fallback_answer)
+            yield self._remove_thinking_content(fallback_answer)
+
+    def _discussion_request(self, session_id, news_content, user_question, news_title, conversation_history):
+        """
+        返回本轮的提示词和context
+        会话上一轮由模型回答、且对话历史的最后一轮正是该回答时，只发送追问并复用上一轮的context；
+        否则（首轮、切换模型或新闻、历史被清除或上一轮是备用回复）发送完整提示词。
+        已连续复用context_max_turns轮或context超过context_max_tokens（num_ctx减去为下一轮预留的token数）时
+        也发送完整提示词，context每轮增长，超过num_ctx后Ollama会从开头截断，丢掉新闻正文
+        """
+        entry = self.discussion_contexts.get(session_id) if session_id else None
+        if (entry is not None and conversation_history
+                and entry['model'] == self.model_name and entry['title'] == news_title
+                and tuple(conversation_history[-1]) == entry['last_turn']):
+            if entry['reused_turns'] < self.context_max_turns and len(entry['context']) <= self.context_max_tokens:
+                return self._build_followup_prompt(user_question), entry['context']
+            with self._discussion_stats_lock:
+                self._discussion_stats['context_resets'] += 1
+        return self._build_discussion_prompt(news_content, user_question, news_title, conversation_history), None
+
+    def _remember_discussion(self, session_id, news_title, user_question, answer, response, context_reused) -> dict:
+        """
+        保存本轮返回的context供下一轮追问使用，并记录提示词计算的token数和耗时
+        """
+        if session_id and response.get('context'):
+            previous = self.discussion_contexts.get(session_id) if context_reused else None
+            self.discussion_contexts.set(session_id, {
+                'model': self.model_name,
+                'title': news_title,
+                'last_turn': (user_question, answer),
+                'context': response['context'],
+                # 从上一次发送完整提示词起连续复用context的轮数
+                'reused_turns': previous['reused_turns'] + 1 if previous else 0
+            })
+        
+        prompt_eval = {
+            'context_reused': context_reused,
+            'prompt_eval_count': response.get('prompt_eval_count', 0),
+            'prompt_eval_ms': response.get('prompt_eval_duration', 0) / 1e6
+        }
+        with self._discussion_stats_lock:
+            stats = self._discussion_stats
+            stats['turns'] += 1
+            stats['context_reused'] += int(context_reused)
+            stats['prompt_eval_count'] += prompt_eval['prompt_eval_count']
+            stats['prompt_eval_ms'] += prompt_eval['prompt_eval_ms']
+            stats['last_turn'] = prompt_eval
+        return prompt_eval
+
+    def clear_discussion_context(self, session_id: str):
+        """
+        清除会话保存的context
+        """
+        self.discussion_contexts.invalidate(session_id)
+
+    def get_discussion_stats(self):
+        """
+        获取新闻讨论的context复用率和平均每轮提示词计算量
+        """
+        with self._discussion_stats_lock:
+            stats = dict(self._discussion_stats)
+        turns = stats['turns']
+        stats['avg_prompt_eval_count'] = stats['prompt_eval_count'] / turns if turns else 0
+        stats['avg_prompt_eval_ms'] = stats['prompt_eval_ms'] / turns if turns else 0
+        stats['contexts'] = len(self.discussion_contexts)
+        return stats
+
+    def _build_followup_prompt(self, user_question: str) -> str:
+        """
+        构建复用context时的追问提示词，新闻内容和回答要求已在上一轮context中
+        """
+        return f"""
+
+**追问**: {user_question}
+
+请继续遵循前面的回答要求，基于新闻内容和前面的问答直接回答，不要包含思考过程：
+"""
 
     def _build_discussion_prompt(self, news_content: str, user_question: str, news_title: str = "", conversation_history: list = None) -> str:
         """
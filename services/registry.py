@@ -0,0 +1,79 @@
+import threading
+from typing import Any, Callable
+
+
+class ServiceRegistry:
+    """
+    按名称注册服务的创建函数，服务在第一次使用时才创建
+
+    导入应用时不创建服务、不访问任何外部服务；同一服务的并发首次访问只创建一次。
+    可以用 registry.weather_service 的方式访问已注册的服务。
+    """
+
+    def __init__(self):
+        self._factories = {}  # 名称 -> 创建函数
+        self._instances = {}  # 名称 -> 已创建的服务
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        """
+        注册服务的创建函数，创建函数中可以通过get获取其依赖的其他服务
+        """
+        with self._lock:
+            self._factories[name] = factory
+            self._locks[name] = threading.Lock()
+
+    def get(self, name: str) -> Any:
+        """
+        获取服务，第一次获取时调用创建函数
+        """
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        if name not in self._factories:
+            raise KeyError(f"未注册的服务: {name}")
+
+        with self._locks[name]:
+            instance = self._instances.get(name)
+            if instance is None:
+                instance = self._factories[name]()
+                with self._lock:
+                    self._instances[name] = instance
+            return instance
+
+    def set(self, name: str, instance: Any) -> Any:
+        """
+        替换服务实例（如测试中使用替身服务），返回原来的实例；instance为None时下次使用重新创建
+        """
+        with self._lock:
+            previous = self._instances.pop(name, None)
+            if instance is not None:
+                self._instances[name] = instance
+            return previous
+
+    def preload(self, *names: str) -> threading.Thread:
+        """
+        在后台线程中创建服务，不阻塞调用方
+        """
+        def load():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"创建服务 {name} 失败: {e}")
+
+        thread = threading.Thread(target=load, name='service-preload', daemon=True)
+        thread.start()
+        return thread
+
+    def created(self, name: str) -> bool:
+        return name in self._instances
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._factories
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_') or name not in self._factories:
+            raise AttributeError(name)
+        return self.get(name)
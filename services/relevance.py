@@ -0,0 +1,126 @@
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Set
+
+
+def relevance_level(score: int) -> str:
+    """
+    根据相关分数确定相关级别
+    """
+    if score >= 6:
+        return '高度相关'
+    elif score >= 3:
+        return '相关'
+    elif score >= 1:
+        return '一般相关'
+    return '一般'
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick多关键词匹配自动机
+
+    构建时把失配转移展开为完整的状态转移表（DFA），扫描时每个字符只查一次表，
+    一次扫描即可找出文本中出现的全部关键词，耗时与关键词数量无关。
+    不属于任何关键词的字符总是回到初始状态，所以只需扫描由关键词字符组成的片段。
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = list(dict.fromkeys(keyword for keyword in keywords if keyword))
+
+        # 构建关键词前缀树
+        goto = [{}]
+        outputs = [set()]
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                if char not in goto[state]:
+                    goto.append({})
+                    outputs.append(set())
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            outputs[state].add(index)
+
+        # 按层次计算失配指针，并把失配转移合并进转移表
+        fail = [0] * len(goto)
+        transitions = [dict(goto[0])]
+        transitions.extend({} for _ in range(len(goto) - 1))
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            # 失配状态的转移已经完整，在其基础上覆盖本状态的前缀树转移
+            transitions[state] = dict(transitions[fail[state]])
+            transitions[state].update(goto[state])
+            outputs[state] |= outputs[fail[state]]
+            for char, child in goto[state].items():
+                fail[child] = transitions[fail[state]].get(char, 0)
+                queue.append(child)
+
+        self._transitions = transitions
+        self._outputs = [frozenset(output) for output in outputs]
+        # 只包含关键词字符、且不短于最短关键词的片段
+        alphabet = ''.join(sorted(set(''.join(self.keywords))))
+        min_length = min((len(keyword) for keyword in self.keywords), default=1)
+        self._segments = re.compile(f'[{re.escape(alphabet)}]{{{min_length},}}' if alphabet else r'(?!)')
+
+    def find(self, text: str) -> Set[int]:
+        """
+        返回文本中出现的关键词序号集合
+        """
+        transitions = self._transitions
+        outputs = self._outputs
+        found = set()
+        for segment in self._segments.findall(text):
+            state = 0
+            for char in segment:
+                state = transitions[state].get(char, 0)
+                if outputs[state]:
+                    found |= outputs[state]
+        return found
+
+
+class CityRelevanceScorer:
+    """
+    一次扫描计算新闻与所有城市的相关程度
+
+    标题中出现城市关键词得3分，摘要中出现得1分，与逐个关键词查找的结果相同。
+    """
+
+    def __init__(self, city_keywords: Dict[str, List[str]]):
+        self.city_keywords = city_keywords
+        self.automaton = KeywordAutomaton(
+            keyword.lower() for keywords in city_keywords.values() for keyword in keywords
+        )
+
+        # 关键词序号 -> [(城市, 关键词在该城市列表中的位置, 原关键词)]
+        self._keyword_cities = [[] for _ in self.automaton.keywords]
+        keyword_index = {keyword: index for index, keyword in enumerate(self.automaton.keywords)}
+        for city, keywords in city_keywords.items():
+            for position, keyword in enumerate(keywords):
+                if keyword:
+                    self._keyword_cities[keyword_index[keyword.lower()]].append((city, position, keyword))
+
+    def score(self, title: str, summary: str) -> Dict[str, Dict]:
+        """
+        计算新闻与各城市的相关程度，只返回分数大于0的城市
+        返回 {城市: {'score': 分数, 'matched_keywords': [匹配的关键词]}}
+        """
+        title_found = self.automaton.find((title or '').lower())
+        summary_found = self.automaton.find((summary or '').lower())
+
+        scores = {}
+        matched = {}
+        for index in title_found | summary_found:
+            points = (3 if index in title_found else 0) + (1 if index in summary_found else 0)
+            for city, position, keyword in self._keyword_cities[index]:
+                scores[city] = scores.get(city, 0) + points
+                matched.setdefault(city, []).append((position, keyword))
+
+        # 匹配的关键词按城市关键词列表中的顺序排列
+        return {
+            city: {
+                'score': score,
+                'matched_keywords': [keyword for _, keyword in sorted(matched[city])]
+            }
+            for city, score in scores.items()
+        }
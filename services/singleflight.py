@@ -0,0 +1,114 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    """
+    一次正在进行的上游调用
+    """
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    合并相同key的并发调用：同一时刻只有一个调用真正执行，其余调用等待并共享其结果
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._executions = 0
+        self._shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        执行fn，如果相同key的调用正在进行则等待其结果
+        fn抛出的异常会传给所有等待的调用方
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._shared += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._executions += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.result
+
+    def stats(self) -> Dict:
+        """
+        获取调用合并统计
+        """
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'executions': self._executions,
+                'shared': self._shared
+            }
+
+
+class AsyncSingleFlight:
+    """
+    异步版本的调用合并：同一事件循环中相同key的并发协程只等待一次上游调用
+    """
+
+    def __init__(self):
+        self._calls = {}  # key -> asyncio.Future
+        self._executions = 0
+        self._shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行协程函数fn，如果相同key的调用正在进行则等待其结果
+        """
+        future = self._calls.get(key)
+        if future is not None:
+            self._shared += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(fn())
+        self._calls[key] = future
+        self._executions += 1
+        future.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict:
+        """
+        获取调用合并统计
+        """
+        return {
+            'in_flight': len(self._calls),
+            'executions': self._executions,
+            'shared': self._shared
+        }
+
+
+# 进程内共享的调用合并组，天气和新闻服务默认使用它
+shared_flight = SingleFlight()
+
+# 异步服务模式下共享的调用合并组，只在ASGI应用的事件循环中使用
+shared_async_flight = AsyncSingleFlight()
@@ -0,0 +1,183 @@
+import re
+
+# 思考块的开始标签 -> 结束标签
+THINK_TAGS = {
+    '<think>': '</think>',
+    '<thinking>': '</thinking>'
+}
+
+# 思考过程的开头语，从开头语删除到下一个段落边界
+THINKING_PHRASES = [
+    '现在构思具体内容:',
+    '让我分析一下',
+    '我需要思考',
+    '基于以上信息',
+    '现在让我',
+    '我会把这些内容',
+    '让我来总结',
+    '现在我来',
+    '基于天气和新闻',
+    '让我为您'
+]
+
+_MARKERS = list(THINK_TAGS) + THINKING_PHRASES
+_MARKER_PATTERN = re.compile('|'.join(re.escape(marker) for marker in _MARKERS))
+_TAG_PATTERN = re.compile('|'.join(re.escape(tag) for tag in THINK_TAGS))
+_MARKER_PREFIXES = {marker[:i] for marker in _MARKERS for i in range(1, len(marker))}
+_TAG_PREFIXES = {tag[:i] for tag in THINK_TAGS for i in range(1, len(tag))}
+_MAX_PREFIX = max(len(marker) for marker in _MARKERS) - 1
+
+# 段落边界：空行、换行后紧跟字母、标题、列表项或编号
+_BOUNDARY = re.compile(r'\n(?:\n|[A-Za-z#\-]|\d+\.)')
+_BLANK_LINES = re.compile(r'\n\s*\n\s*\n')
+
+
+class ThinkingFilter:
+    """
+    增量过滤模型输出中的思考内容
+
+    单次扫描完成以下处理：
+    - 去除<think>/<thinking>标签及其内容
+    - 去除以思考开头语开始、到下一个段落边界为止的内容
+    - 把连续三个以上的换行压缩为一个空行，并去除首尾空白
+
+    文本可以分段输入（例如流式生成的token），每次feed返回可以安全输出的部分；
+    末尾可能是标签或开头语前缀的片段会暂存到下一段再判断。输入结束后调用flush取出剩余文本。
+    """
+
+    def __init__(self):
+        self._buffer = ''
+        self._close_tag = None  # 当前所在思考块的结束标签
+        self._carry = ''  # 思考块之前、需要与思考块之后的文本拼接再判断的片段
+        self._in_phrase = False  # 是否处在思考开头语之后、段落边界之前
+        self._started = False  # 是否已经输出过非空白内容
+        self._pending_space = ''  # 暂存的末尾空白，后面有内容时才输出
+
+    def feed(self, chunk: str) -> str:
+        """
+        输入一段文本，返回过滤后可以输出的文本
+        """
+        if not chunk:
+            return ''
+        self._buffer += chunk
+
+        output = []
+        while self._buffer:
+            if self._close_tag is not None:
+                # 在思考块内，丢弃内容直到结束标签
+                index = self._buffer.find(self._close_tag)
+                if index < 0:
+                    keep = len(self._close_tag) - 1
+                    self._buffer = self._buffer[-keep:]
+                    break
+                self._buffer = self._carry + self._buffer[index + len(self._close_tag):]
+                self._carry = ''
+                self._close_tag = None
+                continue
+
+            if self._in_phrase:
+                # 在思考开头语之后，丢弃内容直到段落边界（边界本身保留）
+                boundary = _BOUNDARY.search(self._buffer)
+                tag = _TAG_PATTERN.search(self._buffer)
+                if tag and (boundary is None or tag.start() < boundary.start()):
+                    before = self._buffer[:tag.start()]
+                    self._carry = before[self._phrase_keep_start(before):]
+                    self._buffer = self._buffer[tag.end():]
+                    self._close_tag = THINK_TAGS[tag.group()]
+                    continue
+                if boundary:
+                    self._buffer = self._buffer[boundary.start():]
+                    self._in_phrase = False
+                    continue
+                self._buffer = self._buffer[self._phrase_keep_start(self._buffer):]
+                break
+
+            match = _MARKER_PATTERN.search(self._buffer)
+            if match:
+                before = self._buffer[:match.start()]
+                if match.group() in THINK_TAGS:
+                    # 思考块前面可能是开头语的前半部分，等思考块结束后拼接再判断
+                    safe = self._prefix_start(before, _MARKER_PREFIXES)
+                    output.append(before[:safe])
+                    self._carry = before[safe:]
+                    self._close_tag = THINK_TAGS[match.group()]
+                else:
+                    output.append(before)
+                    self._in_phrase = True
+                self._buffer = self._buffer[match.end():]
+                continue
+
+            # 末尾可能是标签或开头语的前缀，暂不输出；
+            # 末尾是标签前缀时，它前面的开头语前缀也要保留，思考块去掉后两者会拼接
+            safe = self._prefix_start(self._buffer, _MARKER_PREFIXES)
+            if self._buffer[safe:] in _TAG_PREFIXES:
+                safe = self._prefix_start(self._buffer[:safe], _MARKER_PREFIXES)
+            output.append(self._buffer[:safe])
+            self._buffer = self._buffer[safe:]
+            break
+
+        return self._emit(''.join(output))
+
+    def flush(self) -> str:
+        """
+        输入结束，返回剩余的可输出文本；未闭合的思考块和开头语直接丢弃
+        """
+        text = '' if self._close_tag is not None or self._in_phrase else self._buffer
+        self._buffer = ''
+        self._carry = ''
+        self._close_tag = None
+        self._in_phrase = False
+        result = self._emit(text)
+        self._pending_space = ''
+        return result
+
+    def _prefix_start(self, text: str, prefixes: set) -> int:
+        """
+        返回末尾最长的标记前缀的起始位置，没有时返回文本长度
+        """
+        for start in range(max(0, len(text) - _MAX_PREFIX), len(text)):
+            if text[start:] in prefixes:
+                return start
+        return len(text)
+
+    def _phrase_keep_start(self, text: str) -> int:
+        """
+        开头语内容中需要保留的起始位置：末尾可能构成段落边界或思考标签的部分
+        """
+        keep = self._prefix_start(text, _TAG_PREFIXES)
+        newline = text.rfind('\n')
+        if newline >= 0:
+            tail = text[newline + 1:keep]
+            if not tail or tail.isdecimal() or keep == newline + 1:
+                keep = newline
+        return keep
+
+    def _emit(self, text: str) -> str:
+        """
+        去掉开头空白并压缩空行，末尾空白暂存到后面有内容时再输出
+        """
+        if not text:
+            return ''
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return ''
+            self._started = True
+
+        stripped = text.rstrip()
+        if not stripped:
+            self._pending_space += text
+            return ''
+        result = self._pending_space + stripped
+        self._pending_space = text[len(stripped):]
+        if '\n' in result:
+            result = _BLANK_LINES.sub('\n\n', result)
+        return result
+
+
+def remove_thinking(text: str) -> str:
+    """
+    一次性过滤完整文本中的思考内容
+    """
+    text_filter = ThinkingFilter()
+    return text_filter.feed(text) + text_filter.flush()
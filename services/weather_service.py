@@ -1,13 +1,60 @@
 import requests
+import httpx
 import json
 from datetime import datetime
 import re
+from config import Config
+from services.cache import TTLCache, SQLiteCache
+from services.singleflight import shared_flight, shared_async_flight
+from services.http_client import PooledHTTPClient, AsyncHTTPClient
 
 class WeatherService:
-    def __init__(self):
+    def __init__(self, cache_ttl=None, stale_ttl=None, flight=None, async_flight=None, shared_cache_db=None):
+        """
+        shared_cache_db: 多进程共享缓存的SQLite文件，默认使用SHARED_CACHE_DB，为空时只缓存在内存中
+        """
         # 使用免费的天气API
         self.base_url = "http://wttr.in"
         
+        # 合并同一城市的并发请求
+        self.flight = flight or shared_flight
+        self.async_flight = async_flight or shared_async_flight
+        
+        # 复用到wttr.in的keep-alive连接
+        self.http = PooledHTTPClient(
+            'weather',
+            timeout=Config.WEATHER_API_TIMEOUT,
+            pool_connections=1,
+            pool_maxsize=Config.HTTP_POOL_MAXSIZE,
+            max_retries=Config.HTTP_MAX_RETRIES,
+            backoff_factor=Config.HTTP_BACKOFF_FACTOR,
+            upstream='wttr.in'
+        )
+        # 异步服务模式使用的客户端
+        self.async_http = AsyncHTTPClient(
+            'weather_async',
+            timeout=Config.WEATHER_API_TIMEOUT,
+            max_connections=Config.ASYNC_HTTP_MAX_CONNECTIONS,
+            max_retries=Config.HTTP_MAX_RETRIES,
+            backoff_factor=Config.HTTP_BACKOFF_FACTOR,
+            upstream='wttr.in'
+        )
+        
+        # 按城市缓存天气数据，过期后先返回旧值再后台刷新
+        # 设置了共享缓存时，多个工作进程的同一城市只请求一次wttr.in
+        cache_ttl = Config.WEATHER_CACHE_TTL if cache_ttl is None else cache_ttl
+        shared_cache_db = shared_cache_db or Config.SHARED_CACHE_DB
+        self.cache = TTLCache(
+            ttl=cache_ttl,
+            stale_ttl=Config.WEATHER_CACHE_STALE_TTL if stale_ttl is None else stale_ttl,
+            max_size=Config.WEATHER_CACHE_SIZE,
+            name='weather',
+            shared=SQLiteCache(
+                shared_cache_db, cache_ttl, name='weather_shared', table='weather',
+                lease_timeout=Config.SHARED_CACHE_LEASE_TIMEOUT
+            ) if shared_cache_db else None
+        )
+        
         # 中国主要城市列表
         self.chinese_cities = {
             '北京': 'Beijing',
@@ -176,78 +223,14 @@ class WeatherService:
         
     def get_weather(self, city="北京"):
         """
-        获取指定城市的天气信息
+        获取指定城市的天气信息，优先使用缓存
         """
         try:
-            # 处理城市名称
-            processed_city = self._process_city_name(city)
-            
-            # 使用wttr.in API获取天气信息
-            url = f"{self.base_url}/{processed_city}?format=j1"
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            
-            weather_data = response.json()
-            
-            # 解析天气数据
-            current_condition = weather_data['current_condition'][0]
-            
-            # 安全获取天气描述 - 修复显示问题
-            weather_desc = '多云'  # 默认值
-            try:
-                # 优先使用中文描述
-                if 'lang_zh' in current_condition and len(current_condition['lang_zh']) > 0:
-                    lang_zh_item = current_condition['lang_zh'][0]
-                    if isinstance(lang_zh_item, dict) and 'value' in lang_zh_item:
-                        weather_desc = str(lang_zh_item['value'])
-                    else:
-                        weather_desc = str(lang_zh_item)
-                # 备选英文描述
-                elif 'weatherDesc' in current_condition and len(current_condition['weatherDesc']) > 0:
-                    weather_desc_item = current_condition['weatherDesc'][0]
-                    if isinstance(weather_desc_item, dict) and 'value' in weather_desc_item:
-                        weather_desc = str(weather_desc_item['value'])
-                    else:
-                        weather_desc = str(weather_desc_item)
-                # 备选天气图标描述
-                elif 'weatherIconUrl' in current_condition and len(current_condition['weatherIconUrl']) > 0:
-                    # 从图标URL提取天气描述
-                    icon_url_item = current_condition['weatherIconUrl'][0]
-                    if isinstance(icon_url_item, dict) and 'value' in icon_url_item:
-                        icon_url = str(icon_url_item['value'])
-                    else:
-                        icon_url = str(icon_url_item)
-                    
-                    if 'sunny' in icon_url.lower():
-                        weather_desc = '晴天'
-                    elif 'cloudy' in icon_url.lower():
-                        weather_desc = '多云'
-                    elif 'rainy' in icon_url.lower():
-                        weather_desc = '雨天'
-                    elif 'snowy' in icon_url.lower():
-                        weather_desc = '雪天'
-                    else:
-                        weather_desc = '多云'
-            except Exception as e:
-                print(f"解析天气描述时出错: {e}")
-                weather_desc = '多云'
-            
-            # 确保所有字段都是字符串类型
-            weather_info = {
-                'city': str(city),
-                'temperature': str(current_condition['temp_C']),
-                'feels_like': str(current_condition['FeelsLikeC']),
-                'humidity': str(current_condition['humidity']),
-                'description': str(weather_desc),
-                'wind_speed': str(current_condition['windspeedKmph']),
-                'wind_direction': str(current_condition['winddir16Point']),
-                'visibility': str(current_condition['visibility']),
-                'pressure': str(current_condition['pressure']),
-                'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
-            
-            return weather_info
-            
+            key = city.strip()
+            weather_info = self.cache.get_or_load(
+                key, lambda: self.flight.do(('weather', key), lambda: self._fetch_weather(city))
+            )
+            return dict(weather_info)
         except requests.RequestException as e:
             # 如果API调用失败，返回模拟数据
             return self._get_mock_weather(city)
@@ -255,6 +238,124 @@ class WeatherService:
             print(f"获取天气信息时出错: {e}")
             return self._get_mock_weather(city)
     
+    async def get_weather_async(self, city="北京"):
+        """
+        get_weather的异步版本，与同步版本共用缓存
+        """
+        try:
+            key = city.strip()
+            weather_info = await self.cache.get_or_load_async(
+                key, lambda: self.async_flight.do(('weather', key), lambda: self._fetch_weather_async(city))
+            )
+            return dict(weather_info)
+        except httpx.HTTPError:
+            # 如果API调用失败，返回模拟数据
+            return self._get_mock_weather(city)
+        except Exception as e:
+            print(f"获取天气信息时出错: {e}")
+            return self._get_mock_weather(city)
+    
+    def get_cache_stats(self):
+        """
+        获取天气缓存的命中统计
+        """
+        return self.cache.stats()
+    
+    def get_http_stats(self):
+        """
+        获取天气接口的连接池统计
+        """
+        return self.http.stats()
+    
+    def _fetch_weather(self, city):
+        """
+        从wttr.in获取并解析天气信息，失败时抛出异常（不写入缓存）
+        """
+        response = self.http.get(self._weather_url(city))
+        response.raise_for_status()
+        return self._parse_weather(city, response.json())
+    
+    async def _fetch_weather_async(self, city):
+        """
+        _fetch_weather的异步版本
+        """
+        response = await self.async_http.get(self._weather_url(city))
+        response.raise_for_status()
+        return self._parse_weather(city, response.json())
+    
+    def _weather_url(self, city):
+        """
+        wttr.in的JSON格式天气接口地址
+        """
+        # 处理城市名称
+        processed_city = self._process_city_name(city)
+        
+        # 使用wttr.in API获取天气信息
+        return f"{self.base_url}/{processed_city}?format=j1"
+    
+    def _parse_weather(self, city, weather_data):
+        """
+        解析wttr.in返回的天气数据
+        """
+        # 解析天气数据
+        current_condition = weather_data['current_condition'][0]
+        
+        # 安全获取天气描述 - 修复显示问题
+        weather_desc = '多云'  # 默认值
+        try:
+            # 优先使用中文描述
+            if 'lang_zh' in current_condition and len(current_condition['lang_zh']) > 0:
+                lang_zh_item = current_condition['lang_zh'][0]
+                if isinstance(lang_zh_item, dict) and 'value' in lang_zh_item:
+                    weather_desc = str(lang_zh_item['value'])
+                else:
+                    weather_desc = str(lang_zh_item)
+            # 备选英文描述
+            elif 'weatherDesc' in current_condition and len(current_condition['weatherDesc']) > 0:
+                weather_desc_item = current_condition['weatherDesc'][0]
+                if isinstance(weather_desc_item, dict) and 'value' in weather_desc_item:
+                    weather_desc = str(weather_desc_item['value'])
+                else:
+                    weather_desc = str(weather_desc_item)
+            # 备选天气图标描述
+            elif 'weatherIconUrl' in current_condition and len(current_condition['weatherIconUrl']) > 0:
+                # 从图标URL提取天气描述
+                icon_url_item = current_condition['weatherIconUrl'][0]
+                if isinstance(icon_url_item, dict) and 'value' in icon_url_item:
+                    icon_url = str(icon_url_item['value'])
+                else:
+                    icon_url = str(icon_url_item)
+                
+                if 'sunny' in icon_url.lower():
+                    weather_desc = '晴天'
+                elif 'cloudy' in icon_url.lower():
+                    weather_desc = '多云'
+                elif 'rainy' in icon_url.lower():
+                    weather_desc = '雨天'
+                elif 'snowy' in icon_url.lower():
+                    weather_desc = '雪天'
+                else:
+                    weather_desc = '多云'
+        except Exception as e:
+            print(f"解析天气描述时出错: {e}")
+            weather_desc = '多云'
+        
+        # 确保所有字段都是字符串类型
+        weather_info = {
+            'city': str(city),
+            'temperature': str(current_condition['temp_C']),
+            'feels_like': str(current_condition['FeelsLikeC']),
+            'humidity': str(current_condition['humidity']),
+            'description': str(weather_desc),
+            'wind_speed': str(current_condition['windspeedKmph']),
+            'wind_direction': str(current_condition['winddir16Point']),
+            'visibility': str(current_condition['visibility']),
+            'pressure': str(current_condition['pressure']),
+            'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        
+        return weather_info
+    
     def _process_city_name(self, city):
         """
         处理城市名称，支持中文城市名转换为英文
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+API接口测试脚本
+使用Flask测试客户端和替身服务测试接口，不依赖网络和Ollama
+"""
+
+import sys
+import os
+import json
+import asyncio
+import subprocess
+
+import httpx
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+from services.news_service import NewsService
+from services.ollama_service import OllamaService
+from services.model_catalog import ModelCatalog
+from services.registry import ServiceRegistry
+
+class FakeWeatherService:
+    def __init__(self):
+        self.calls = 0
+
+    def get_weather(self, city):
+        self.calls += 1
+        return {'city': city, 'temperature': '20', 'description': '晴'}
+
+    async def get_weather_async(self, city):
+        return self.get_weather(city)
+
+class FakeNewsService(NewsService):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def get_news(self, limit=10, city=None):
+        self.calls += 1
+        return self._get_mock_news(limit, city)
+
+    async def get_news_async(self, limit=10, city=None):
+        return self.get_news(limit, city)
+
+class FakeOllamaService:
+    def __init__(self):
+        self.calls = []
+
+    def generate_summary(self, weather_data, news_data, city='北京', relevance_analysis=None):
+        self.calls.append(relevance_analysis)
+        return f"## {city}汇总"
+
+    def generate_summary_with_meta(self, weather_data, news_data, city='北京', relevance_analysis=None):
+        return {'summary': self.generate_summary(weather_data, news_data, city, relevance_analysis), 'source': 'llm'}
+
+    async def generate_summary_with_meta_async(self, weather_data, news_data, city='北京', relevance_analysis=None):
+        return self.generate_summary_with_meta(weather_data, news_data, city, relevance_analysis)
+
+    def generate_summary_stream(self, weather_data, news_data, city='北京', relevance_analysis=None):
+        self.calls.append(relevance_analysis)
+        yield f"## {city}"
+        yield "汇总"
+
+def _parse_sse(body):
+    events = []
+    for block in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+def _install_fakes():
+    fakes = {
+        'weather_service': FakeWeatherService(),
+        'news_service': FakeNewsService(),
+        'ollama_service': FakeOllamaService()
+    }
+    originals = {name: app_module.registry.set(name, fake) for name, fake in fakes.items()}
+    return fakes, originals
+
+def _restore(originals):
+    for name, service in originals.items():
+        app_module.registry.set(name, service)
+
+def test_dashboard_single_request():
+    """测试/api/dashboard一次返回天气、新闻和汇总，且每个上游只调用一次"""
+    print("📋 测试城市信息面板接口...")
+    fakes, originals = _install_fakes()
+    try:
+        client = app_module.app.test_client()
+        response = client.get('/api/dashboard?city=北京&limit=5')
+        data = response.get_json()
+
+        assert response.status_code == 200
+        assert data['success']
+        assert data['data']['weather']['city'] == '北京'
+        assert data['data']['summary'] == '## 北京汇总'
+        assert data['data']['summary_source'] == 'llm' and not data['data']['fallback']
+        assert data['data']['news'][0]['title'].startswith('北京')
+        assert data['data']['relevance']['relevant_count'] >= 1
+
+        assert fakes['weather_service'].calls == 1
+        assert fakes['news_service'].calls == 1
+        # 汇总复用接口中已完成的相关性分析
+        assert fakes['ollama_service'].calls[0] is not None
+        print("   ✅ 一次请求返回全部信息")
+    finally:
+        _restore(originals)
+
+def test_summary_stream():
+    """测试/api/summary/stream按SSE格式逐段返回汇总"""
+    print("📡 测试汇总流式接口...")
+    fakes, originals = _install_fakes()
+    try:
+        client = app_module.app.test_client()
+        response = client.get('/api/summary/stream?city=上海')
+        assert response.mimetype == 'text/event-stream'
+
+        events = _parse_sse(response.get_data(as_text=True))
+        names = [name for name, _ in events]
+        assert names == ['meta', 'token', 'token', 'done']
+        assert events[0][1]['weather']['city'] == '上海'
+        assert ''.join(data['text'] for name, data in events if name == 'token') == '## 上海汇总'
+        print("   ✅ 流式事件顺序正确")
+    finally:
+        _restore(originals)
+
+def test_asgi_dashboard():
+    """测试异步服务模式下/api/dashboard并发获取天气和新闻并返回汇总"""
+    print("⚡ 测试异步服务模式...")
+    import asgi_app
+
+    async def run():
+        transport = httpx.ASGITransport(app=asgi_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://testserver') as client:
+            dashboard = await client.get('/api/dashboard', params={'city': '北京', 'limit': 5})
+            missing = await client.get('/api/news-content')
+            return dashboard, missing
+
+    fakes, originals = _install_fakes()
+    try:
+        dashboard, missing = asyncio.run(run())
+        data = dashboard.json()
+
+        assert dashboard.status_code == 200
+        assert data['data']['summary'] == '## 北京汇总'
+        assert data['data']['summary_source'] == 'llm'
+        assert data['data']['news'][0]['title'].startswith('北京')
+        assert fakes['weather_service'].calls == 1
+        assert fakes['news_service'].calls == 1
+        assert missing.status_code == 400 and not missing.json()['success']
+        print("   ✅ 异步接口返回结果与Flask接口一致")
+    finally:
+        _restore(originals)
+
+def test_lazy_services():
+    """测试服务在第一次使用时才创建，创建Ollama服务时不查询模型列表"""
+    print("💤 测试服务延迟创建...")
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return [{'name': 'llama3:8b'}, {'name': 'qwen2.5:7b'}]
+
+    registry = ServiceRegistry()
+    registry.register('ollama_service', lambda: OllamaService(catalog=ModelCatalog(loader, ttl=60)))
+    assert not registry.created('ollama_service')
+
+    service = registry.ollama_service
+    assert registry.get('ollama_service') is service
+    assert loads == []
+    # 第一次使用模型时才查询模型列表并自动选择
+    assert service.model_name == 'qwen2.5:7b'
+    assert service.model_name == 'qwen2.5:7b'
+    assert len(loads) == 1
+
+    fake = FakeOllamaService()
+    assert registry.set('ollama_service', fake) is service
+    assert registry.ollama_service is fake
+
+    # 导入应用不启动后台线程，预热和模型列表刷新由启动入口开启
+    code = 'import threading, app; print(threading.active_count())'
+    env = dict(os.environ, OLLAMA_WARMUP='True', OLLAMA_MODELS_REFRESH_INTERVAL='60')
+    output = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            env=env, capture_output=True, text=True, timeout=60).stdout
+    assert output.strip().splitlines()[-1] == '1'
+    print("   ✅ 创建服务时不访问Ollama")
+
+def main():
+    """主测试函数"""
+    print("🧪 开始API接口测试...\n")
+    test_lazy_services()
+    test_dashboard_single_request()
+    test_summary_stream()
+    test_asgi_dashboard()
+    print("\n🎉 API接口测试通过！")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+缓存测试脚本
+离线测试TTL缓存、天气缓存和并发请求合并，不依赖网络
+"""
+
+import sys
+import os
+import asyncio
+import time
+import threading
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+from services.cache import TTLCache, SQLiteCache
+from services.weather_service import WeatherService
+from services.news_service import NewsService
+from services.singleflight import SingleFlight
+from services import ollama_service as ollama_module
+
+def test_ttl_cache_stale_while_revalidate():
+    """测试过期条目先返回旧值再后台刷新"""
+    print("🗄️  测试TTL缓存...")
+    cache = TTLCache(ttl=0.05, stale_ttl=10, name='test')
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get_or_load('k', loader) == 1
+    assert cache.get_or_load('k', loader) == 1
+    time.sleep(0.06)
+
+    # 过期后立即返回旧值，后台刷新
+    assert cache.get_or_load('k', loader) == 1
+    for _ in range(50):
+        if cache.get('k') == 2:
+            break
+        time.sleep(0.01)
+    assert cache.get('k') == 2
+
+    stats = cache.stats()
+    assert stats['misses'] >= 1
+    assert stats['stale_hits'] == 1
+    assert stats['refreshes'] == 1
+    print(f"   ✅ 统计: {stats}")
+
+def test_ttl_cache_lru_eviction():
+    """测试容量上限的LRU淘汰"""
+    cache = TTLCache(ttl=60, max_size=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.stats()['evictions'] == 1
+
+def test_weather_cache():
+    """测试天气服务按城市缓存，失败结果不写入缓存"""
+    print("🌤️  测试天气缓存...")
+    weather_service = WeatherService(cache_ttl=60, stale_ttl=0)
+    calls = []
+
+    def fake_fetch(city):
+        calls.append(city)
+        if city == '失败':
+            raise ValueError('upstream error')
+        return {'city': city, 'temperature': '20'}
+
+    weather_service._fetch_weather = fake_fetch
+
+    first = weather_service.get_weather('北京')
+    first['temperature'] = '99'  # 修改返回值不应影响缓存
+    second = weather_service.get_weather('北京')
+    assert second['temperature'] == '20'
+    assert calls == ['北京']
+
+    assert weather_service.get_weather('失败').get('note') == '模拟数据'
+    assert weather_service.get_weather('失败').get('note') == '模拟数据'
+    assert calls.count('失败') == 2
+
+    # 异步版本解析失败时同样返回模拟数据
+    async def fake_fetch_async(city):
+        raise KeyError('current_condition')
+
+    weather_service._fetch_weather_async = fake_fetch_async
+    assert asyncio.run(weather_service.get_weather_async('解析失败')).get('note') == '模拟数据'
+
+    stats = weather_service.get_cache_stats()
+    assert stats['hits'] == 1
+    assert weather_service.cache.max_size == Config.WEATHER_CACHE_SIZE
+    print(f"   ✅ 命中{stats['hits']}次，未命中{stats['misses']}次")
+
+def test_singleflight_shares_result():
+    """测试相同key的并发调用只执行一次"""
+    print("🔀 测试并发请求合并...")
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_fetch():
+        calls.append(1)
+        started.set()
+        release.wait(2)
+        return {'value': 42}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do('k', slow_fetch)))
+    leader.start()
+    started.wait(2)
+
+    followers = [threading.Thread(target=lambda: results.append(flight.do('k', slow_fetch))) for _ in range(5)]
+    for t in followers:
+        t.start()
+    while flight.stats()['shared'] < 5:
+        time.sleep(0.005)
+    release.set()
+    for t in [leader] + followers:
+        t.join(2)
+
+    assert len(calls) == 1
+    assert results == [{'value': 42}] * 6
+    assert flight.stats() == {'in_flight': 0, 'executions': 1, 'shared': 5}
+    print("   ✅ 6个并发调用只访问上游1次")
+
+def test_singleflight_propagates_error():
+    """测试上游异常传递给调用方，且不会卡住后续调用"""
+    flight = SingleFlight()
+
+    def failing():
+        raise ValueError('boom')
+
+    try:
+        flight.do('k', failing)
+        assert False, '应当抛出异常'
+    except ValueError:
+        pass
+    assert flight.do('k', lambda: 'ok') == 'ok'
+
+def test_news_content_returns_copy():
+    """测试共享的文章结果不会被调用方修改"""
+    news_service = NewsService(flight=SingleFlight())
+    news_service._extract_news_content = lambda url: {'success': True, 'title': 't', 'content': 'c', 'url': url, 'length': 1}
+    first = news_service.get_news_content('http://example.com/a')
+    first['title'] = 'changed'
+    assert news_service.get_news_content('http://example.com/a')['title'] == 't'
+
+def test_article_cache():
+    """测试新闻正文缓存：重复访问不再抓取，失败不缓存，磁盘层重启后仍有效"""
+    print("📄 测试新闻正文缓存...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'articles.db')
+        calls = []
+
+        def fake_extract(url):
+            calls.append(url)
+            success = not url.endswith('fail')
+            return {'success': success, 'title': 't', 'content': 'c', 'url': url, 'length': 1}
+
+        news_service = NewsService(flight=SingleFlight(), article_cache_ttl=60, article_cache_db=db_path)
+        news_service._extract_news_content = fake_extract
+        for _ in range(5):
+            assert news_service.get_news_content('http://example.com/a')['success']
+        news_service.get_news_content('http://example.com/fail')
+        news_service.get_news_content('http://example.com/fail')
+        assert calls == ['http://example.com/a'] + ['http://example.com/fail'] * 2
+        assert news_service.get_cache_stats()['article']['hits'] == 4
+
+        # 新实例内存为空，从磁盘层读取
+        restarted = NewsService(flight=SingleFlight(), article_cache_ttl=60, article_cache_db=db_path)
+        restarted._extract_news_content = fake_extract
+        assert restarted.get_news_content('http://example.com/a')['title'] == 't'
+        assert len(calls) == 3
+        assert restarted.get_cache_stats()['article_disk']['hits'] == 1
+
+        news_service.article_disk_cache.close()
+        restarted.article_disk_cache.close()
+    print("   ✅ 后续讨论不再重复抓取")
+
+def test_shared_cache_across_workers():
+    """测试多个工作进程通过SQLite共享层共用缓存：同时未命中的条目只加载一次"""
+    print("🗄️  测试多进程共享缓存...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'shared.db')
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'city': '北京', 'temperature': '20'}
+
+        # 每个工作进程有自己的内存缓存和数据库连接
+        workers = [
+            TTLCache(ttl=60, name='weather', shared=SQLiteCache(db_path, 60, name='weather_shared', table='weather'))
+            for _ in range(4)
+        ]
+        results = []
+        threads = [
+            threading.Thread(target=lambda cache=cache: results.append(cache.get_or_load('北京', loader)))
+            for cache in workers
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(calls) == 1
+        assert results == [{'city': '北京', 'temperature': '20'}] * 4
+
+        # 一个进程写入的条目，其他进程内存未命中时从共享层读取；删除时同时删除共享层
+        workers[0].set('上海', {'temperature': '25'})
+        assert workers[1].get('上海') == {'temperature': '25'}
+        workers[1].invalidate('上海')
+        assert workers[2].get('上海') is None
+        assert workers[3].stats()['shared']['size'] == 1
+
+        for cache in workers:
+            cache.shared.close()
+    print("   ✅ 4个进程只加载1次")
+
+def test_shared_cache_off_event_loop():
+    """测试异步接口读写共享层（SQLite）在线程中进行，不阻塞事件循环"""
+    print("🧵 测试异步读写共享缓存...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = TTLCache(ttl=60, name='weather', shared=SQLiteCache(os.path.join(tmp, 'shared.db'), 60, table='weather'))
+        threads = []
+        for method in ('lookup', 'set'):
+            original = getattr(cache.shared, method)
+            setattr(cache.shared, method, lambda *args, original=original: threads.append(threading.current_thread()) or original(*args))
+
+        async def load():
+            return {'temperature': '20'}
+
+        async def run():
+            loop_thread = threading.current_thread()
+            assert await cache.get_or_load_async('北京', load) == {'temperature': '20'}
+            cache.invalidate('北京')
+            assert await cache.get_async('北京') is None
+            return loop_thread
+
+        loop_thread = asyncio.run(run())
+        assert len(threads) == 3 and loop_thread not in threads
+        cache.shared.close()
+    print("   ✅ 事件循环线程没有访问SQLite")
+
+def test_summary_cache():
+    """测试输入不变时复用AI汇总，天气或新闻变化时重新生成"""
+    print("🤖 测试AI汇总缓存...")
+    service = ollama_module.OllamaService(model_name='qwen:latest', summary_cache_ttl=60)
+    news_service = NewsService()
+    news = news_service._get_mock_news(5, '北京')
+    weather = {'city': '北京', 'temperature': '20', 'description': '晴', 'update_time': '2024-08-04 10:00:00'}
+    prompts = []
+
+    def fake_generate(model, prompt, stream=False, **kwargs):
+        prompts.append(prompt)
+        return {'response': f'## 汇总{len(prompts)}'}
+
+    original = ollama_module.ollama.generate
+    ollama_module.ollama.generate = fake_generate
+    try:
+        analysis = news_service.analyze_news_relevance(news, '北京')
+        assert service.generate_summary(weather, news, '北京', analysis) == '## 汇总1'
+        # 只有更新时间变化，复用缓存
+        weather_later = dict(weather, update_time='2024-08-04 10:05:00')
+        assert service.generate_summary(weather_later, news, '北京', analysis) == '## 汇总1'
+        assert ''.join(service.generate_summary_stream(weather_later, news, '北京', analysis)) == '## 汇总1'
+        assert len(prompts) == 1
+
+        # 天气、城市或模型变化时重新生成
+        assert service.generate_summary(dict(weather, temperature='25'), news, '北京', analysis) == '## 汇总2'
+        assert service.generate_summary(weather, news, '上海') == '## 汇总3'
+        service.model_name = 'llama3:latest'
+        assert service.generate_summary(weather, news, '北京', analysis) == '## 汇总4'
+    finally:
+        ollama_module.ollama.generate = original
+
+    stats = service.get_cache_stats()
+    # 每次未命中只计一次
+    assert stats['hits'] == 2 and stats['misses'] == 4
+    print(f"   ✅ 命中{stats['hits']}次，生成{len(prompts)}次")
+
+def test_summary_waits_for_other_worker():
+    """测试其他工作进程正在生成相同汇总时，先等待其结果再获取调度槽位，等待不超过截止时间"""
+    print("⏳ 测试等待其他进程生成的汇总...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'shared.db')
+        workers = [ollama_module.OllamaService(model_name='qwen:latest', summary_cache_ttl=60, shared_cache_db=db_path)
+                   for _ in range(2)]
+        service = workers[1]
+        service._generate = None  # 等待其他进程的结果时不会调用模型
+        news_service = NewsService()
+        news = news_service._get_mock_news(5, '北京')
+        analysis = news_service.analyze_news_relevance(news, '北京')
+        weather = {'city': '北京', 'description': '晴'}
+        cache_key = service._summary_cache_key(weather, news, '北京', analysis)
+
+        # 第一个进程取得租约，正在生成
+        _, lease = workers[0].summary_cache.lease(cache_key)
+        assert lease is not None
+        start = time.monotonic()
+        result = service.generate_summary_with_meta(weather, news, '北京', analysis, deadline=0.2)
+        assert result['fallback_reason'] == 'timeout' and time.monotonic() - start < 1
+
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(
+            service.generate_summary_with_meta(weather, news, '北京', analysis, deadline=5)))
+        waiter.start()
+        time.sleep(0.1)
+        assert service.scheduler.stats()['in_flight'] == 0
+        workers[0].summary_cache.set(cache_key, '## 其他进程的汇总')
+        workers[0].summary_cache.release(cache_key, lease)
+        waiter.join(2)
+        assert results == [{'summary': '## 其他进程的汇总', 'source': 'llm'}]
+        assert service.scheduler.stats()['completed'] == 0
+
+        for worker in workers:
+            worker.summary_cache.shared.close()
+    print("   ✅ 等待期间不占用槽位")
+
+def main():
+    """主测试函数"""
+    print("🧪 开始缓存测试...\n")
+    test_ttl_cache_stale_while_revalidate()
+    test_ttl_cache_lru_eviction()
+    test_weather_cache()
+    test_singleflight_shares_result()
+    test_singleflight_propagates_error()
+    test_news_content_returns_copy()
+    test_article_cache()
+    test_shared_cache_across_workers()
+    test_shared_cache_off_event_loop()
+    test_summary_cache()
+    test_summary_waits_for_other_worker()
+    print("\n🎉 缓存测试通过！")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
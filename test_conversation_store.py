@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+对话历史存储测试脚本
+测试轮数限制、LRU淘汰、内存上限、过期删除、SQLite持久化和讨论context复用
+"""
+
+import sys
+import os
+import time
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.conversation_store import ConversationStore
+from services import ollama_service as ollama_module
+
+def test_max_turns():
+    """测试每个会话只保留最近几轮对话"""
+    store = ConversationStore(max_turns=3)
+    for i in range(5):
+        count = store.append('s1', f'问{i}', f'答{i}')
+    assert count == 3
+    assert store.get('s1') == [('问2', '答2'), ('问3', '答3'), ('问4', '答4')]
+    assert store.get('不存在') == []
+
+def test_lru_eviction():
+    """测试超过会话数上限时淘汰最久未访问的会话"""
+    print("🗂️  测试会话LRU淘汰...")
+    store = ConversationStore(max_sessions=2)
+    store.append('a', 'q', 'a')
+    store.append('b', 'q', 'b')
+    store.get('a')
+    store.append('c', 'q', 'c')
+
+    assert store.get('b') == []
+    assert store.get('a') == [('q', 'a')]
+    assert len(store) == 2
+    assert store.stats()['evictions'] == 1
+    print("   ✅ 最久未访问的会话已淘汰")
+
+def test_memory_limit():
+    """测试问答文本总字节数超过上限时淘汰会话"""
+    store = ConversationStore(max_bytes=100)
+    store.append('a', '问题', 'x' * 60)
+    store.append('b', '问题', 'y' * 60)
+    stats = store.stats()
+    assert stats['sessions'] == 1
+    assert stats['bytes'] == len('问题'.encode('utf-8')) + 60
+    assert store.get('a') == []
+
+def test_ttl_expiration():
+    """测试会话超过ttl未访问后过期"""
+    store = ConversationStore(ttl=0.05)
+    store.append('a', 'q', 'a')
+    time.sleep(0.1)
+    assert store.get('a') == []
+    assert store.stats()['expirations'] == 1
+    assert store.stats()['bytes'] == 0
+
+def test_sqlite_persistence():
+    """测试会话写入SQLite，淘汰和重启后仍可读回"""
+    print("💾 测试会话持久化...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'conversations.db')
+        store = ConversationStore(max_sessions=1, db_path=db_path)
+        store.append('a', '问1', '答1')
+        store.append('b', '问2', '答2')
+        # a已从内存淘汰，从磁盘读回
+        assert store.get('a') == [('问1', '答1')]
+        assert store.stats()['disk_loads'] == 1
+        store.clear('b')
+
+        restarted = ConversationStore(db_path=db_path)
+        assert restarted.append('a', '问3', '答3') == 2
+        assert restarted.get('b') == []
+        assert restarted.stats()['disk_sessions'] == 1
+        store._db.close()
+        restarted._db.close()
+    print("   ✅ 重启后会话仍然保留")
+
+def test_shared_between_workers():
+    """测试多个工作进程共用SQLite时，交替追加的对话不会互相覆盖"""
+    print("🤝 测试多进程共用对话历史...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'conversations.db')
+        worker_a = ConversationStore(db_path=db_path, shared=True)
+        worker_b = ConversationStore(db_path=db_path, shared=True)
+        worker_a.append('s', '问1', '答1')
+        assert worker_b.get('s') == [('问1', '答1')]
+        worker_b.append('s', '问2', '答2')
+        # worker_a内存中的旧副本不会覆盖worker_b追加的一轮
+        assert worker_a.append('s', '问3', '答3') == 3
+        assert worker_b.get('s') == [('问1', '答1'), ('问2', '答2'), ('问3', '答3')]
+
+        worker_b.clear('s')
+        assert worker_a.get('s') == []
+        worker_a._db.close()
+        worker_b._db.close()
+
+    try:
+        ConversationStore(shared=True)
+        assert False, '没有db_path时应该报错'
+    except ValueError:
+        pass
+    print("   ✅ 各进程读到相同的对话历史")
+
+def test_discussion_context_reuse():
+    """测试追问复用上一轮的context，只发送新问题；历史被清除后重新发送完整提示词"""
+    print("🧠 测试讨论context复用...")
+    service = ollama_module.OllamaService(model_name='qwen:latest')
+    store = ConversationStore()
+    requests = []
+
+    def fake_generate(prompt, priority=ollama_module.BATCH, context=None, cancelled=None):
+        requests.append((prompt, context))
+        return {
+            'response': f'回答{len(requests)}',
+            'context': (context or []) + [len(requests)],
+            'prompt_eval_count': len(prompt),
+            'prompt_eval_duration': 2_000_000
+        }
+
+    service._generate = fake_generate
+    content = '新闻正文' * 100
+
+    def ask(question):
+        result = service.discuss_news_with_meta(content, question, '标题', store.get('s1'), session_id='s1')
+        store.append('s1', question, result['answer'])
+        return result
+
+    first = ask('有什么影响？')
+    second = ask('原因是什么？')
+    assert content in requests[0][0] and requests[0][1] is None
+    assert content not in requests[1][0] and '原因是什么？' in requests[1][0]
+    assert requests[1][1] == [1]
+    assert not first['prompt_eval']['context_reused'] and second['prompt_eval']['context_reused']
+    assert second['prompt_eval']['prompt_eval_count'] < first['prompt_eval']['prompt_eval_count']
+    assert second['prompt_eval']['prompt_eval_ms'] == 2
+
+    store.clear('s1')
+    ask('未来会怎样？')
+    assert content in requests[2][0] and requests[2][1] is None
+
+    stats = service.get_discussion_stats()
+    assert stats['turns'] == 3 and stats['context_reused'] == 1
+
+    # 连续复用达到上限后重新发送完整提示词，之后再从新的context开始复用
+    service.context_max_turns = 2
+    ask('会持续多久？')
+    ask('谁受影响最大？')
+    ask('还有别的吗？')
+    ask('总结一下')
+    assert [context is not None for _, context in requests[3:]] == [True, True, False, True]
+    assert content in requests[5][0]
+
+    # context超过最大token数时同样重新发送完整提示词
+    service.context_max_tokens = 1
+    ask('最后一个问题')
+    assert content in requests[7][0] and requests[7][1] is None
+    assert service.get_discussion_stats()['context_resets'] == 2
+    print("   ✅ 追问只计算新问题")
+
+def test_context_reuse_for_full_article():
+    """测试默认设置下，截断到5000字的新闻正文追问时仍然复用context，请求固定num_ctx"""
+    print("📰 测试长新闻的context复用...")
+    service = ollama_module.OllamaService(model_name='qwen:latest')
+    store = ConversationStore()
+    requests = []
+
+    def fake_generate(prompt, priority=ollama_module.BATCH, context=None, cancelled=None):
+        requests.append((prompt, context))
+        # 按每个汉字一个token估算，加上300个token的回答
+        return {
+            'response': f'回答{len(requests)}',
+            'context': (context or []) + [0] * (len(prompt) + 300)
+        }
+
+    service._generate = fake_generate
+    content = '新' * 5000 + '...'
+    for question in ['有什么影响？', '原因是什么？', '会持续多久？']:
+        result = service.discuss_news_with_meta(content, question, '标题', store.get('s1'), session_id='s1')
+        store.append('s1', question, result['answer'])
+
+    assert [context is not None for _, context in requests] == [False, True, True]
+    assert len(requests[2][1]) <= service.context_max_tokens < service.num_ctx
+    assert service._generate_options()['options'] == {'num_ctx': service.num_ctx}
+    print(f"   ✅ 第一轮context约{len(requests[1][1])}个token，追问复用context")
+
+def main():
+    """主测试函数"""
+    print("🧪 开始对话历史存储测试...\n")
+    test_max_turns()
+    test_lru_eviction()
+    test_memory_limit()
+    test_ttl_expiration()
+    test_sqlite_persistence()
+    test_shared_between_workers()
+    test_discussion_context_reuse()
+    test_context_reuse_for_full_article()
+    print("\n🎉 对话历史存储测试通过！")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
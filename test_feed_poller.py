@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+新闻后台轮询测试脚本
+测试去重、环形缓冲区、退避和get_news从缓冲区读取
+"""
+
+import sys
+import os
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.feed_poller import FeedPoller
+from services.news_service import NewsService
+from services.news_index import NewsRankingIndex
+
+def _items(*ids):
+    return [{'docid': f'doc{i}', 'title': f'新闻{i}', 'url': f'https://news.sina.com.cn/{i}.html'} for i in ids]
+
+def test_incremental_ingestion():
+    """测试按docid去重，新条目按从新到旧加入缓冲区，超出容量丢弃最旧的"""
+    print("📥 测试增量写入...")
+    batches = [_items(3, 2, 1), _items(5, 4, 3, 2), _items(6, 5)]
+    poller = FeedPoller(lambda: batches.pop(0), buffer_size=4)
+
+    assert poller.poll_once() == 3
+    assert poller.poll_once() == 2
+    assert [item['docid'] for item in poller.latest(10)] == ['doc5', 'doc4', 'doc3', 'doc2']
+    assert poller.poll_once() == 1
+    assert [item['docid'] for item in poller.latest(2)] == ['doc6', 'doc5']
+    assert poller.stats()['buffer_size'] == 4
+
+    # 转换失败的条目不标记为已见过，下次轮询时重试
+    failures = {'doc2'}
+
+    def transform(item):
+        if item['docid'] in failures:
+            raise ValueError('转换失败')
+        return item
+
+    poller = FeedPoller(lambda: _items(2, 1), transform=transform)
+    assert poller.poll_once() == 1
+    failures.clear()
+    assert poller.poll_once() == 1
+    assert [item['docid'] for item in poller.latest(10)] == ['doc2', 'doc1']
+    print("   ✅ 只写入新条目")
+
+def test_backoff():
+    """测试没有新条目或失败时退避，有新条目时恢复轮询间隔"""
+    responses = [_items(1), _items(1), None, _items(2)]
+    poller = FeedPoller(lambda: responses.pop(0), interval=10, max_interval=30)
+
+    poller.poll_once()
+    assert poller.stats()['interval'] == 10
+    poller.poll_once()
+    assert poller.stats()['interval'] == 20
+    assert poller.poll_once() == -1
+    assert poller.stats()['interval'] == 30
+    poller.poll_once()
+    stats = poller.stats()
+    assert stats['interval'] == 10
+    assert stats['errors'] == 1
+    assert stats['lag'] is not None and stats['lag'] < 1
+
+def test_first_poll_failure():
+    """测试第一次轮询失败时不退避，缓冲区为空期间get_news直接请求接口"""
+    print("🩹 测试首次轮询失败...")
+    poller = FeedPoller(lambda: None, interval=60, max_interval=600, retry_interval=5)
+    assert poller.poll_once() == -1
+    assert poller.poll_once() == -1
+    assert poller.stats()['interval'] == 5
+
+    news_service = NewsService(poll=True)
+    news_service.poller.fetch = lambda: None
+    news_service._request_feed = lambda page=1: [
+        {'docid': f'{page}-{i}', 'title': f'北京新闻{page}-{i}', 'intro': ''} for i in range(10)
+    ]
+    try:
+        news = news_service.get_news(3, '北京')
+        assert [item['title'] for item in news] == ['北京新闻1-0', '北京新闻1-1', '北京新闻1-2']
+        assert news_service.get_feed_stats()['errors'] == 1
+    finally:
+        news_service.poller.stop()
+    print("   ✅ 缓冲区为空时直接获取新闻")
+
+def test_get_news_from_buffer():
+    """测试开启轮询后get_news从缓冲区读取，不在请求中访问接口"""
+    print("📰 测试从缓冲区获取新闻...")
+    news_service = NewsService(poll=True)
+    calls = []
+
+    def fake_fetch():
+        calls.append(1)
+        return [{'docid': 'a', 'title': '北京科技创新中心建设', 'intro': '中关村', 'url': 'https://news.sina.com.cn/a.html'}] + \
+               [{'docid': f'b{i}', 'title': f'其他新闻{i}', 'intro': '', 'url': f'https://news.sina.com.cn/b{i}.html'} for i in range(5)]
+
+    news_service.poller.fetch = fake_fetch
+    try:
+        news = news_service.get_news(3, '北京')
+        assert news[0]['title'] == '北京科技创新中心建设'
+        assert news[0]['relevance_score'] == 4
+        assert len(news) == 3
+
+        news_service.get_news(3, '上海')
+        assert len(calls) == 1
+        # 返回的是副本，不会修改缓冲区中的条目
+        assert news_service.poller.latest(1)[0]['relevance_score'] == 0
+        assert news_service.get_feed_stats()['running']
+    finally:
+        news_service.poller.stop()
+    print("   ✅ 请求中不再访问新闻接口")
+
+def test_ranking_index():
+    """测试按城市的排名索引：分数高、时间新的在前，保留top-K，删除后不再返回"""
+    print("🏆 测试城市排名索引...")
+    index = NewsRankingIndex(['北京', '上海'], top_k=3)
+    scores = {'a': 3, 'b': 4, 'c': 3, 'd': 1, 'e': 6}
+    for key, score in scores.items():
+        index.add(key, {'title': key, 'city_relevance': {'北京': {'score': score, 'matched_keywords': []}}})
+
+    ranked = index.ranked('北京', 10)
+    assert [item['title'] for item in ranked] == ['e', 'b', 'c']
+    assert ranked[0]['relevance_score'] == 6 and ranked[0]['relevance_level'] == '高度相关'
+    assert index.ranked('上海', 10) == []
+
+    index.remove('b')
+    assert [item['title'] for item in index.ranked('北京', 2)] == ['e', 'c']
+
+    # 被挤出top-K的新闻仍在缓冲区中，排在前面的新闻删除后重新进入排名
+    index.remove('e')
+    assert [item['title'] for item in index.ranked('北京', 10)] == ['c', 'a', 'd']
+    print("   ✅ 排名正确")
+
+def test_get_news_reads_index():
+    """测试开启轮询后按城市获取新闻直接读取索引，不再逐条计算相关程度"""
+    news_service = NewsService(poll=True)
+    news_service.poller.fetch = lambda: [
+        {'docid': str(i), 'title': title, 'intro': '', 'url': f'https://news.sina.com.cn/{i}.html'}
+        for i, title in enumerate(['其他新闻', '上海浦东新闻', '北京新闻', '北京海淀中关村新闻'])
+    ]
+    news_service._calculate_relevance = None  # 走索引时不会调用
+    try:
+        news = news_service.get_news(3, '北京')
+        assert [item['title'] for item in news] == ['北京海淀中关村新闻', '北京新闻', '其他新闻']
+        assert [item['relevance_score'] for item in news] == [9, 3, 0]
+        assert not any('city_relevance' in item for item in news)
+    finally:
+        news_service.poller.stop()
+
+def test_multi_page_fetch():
+    """测试多页并发请求、跨页去重，以及相关新闻足够时不再请求后面的页"""
+    print("📚 测试多页新闻获取...")
+    news_service = NewsService()
+    news_service.max_pages = 7
+    barrier = threading.Barrier(news_service.page_concurrency, timeout=2)
+    requested = []
+
+    def fake_request(page=1):
+        requested.append(page)
+        if page > 1:
+            barrier.wait()  # 第一页之后同一批的页没有并发请求时会超时
+        items = [{'docid': f'p{page}-{i}', 'title': f'第{page}页新闻{i}', 'intro': ''} for i in range(10)]
+        # 第2页重复第1页的一条新闻，第6页有2条北京新闻
+        if page == 2:
+            items.append({'docid': 'p1-0', 'title': '第1页新闻0', 'intro': ''})
+        if page == 6:
+            items += [{'docid': f'bj{i}', 'title': f'北京新闻{i}', 'intro': ''} for i in range(2)]
+        return items
+
+    news_service._request_feed = fake_request
+    news = news_service.get_news(2, '北京')
+
+    assert requested[0] == 1 and sorted(requested) == [1, 2, 3, 4, 5, 6, 7]
+    assert [item['title'] for item in news] == ['北京新闻0', '北京新闻1']
+    assert not any('city_relevance' in item for item in news)
+
+    # 不指定城市时第一页的新闻已经足够，不再请求后面的页
+    requested.clear()
+    news = news_service.get_news(5)
+    assert requested == [1]
+    titles = [item['title'] for item in news]
+    assert len(titles) == len(set(titles)) == 5
+    print("   ✅ 相关新闻足够后停止请求")
+
+def main():
+    """主测试函数"""
+    print("🧪 开始新闻轮询测试...\n")
+    test_incremental_ingestion()
+    test_backoff()
+    test_first_poll_failure()
+    test_get_news_from_buffer()
+    test_ranking_index()
+    test_get_news_reads_index()
+    test_multi_page_fetch()
+    print("\n🎉 新闻轮询测试通过！")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+新闻正文提取测试脚本
+测试各提取器后端与原逐个select的实现结果一致
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+from services.html_extractor import EXTRACTORS, HAS_LXML, create_extractor, detect_encoding
+from bench_html_extract import build_sina_page, legacy_extract
+
+LONG_TEXT = '北京科技创新中心建设加速推进，多项重大科技成果落地，' * 3
+
+PAGES = [
+    # 低优先级选择器在前，应当选中优先级更高的.article-body
+    """<html><head><title>页面标题</title></head><body>
+<div class="content">侧栏</div><h2 class="title">副标题</h2><h1>主标题</h1>
+<div class="article-body main"><p>第一段</p><p>第二段</p></div></body></html>""",
+    # 没有正文选择器时提取较长的段落，没有标题选择器时使用<title>
+    f"""<html><head><title>只有页面标题</title></head><body>
+<p>短段落</p><p>{LONG_TEXT}</p><p>  {LONG_TEXT}  </p></body></html>""",
+    # id选择器
+    """<html><body><div id="artibody"><p>正文</p></div><div class="headline">头条</div></body></html>""",
+    build_sina_page(1)
+]
+
+def _backends():
+    return [name for name in EXTRACTORS if name != 'lxml' or HAS_LXML]
+
+def test_backends_match_legacy():
+    """测试各后端提取结果与原实现一致"""
+    print("📄 测试正文提取后端...")
+    for name in _backends():
+        extractor = create_extractor(name)
+        for html in PAGES:
+            assert extractor.extract(html) == legacy_extract(html), (name, html[:60])
+        print(f"   ✅ {name}结果与原实现一致")
+
+def test_scripts_removed():
+    """测试正文中的脚本和样式内容被去除"""
+    html = '<div class="article-content">正文<script>var a = 1;</script><style>p {}</style>结束</div>'
+    for name in _backends():
+        assert create_extractor(name).extract(html) == ('未知标题', '正文结束')
+
+def test_detect_encoding():
+    """测试优先使用响应头和<meta>声明的编码，未声明时返回None"""
+    assert detect_encoding(b'', 'text/html; charset=UTF-8') == 'UTF-8'
+    assert detect_encoding(b'<meta charset="gb2312">', 'text/html') == 'gb18030'
+    assert detect_encoding(b'<meta http-equiv="Content-Type" content="text/html; charset=GBK" />') == 'gb18030'
+    assert detect_encoding(b'<html></html>', 'text/html') is None
+    assert detect_encoding(b'<meta charset="unknown-codec">') is None
+
+def main():
+    """主测试函数"""
+    print("🧪 开始新闻正文提取测试...\n")
+    test_backends_match_legacy()
+    test_scripts_removed()
+    test_detect_encoding()
+    print("\n🎉 新闻正文提取测试通过！")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+连接池测试脚本
+使用本地HTTP服务测试keep-alive连接复用和失败重试，不依赖外网
+"""
+
+import sys
+import os
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+
+from services.http_client import PooledHTTPClient
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    failures_left = 0
+    slow_requests = 0
+
+    def do_GET(self):
+        if self.path == '/slow':
+            _Handler.slow_requests += 1
+            time.sleep(0.3)
+        if self.path == '/flaky' and _Handler.failures_left > 0:
+            _Handler.failures_left -= 1
+            status, body = 503, b'busy'
+        else:
+            status, body = 200, b'{"ok": true}'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def _start_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def test_keep_alive_reuses_connection():
+    """测试多次请求复用同一个连接"""
+    print("🔌 测试连接复用...")
+    server = _start_server()
+    try:
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        client = PooledHTTPClient('test', timeout=5)
+        for _ in range(5):
+            response = client.get(f"{base_url}/ok")
+            assert response.json() == {'ok': True}
+
+        stats = client.stats()
+        host = stats['hosts'][f"http://127.0.0.1:{server.server_address[1]}"]
+        assert stats['requests'] == 5
+        assert host['requests'] == 5
+        assert host['connections_opened'] == 1
+        print(f"   ✅ 5次请求只建立了{host['connections_opened']}个连接")
+    finally:
+        server.shutdown()
+
+def test_retry_on_server_error():
+    """测试5xx响应自动重试"""
+    server = _start_server()
+    try:
+        _Handler.failures_left = 2
+        client = PooledHTTPClient('test', timeout=5, max_retries=2, backoff_factor=0)
+        response = client.get(f"http://127.0.0.1:{server.server_address[1]}/flaky")
+        assert response.status_code == 200
+    finally:
+        _Handler.failures_left = 0
+        server.shutdown()
+
+def test_read_timeout_not_retried():
+    """测试读取超时不重试，timeout即为等待时间的上限"""
+    server = _start_server()
+    try:
+        _Handler.slow_requests = 0
+        client = PooledHTTPClient('test', timeout=0.1, max_retries=2, backoff_factor=0)
+        start = time.monotonic()
+        try:
+            client.get(f"http://127.0.0.1:{server.server_address[1]}/slow")
+            assert False, '应该超时'
+        except requests.Timeout:
+            pass
+        assert time.monotonic() - start < 0.25
+        assert _Handler.slow_requests == 1
+        assert client.stats()['timeouts'] == 1
+    finally:
+        server.shutdown()
+
+def test_host_pool_sizes():
+    """测试按主机前缀单独设置连接池大小"""
+    server = _start_server()
+    try:
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        client = PooledHTTPClient('test', timeout=5, pool_maxsize=10, host_pool_sizes={base_url: 3})
+        client.get(f"{base_url}/ok")
+        assert client.stats()['hosts'][base_url]['pool_maxsize'] == 3
+    finally:
+        server.shutdown()
+
+def main():
+    """主测试函数"""
+    print("🧪 开始连接池测试...\n")
+    test_keep_alive_reuses_connection()
+    test_retry_on_server_error()
+    test_read_timeout_not_retried()
+    test_host_pool_sizes()
+    print("\n🎉 连接池测试通过！")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
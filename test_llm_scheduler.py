@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+模型生成调度测试脚本
+测试并发上限、优先级、队列已满、排队超时、模型预热和生成速度统计
+"""
+
+import sys
+import os
+import time
+import asyncio
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.llm_scheduler import LLMScheduler, SchedulerBusyError, INTERACTIVE, BATCH
+from services import ollama_service as ollama_module
+from services.news_service import NewsService
+from services.model_catalog import ModelCatalog
+
+def _wait_queued(scheduler, count):
+    while sum(scheduler.stats()['queued'].values()) < count:
+        time.sleep(0.005)
+
+def test_interactive_before_batch():
+    """测试排队时新闻讨论先于汇总报告执行"""
+    print("🚦 测试优先级调度...")
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=10, timeout=2)
+    order = []
+
+    def run(name, priority):
+        with scheduler.slot(priority):
+            order.append(name)
+
+    scheduler.acquire(BATCH)
+    threads = []
+    for name, priority in [('summary1', BATCH), ('summary2', BATCH), ('discuss', INTERACTIVE)]:
+        thread = threading.Thread(target=run, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        _wait_queued(scheduler, len(threads))
+    scheduler.release()
+    for thread in threads:
+        thread.join(2)
+
+    assert order == ['discuss', 'summary1', 'summary2']
+    stats = scheduler.stats()
+    assert stats['in_flight'] == 0 and stats['completed'] == 4
+    print("   ✅ 讨论请求优先执行")
+
+def test_queue_full_and_timeout():
+    """测试队列已满时立即失败，排队超时后失败"""
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=1, timeout=0.05)
+    scheduler.acquire()
+
+    errors = []
+    waiter = threading.Thread(target=lambda: errors.append(_try_acquire(scheduler)))
+    waiter.start()
+    _wait_queued(scheduler, 1)
+
+    start = time.monotonic()
+    assert isinstance(_try_acquire(scheduler), SchedulerBusyError)
+    assert time.monotonic() - start < 0.05
+
+    waiter.join(2)
+    assert isinstance(errors[0], SchedulerBusyError)
+    stats = scheduler.stats()
+    assert stats['rejected'] == 1 and stats['timeouts'] == 1
+    scheduler.release()
+
+def test_interactive_evicts_batch():
+    """测试队列被汇总请求排满时，新闻讨论挤出最后排队的汇总请求"""
+    print("🪑 测试讨论挤出排队的汇总...")
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=3, timeout=2)
+    scheduler.acquire()
+    order, errors = [], {}
+
+    def run(name, priority):
+        try:
+            with scheduler.slot(priority):
+                order.append(name)
+        except SchedulerBusyError as e:
+            errors[name] = e
+
+    threads = []
+    for name, priority in [('summary1', BATCH), ('summary2', BATCH), ('summary3', BATCH), ('discuss', INTERACTIVE)]:
+        thread = threading.Thread(target=run, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        _wait_queued(scheduler, min(len(threads), 3))
+    threads[2].join(2)
+    assert list(errors) == ['summary3']
+    assert scheduler.stats()['queued'] == {'interactive': 1, 'batch': 2}
+
+    # 没有可以挤出的汇总请求时，讨论请求同样被拒绝
+    full = LLMScheduler(max_concurrency=1, max_queue=0)
+    full.acquire()
+    try:
+        full.acquire(INTERACTIVE)
+        assert False, '队列已满时应该拒绝'
+    except SchedulerBusyError:
+        pass
+
+    scheduler.release()
+    for thread in threads:
+        thread.join(2)
+    assert order == ['discuss', 'summary1', 'summary2']
+    assert scheduler.stats()['rejected'] == 1
+    print("   ✅ 讨论请求不会因汇总排满队列而失败")
+
+def test_async_waiters_hold_no_thread():
+    """测试事件循环中排队不占用线程，与同步请求按优先级共用队列，取消和超时时退出队列"""
+    print("🧵 测试异步排队...")
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=16, timeout=2)
+    order = []
+
+    async def run(name, priority, timeout=None):
+        await scheduler.acquire_async(priority, timeout)
+        order.append(name)
+        scheduler.release()
+
+    def discuss():
+        with scheduler.slot(INTERACTIVE):
+            order.append('discuss')
+
+    async def main():
+        scheduler.acquire()
+        threads = threading.active_count()
+        tasks = [asyncio.ensure_future(run(f'summary{i}', BATCH)) for i in range(8)]
+        cancelled = asyncio.ensure_future(run('cancelled', BATCH))
+        expired = asyncio.ensure_future(run('expired', BATCH, 0.05))
+        await asyncio.sleep(0.02)
+        assert scheduler.stats()['queued']['batch'] == 10
+        assert threading.active_count() == threads
+
+        # 同步请求在线程中排队，优先级更高时先于异步请求获得槽位
+        thread = threading.Thread(target=discuss)
+        thread.start()
+        while scheduler.stats()['queued']['interactive'] == 0:
+            await asyncio.sleep(0.005)
+
+        cancelled.cancel()
+        try:
+            await expired
+            assert False, '排队超时时应该失败'
+        except SchedulerBusyError:
+            pass
+        assert scheduler.stats()['queued']['batch'] == 8
+
+        scheduler.release()
+        await asyncio.wait_for(asyncio.gather(*tasks), 2)
+        thread.join(2)
+
+    asyncio.run(main())
+    assert order == ['discuss'] + [f'summary{i}' for i in range(8)]
+    stats = scheduler.stats()
+    assert stats['in_flight'] == 0 and stats['timeouts'] == 1 and sum(stats['queued'].values()) == 0
+    print("   ✅ 异步请求在事件循环中排队")
+
+def _try_acquire(scheduler):
+    try:
+        scheduler.acquire()
+        scheduler.release()
+    except SchedulerBusyError as e:
+        return e
+
+def test_summary_falls_back_when_busy():
+    """测试模型繁忙时汇总直接返回备用汇总"""
+    print("🛟 测试繁忙时的备用汇总...")
+    service = ollama_module.OllamaService(model_name='qwen:latest')
+    service.scheduler = LLMScheduler(max_concurrency=1, max_queue=0)
+    news_service = NewsService()
+    news = news_service._get_mock_news(5, '北京')
+    analysis = news_service.analyze_news_relevance(news, '北京')
+
+    service.scheduler.acquire()
+    try:
+        summary = service.generate_summary({'city': '北京', 'description': '晴'}, news, '北京', analysis)
+    finally:
+        service.scheduler.release()
+    assert summary.startswith('# AI智能汇总报告')
+    assert '北京科技创新中心建设加速推进' in summary
+    print("   ✅ 返回备用汇总")
+
+def test_summary_deadline():
+    """测试生成超过截止时间时先返回备用汇总，生成完成后结果写入缓存"""
+    print("⏱️ 测试汇总截止时间...")
+    service = ollama_module.OllamaService(model_name='qwen:latest')
+    release = threading.Event()
+    calls = []
+
+    def slow_generate(prompt, priority=BATCH):
+        calls.append(prompt)
+        release.wait(2)
+        return {'response': '## 模型汇总'}
+
+    service._generate = slow_generate
+    news_service = NewsService()
+    news = news_service._get_mock_news(5, '北京')
+    analysis = news_service.analyze_news_relevance(news, '北京')
+    weather = {'city': '北京', 'description': '晴'}
+
+    start = time.monotonic()
+    result = service.generate_summary_with_meta(weather, news, '北京', analysis, deadline=0.05)
+    assert time.monotonic() - start < 1
+    assert result['source'] == 'fallback' and result['fallback_reason'] == 'timeout'
+    assert result['summary'].startswith('# AI智能汇总报告')
+
+    # 生成期间的相同请求复用同一个生成任务
+    assert service.generate_summary_with_meta(weather, news, '北京', analysis, deadline=0.01)['source'] == 'fallback'
+    future, = service._pending_summaries.values()
+    release.set()
+    future.result(2)
+
+    result = service.generate_summary_with_meta(weather, news, '北京', analysis, deadline=0.05)
+    assert result == {'summary': '## 模型汇总', 'source': 'cache'}
+    assert len(calls) == 1
+    print("   ✅ 超时返回备用汇总，迟到的结果写入缓存")
+
+def test_scheduler_is_only_queue():
+    """测试并发汇总请求只在调度器中排队：超出队列上限的立即返回备用汇总，线程池中没有积压"""
+    print("🚧 测试线程池不形成第二个队列...")
+    service = ollama_module.OllamaService(model_name='qwen:latest')
+    service.scheduler = LLMScheduler(max_concurrency=1, max_queue=2, timeout=2)
+    release = threading.Event()
+
+    def slow_generate(prompt, priority=BATCH):
+        release.wait(2)
+        return {'response': '## 模型汇总'}
+
+    service._generate = slow_generate
+    news_service = NewsService()
+    news = news_service._get_mock_news(5, '北京')
+    analysis = news_service.analyze_news_relevance(news, '北京')
+    results = []
+
+    def request(i):
+        weather = {'city': '北京', 'description': '晴', 'temperature': i}
+        results.append(service.generate_summary_with_meta(weather, news, '北京', analysis, deadline=1))
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    _wait_queued(service.scheduler, 2)
+    while len(results) < 7:
+        time.sleep(0.005)
+    stats = service.scheduler.stats()
+    assert stats['in_flight'] == 1 and stats['rejected'] == 7
+    assert service.executor._work_queue.qsize() == 0
+    assert all(result['fallback_reason'] == 'busy' for result in results)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+    assert [result['source'] for result in results].count('llm') == 3
+    print("   ✅ 超出队列上限的请求立即返回")
+
+def test_discussion_deadline_cancels():
+    """测试新闻讨论超过截止时间时取消生成，释放槽位"""
+    print("✂️ 测试讨论超时取消生成...")
+    service = ollama_module.OllamaService(model_name='qwen:latest')
+    closed = threading.Event()
+
+    def fake_generate(model, prompt, stream=False, **kwargs):
+        assert stream
+        try:
+            for _ in range(200):
+                time.sleep(0.01)
+                yield {'response': '字', 'done': False}
+        finally:
+            closed.set()
+
+    original = ollama_module.ollama.generate
+    ollama_module.ollama.generate = fake_generate
+    try:
+        result = service.discuss_news_with_meta('正文', '问题', '标题', deadline=0.05)
+        assert result['source'] == 'fallback' and result['fallback_reason'] == 'timeout'
+        assert closed.wait(1)
+    finally:
+        ollama_module.ollama.generate = original
+    time.sleep(0.05)
+    assert service.scheduler.stats()['in_flight'] == 0
+    print("   ✅ 超时后停止生成")
+
+def test_set_model_warms_up():
+    """测试切换模型前先预热新模型，预热失败时保持原模型"""
+    print("🔥 测试模型预热...")
+    service = ollama_module.OllamaService(model_name='qwen:latest')
+    service.keep_alive = '30m'
+    service.catalog = ModelCatalog(lambda: [{'name': 'qwen:latest'}, {'name': 'llama3:8b'}, {'name': 'broken:1b'}])
+    calls = []
+
+    def fake_generate(model, prompt, stream=False, **kwargs):
+        calls.append((model, prompt, kwargs, service.model_name))
+        if model == 'broken:1b':
+            raise RuntimeError('out of memory')
+        return {'response': '', 'done': True, 'load_duration': 1_500_000_000}
+
+    original = ollama_module.ollama.generate
+    ollama_module.ollama.generate = fake_generate
+    try:
+        assert service.set_model('llama3:8b')
+        # 预热发生在切换之前，空提示词只加载模型
+        assert calls == [('llama3:8b', '', {'options': {'num_ctx': service.num_ctx}, 'keep_alive': '30m'}, 'qwen:latest')]
+        assert service.model_name == 'llama3:8b'
+
+        assert not service.set_model('broken:1b')
+        assert service.model_name == 'llama3:8b'
+
+        stats = service.get_warmup_stats()
+        assert stats['models']['llama3:8b']['load_ms'] == 1500
+        assert not stats['models']['broken:1b']['success']
+    finally:
+        ollama_module.ollama.generate = original
+    assert service._parse_keep_alive('-1') == -1 and service._parse_keep_alive('1h') == '1h'
+    print("   ✅ 新模型预热后才切换")
+
+def test_model_catalog():
+    """测试模型列表缓存：切换和列出模型不再访问Ollama，失效或遇到未知模型时重新加载"""
+    print("📒 测试模型列表缓存...")
+    loads = []
+    available = [{'name': 'qwen:latest'}]
+
+    def loader():
+        loads.append(1)
+        return list(available)
+
+    catalog = ModelCatalog(loader, ttl=60)
+    service_a = ollama_module.OllamaService(catalog=catalog)
+    service_b = ollama_module.OllamaService(catalog=catalog)
+    assert service_a.model_name == service_b.model_name == 'qwen:latest'
+    assert service_a.set_model('qwen:latest')
+    assert service_b.get_available_models() == available
+    assert len(loads) == 1
+
+    # 新下载的模型：缓存中没有时重新加载一次
+    available.append({'name': 'llama3:8b'})
+    assert catalog.has('llama3:8b')
+    assert not catalog.has('missing:1b')
+    assert len(loads) == 3
+
+    catalog.invalidate()
+    catalog.models()
+    assert len(loads) == 4
+
+    def failing():
+        raise ConnectionError('ollama down')
+
+    catalog.loader = failing
+    assert catalog.refresh() is False
+    assert [m['name'] for m in catalog.models()] == ['qwen:latest', 'llama3:8b']
+    print("   ✅ 模型列表只加载一次")
+
+def test_generation_telemetry():
+    """测试按模型和调用类型汇总每次生成的token数、加载和提示词计算耗时"""
+    print("⏲️ 测试生成速度统计...")
+    service = ollama_module.OllamaService(model_name='qwen:latest')
+    service.catalog = ModelCatalog(lambda: [{'name': 'qwen:latest'}, {'name': 'llama3:8b'}])
+    timings = {
+        'qwen:latest': {'eval_count': 100, 'eval_duration': 2_000_000_000},
+        'llama3:8b': {'eval_count': 100, 'eval_duration': 4_000_000_000}
+    }
+
+    def fake_generate(model, prompt, stream=False, **kwargs):
+        if not prompt:
+            return {'response': '', 'done': True, 'load_duration': 3_000_000_000}
+        response = dict(timings[model], response='回答', done=True, load_duration=10_000_000,
+                        prompt_eval_count=400, prompt_eval_duration=200_000_000)
+        return iter([{'response': '回答', 'done': False}, response]) if stream else response
+
+    original = ollama_module.ollama.generate
+    ollama_module.ollama.generate = fake_generate
+    try:
+        service._generate('汇总', BATCH)
+        service._generate('问题', INTERACTIVE)
+        assert list(service._generate_stream('问题', INTERACTIVE)) == ['回答', '回答']
+        assert service.set_model('llama3:8b')
+        service._generate('汇总', BATCH)
+    finally:
+        ollama_module.ollama.generate = original
+
+    stats = service.get_generation_stats()
+    qwen, llama = stats['models']['qwen:latest'], stats['models']['llama3:8b']
+    assert qwen['calls'] == 3 and qwen['tokens_per_sec'] == 50
+    # 预热只加载模型不生成token，计入加载耗时
+    assert llama['calls'] == 2 and llama['eval_count'] == 100 and llama['tokens_per_sec'] == 25
+    assert llama['max_load_ms'] == 3000
+    assert stats['models']['qwen:latest']['prompt_tokens_per_sec'] == 2000
+    assert stats['endpoints']['summary']['calls'] == 2
+    assert stats['endpoints']['discussion_stream']['avg_load_ms'] == 10
+    assert stats['endpoints']['warmup']['calls'] == 1
+    assert stats['recent'][-1]['model'] == 'llama3:8b' and stats['recent'][-1]['prompt_eval_ms'] == 200
+    print("   ✅ 按模型和调用类型分别统计")
+
+def main():
+    """主测试函数"""
+    print("🧪 开始模型生成调度测试...\n")
+    test_interactive_before_batch()
+    test_queue_full_and_timeout()
+    test_interactive_evicts_batch()
+    test_async_waiters_hold_no_thread()
+    test_summary_falls_back_when_busy()
+    test_summary_deadline()
+    test_scheduler_is_only_queue()
+    test_discussion_deadline_cancels()
+    test_set_model_warms_up()
+    test_model_catalog()
+    test_generation_telemetry()
+    print("\n🎉 模型生成调度测试通过！")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+指标测试脚本
+测试Prometheus文本格式导出、上游请求统计和/metrics接口，不依赖网络和Ollama
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+
+import app as app_module
+from services.metrics import MetricsRegistry, UPSTREAM_REQUESTS, UPSTREAM_REQUEST_DURATION, track_upstream
+from services.http_client import PooledHTTPClient
+from test_app import _install_fakes, _restore
+
+def test_metrics_format():
+    """测试计数器和直方图按Prometheus文本格式导出"""
+    print("📈 测试指标导出格式...")
+    registry = MetricsRegistry()
+    counter = registry.counter('jobs_total', '任务数', ('kind',))
+    histogram = registry.histogram('job_seconds', '任务耗时', ('kind',), buckets=(0.1, 1))
+    counter.inc(kind='a')
+    counter.inc(2, kind='b"x')
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, kind='a')
+    registry.add_collector(lambda: [('sessions', 'gauge', '会话数', [({}, 3)])])
+
+    lines = registry.render().splitlines()
+    assert '# TYPE jobs_total counter' in lines
+    assert 'jobs_total{kind="a"} 1' in lines
+    assert 'jobs_total{kind="b\\"x"} 2' in lines
+    # 分桶计数是累计的，+Inf等于总次数
+    assert 'job_seconds_bucket{kind="a",le="0.1"} 1' in lines
+    assert 'job_seconds_bucket{kind="a",le="1"} 2' in lines
+    assert 'job_seconds_bucket{kind="a",le="+Inf"} 3' in lines
+    assert 'job_seconds_sum{kind="a"} 5.55' in lines
+    assert 'job_seconds_count{kind="a"} 3' in lines
+    assert 'sessions 3' in lines
+    print("   ✅ 导出格式正确")
+
+def test_upstream_metrics():
+    """测试上游请求按结果计数并记录耗时"""
+    print("🌐 测试上游请求统计...")
+    client = PooledHTTPClient('metrics_test', timeout=1, max_retries=0, upstream='metrics_test')
+    try:
+        client.get('http://127.0.0.1:1/')
+    except requests.RequestException:
+        pass
+    assert UPSTREAM_REQUESTS.value(upstream='metrics_test', outcome='error') == 1
+
+    try:
+        with track_upstream('metrics_test'):
+            raise TimeoutError()
+    except TimeoutError:
+        pass
+    with track_upstream('metrics_test'):
+        pass
+    assert UPSTREAM_REQUESTS.value(upstream='metrics_test', outcome='timeout') == 1
+    assert UPSTREAM_REQUESTS.value(upstream='metrics_test', outcome='ok') == 1
+    assert UPSTREAM_REQUEST_DURATION.count(upstream='metrics_test') == 3
+    print("   ✅ 错误、超时和成功分别计数")
+
+def test_metrics_endpoint():
+    """测试/metrics按路由模板统计请求，并导出缓存命中率和会话数"""
+    print("📊 测试/metrics接口...")
+    client = app_module.app.test_client()
+    _, originals = _install_fakes()
+    try:
+        client.get('/api/dashboard?city=北京')
+        client.get('/api/news?limit=3')
+    finally:
+        _restore(originals)
+
+    # 只导出已创建服务的缓存统计
+    assert app_module.registry.news_service is not None
+    app_module.registry.conversation_store.append('metrics-session', '问题', '回答')
+    try:
+        response = client.get('/metrics')
+        text = response.get_data(as_text=True)
+
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        assert 'http_requests_total{method="GET",route="/api/dashboard",status="200"}' in text
+        assert 'http_request_duration_seconds_count{method="GET",route="/api/news"}' in text
+        assert 'cache_hit_ratio{cache="article"}' in text
+        assert 'cache_requests_total{cache="models",result="miss"}' in text
+        assert 'conversation_sessions ' in text
+    finally:
+        app_module.registry.conversation_store.clear('metrics-session')
+    print("   ✅ 路由、缓存和会话指标已导出")
+
+def main():
+    """主测试函数"""
+    print("🧪 开始指标测试...\n")
+    test_metrics_format()
+    test_upstream_metrics()
+    test_metrics_endpoint()
+    print("\n🎉 指标测试通过！")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
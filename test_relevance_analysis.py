@@ -139,6 +139,53 @@ def test_relevance_filtering():
         for i, news in enumerate(filtered_news[:3], 1):
             print(f"   {i}. {news['title']}")
 
+def test_multi_city_relevance():
+    """测试一次扫描得到所有城市的相关程度，且与逐个关键词查找结果一致"""
+    print("\n🔎 测试多城市相关性计算...")
+    
+    news_service = NewsService()
+    news_item = {
+        'title': '长三角一体化：上海浦东与杭州滨江合作',
+        'summary': '华东地区城市群协同发展，上海、杭州、南京共同推进。'
+    }
+    
+    relevance = news_service._calculate_relevance(news_item, '上海')
+    assert relevance['score'] == 11
+    assert relevance['level'] == '高度相关'
+    assert relevance['matched_keywords'] == ['上海', '长三角', '华东', '浦东']
+    
+    # 一次扫描得到所有城市的结果，不写入新闻条目
+    assert 'city_relevance' not in news_item
+    city_relevance = news_service.relevance_scorer.score(news_item['title'], news_item['summary'])
+    assert city_relevance['杭州'] == {'score': 8, 'matched_keywords': ['杭州', '华东', '滨江']}
+    assert city_relevance['南京']['score'] == 2
+    assert '北京' not in city_relevance
+    assert news_service._calculate_relevance(news_item, '北京')['level'] == '一般'
+    print("   ✅ 各城市相关程度计算正确")
+
+def test_summary_reuses_news_service():
+    """测试汇总使用注入的新闻服务，提示词和备用汇总共用一次相关性分析"""
+    print("\n♻️ 测试汇总复用新闻服务...")
+    
+    news_service = NewsService()
+    calls = []
+    analyze = news_service.analyze_news_relevance
+    news_service.analyze_news_relevance = lambda news, city, ranked=False: calls.append(city) or analyze(news, city, ranked)
+    
+    def failing_generate(prompt, priority=None):
+        raise ConnectionError('ollama down')
+    
+    ollama_service = OllamaService(model_name='qwen:latest', news_service=news_service)
+    ollama_service._generate = failing_generate
+    news_data = news_service._get_mock_news(5, '北京')
+    
+    result = ollama_service.generate_summary_with_meta({'city': '北京', 'description': '晴'}, news_data, '北京')
+    assert result['source'] == 'fallback' and result['fallback_reason'] == 'error'
+    assert '北京科技创新中心建设加速推进' in result['summary']
+    assert calls == ['北京']
+    assert ollama_service.news_service is news_service
+    print("   ✅ 相关性只分析一次")
+
 def main():
     """主测试函数"""
     print("🚀 地域相关性分析功能测试")
@@ -153,6 +200,12 @@ def main():
     # 测试新闻筛选功能
     test_relevance_filtering()
     
+    # 测试多城市相关性计算
+    test_multi_city_relevance()
+    
+    # 测试汇总复用新闻服务
+    test_summary_reuses_news_service()
+    
     # 测试AI汇总功能
     test_ai_summary_with_relevance()
     
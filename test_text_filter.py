@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+思考内容过滤测试脚本
+测试增量过滤在任意分段方式下与整段过滤结果一致
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.text_filter import ThinkingFilter, remove_thinking
+
+SAMPLE = """<think>
+我需要先分析天气情况，然后看新闻内容。
+</think>
+
+# 今日汇总报告
+
+## 天气情况
+北京今天天气晴朗，温度25°C。<thinking>再想想</thinking>
+1 < 2 是显然的。
+
+基于以上信息，我来为您总结：
+
+
+
+## 新闻要点
+1. 重要新闻一
+现在让我补充一点
+2. 重要新闻二
+"""
+
+def _filter_in_chunks(text, size):
+    text_filter = ThinkingFilter()
+    parts = [text_filter.feed(text[i:i + size]) for i in range(0, len(text), size)]
+    parts.append(text_filter.flush())
+    return ''.join(parts)
+
+def test_remove_think_tags():
+    """测试去除<think>和<thinking>标签内容"""
+    print("🧠 测试思考标签过滤...")
+    result = remove_thinking(SAMPLE)
+    assert '<think' not in result
+    assert '我需要先分析' not in result
+    assert '再想想' not in result
+    assert result.startswith('# 今日汇总报告')
+    assert '1 < 2 是显然的。' in result
+    print("   ✅ 思考标签已去除")
+
+def test_remove_thinking_phrases():
+    """测试去除思考开头语直到段落边界，并压缩多余空行"""
+    result = remove_thinking(SAMPLE)
+    assert '基于以上信息' not in result
+    assert '现在让我补充一点' not in result
+    assert '是显然的。\n\n## 新闻要点\n1. 重要新闻一\n\n2. 重要新闻二' in result
+    assert '\n\n\n' not in result
+
+def test_matches_legacy_regex():
+    """测试与原多次正则替换实现的结果一致"""
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+    from bench_think_filter import legacy_remove_thinking, build_reasoning_output
+    for text in (SAMPLE, build_reasoning_output(1, 3000), '现在构思具体内容:\n让我分析一下。\n\n# 报告'):
+        assert remove_thinking(text) == legacy_remove_thinking(text)
+
+def test_chunked_matches_whole():
+    """测试任意分段大小的增量过滤结果与整段过滤一致"""
+    expected = remove_thinking(SAMPLE)
+    for size in range(1, 20):
+        assert _filter_in_chunks(SAMPLE, size) == expected, size
+
+def test_unclosed_think_block_dropped():
+    """测试流结束时未闭合的思考块被丢弃"""
+    assert remove_thinking('答案<think>还没想完') == '答案'
+
+def main():
+    """主测试函数"""
+    print("🧪 开始思考内容过滤测试...\n")
+    test_remove_think_tags()
+    test_remove_thinking_phrases()
+    test_matches_legacy_regex()
+    test_chunked_matches_whole()
+    test_unclosed_think_block_dropped()
+    print("\n🎉 思考内容过滤测试通过！")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())